@@ -0,0 +1,42 @@
+"""
+The events of a typical chatflow answer, shaped like the ones recorded from a Dify server: a workflow with a few
+nodes around an LLM node which streams `--deltas` token-sized message events.
+"""
+import json
+from typing import List
+
+
+def chat_stream_events(deltas: int = 400) -> List[dict]:
+    ids = {"task_id": "b5d3c2f1-7a8e-4e0b-9c6d-2f1a3b4c5d6e", "message_id": "0a1b2c3d-4e5f-4a6b-8c7d-9e0f1a2b3c4d",
+           "conversation_id": "9f8e7d6c-5b4a-4392-8170-6f5e4d3c2b1a"}
+    run = {"workflow_run_id": "1c2d3e4f-5a6b-4c7d-8e9f-0a1b2c3d4e5f"}
+    events = [{"event": "workflow_started", **ids, **run, "created_at": 1705395332,
+               "data": {"id": run["workflow_run_id"], "workflow_id": "wf", "sequence_number": 7, "inputs": {},
+                        "created_at": 1705395332}}]
+    for index, node_type in enumerate(("start", "knowledge-retrieval", "llm"), 1):
+        node = {"id": f"exec-{index}", "node_id": f"node-{index}", "node_type": node_type, "title": node_type,
+                "index": index, "created_at": 1705395332}
+        events.append({"event": "node_started", **ids, **run, "data": node})
+        if node_type != "llm":
+            events.append({"event": "node_finished", **ids, **run,
+                           "data": {**node, "status": "succeeded", "elapsed_time": .01, "outputs": {}}})
+    events += [{"event": "message", **ids, "answer": f" token{i}", "created_at": 1705395332} for i in range(deltas)]
+    events.append({"event": "node_finished", **ids, **run,
+                   "data": {"id": "exec-3", "node_id": "node-3", "node_type": "llm", "title": "llm", "index": 3,
+                            "status": "succeeded", "elapsed_time": 2.5, "created_at": 1705395332,
+                            "execution_metadata": {"total_tokens": deltas + 120, "total_price": "0.0012",
+                                                   "currency": "USD"}}})
+    events.append({"event": "workflow_finished", **ids, **run,
+                   "data": {"id": run["workflow_run_id"], "workflow_id": "wf", "status": "succeeded",
+                            "outputs": {"answer": "..."}, "elapsed_time": 2.6, "total_tokens": deltas + 120,
+                            "total_steps": 3, "created_at": 1705395332, "finished_at": 1705395335}})
+    events.append({"event": "message_end", **ids,
+                   "metadata": {"usage": {"prompt_tokens": 120, "completion_tokens": deltas,
+                                          "total_tokens": deltas + 120, "total_price": "0.0012", "currency": "USD",
+                                          "latency": 2.6}}})
+    return events
+
+
+def chat_stream_payloads(deltas: int = 400) -> List[str]:
+    # the `data:` field of each event, as received
+    return [json.dumps(event) for event in chat_stream_events(deltas)]
@@ -0,0 +1,200 @@
+"""
+Compares concurrent chat streams over HTTP/1.1 and HTTP/2 against a local stand-in server.
+
+The server runs in its own process and speaks both protocols over TLS (ALPN) with a throwaway self-signed
+certificate, streams `--events` message events per request `--gap` seconds apart, and counts the TCP connections it
+accepts. With HTTP/1.1 every concurrent stream pins its own connection, with HTTP/2 they are multiplexed over a
+single one. The time to the first event of each stream is measured from the start of the batch, connection setup and
+TLS handshakes included, and reported as p50 / p99 along with the total elapsed time. On a single core shared by the
+client and the server:
+
+    1000 concurrent streams of 20 events, 10ms apart
+    HTTP/1.1  connections: 1000  first event p50:  5034.0ms  p99:  8452.4ms  elapsed: 8.492s
+    HTTP/2    connections:    1  first event p50:  3908.2ms  p99:  7570.8ms  elapsed: 7.655s
+
+    100 concurrent streams of 20 events, 10ms apart
+    HTTP/1.1  connections:  100  first event p50:   697.6ms  p99:  1037.7ms  elapsed: 1.122s
+    HTTP/2    connections:    1  first event p50:   237.2ms  p99:   289.9ms  elapsed: 0.650s
+
+At 1k streams that core is saturated, the latencies are mostly CPU queueing and HTTP/2 mainly saves the 999 TLS
+handshakes.
+
+Requires `h2` (`pip install httpx[http2]`) and the `openssl` command line tool, and about two file descriptors per
+stream for HTTP/1.1 (`ulimit -n`):
+
+    python benchmarks/http2_streams.py --streams 1000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import h2.config
+import h2.connection
+import h2.events
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dify_client import AsyncClient, models  # noqa: E402
+
+
+def _sse(event: dict) -> bytes:
+    return f"data: {json.dumps(event)}\n\n".encode()
+
+
+def _events(count: int):
+    for i in range(count):
+        yield _sse({"event": "message", "task_id": "t", "message_id": "m", "conversation_id": "c",
+                    "answer": f"chunk {i} ", "created_at": 0})
+    yield _sse({"event": "message_end", "task_id": "t", "message_id": "m", "conversation_id": "c",
+                "metadata": {}, "created_at": 0})
+
+
+class StandInServer:
+    def __init__(self, events: int, gap: float, connections: multiprocessing.Value):
+        self.events = events
+        self.gap = gap
+        self.connections = connections  # shared with the benchmark process
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with self.connections.get_lock():
+            self.connections.value += 1
+        try:
+            if writer.get_extra_info("ssl_object").selected_alpn_protocol() == "h2":
+                await self._handle_h2(reader, writer)
+            else:
+                await self._handle_http1(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_http1(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\ntransfer-encoding: chunked\r\n\r\n")
+            for chunk in _events(self.events):
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+                await asyncio.sleep(self.gap)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def _handle_h2(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        tasks = set()
+
+        async def respond(stream_id: int):
+            conn.send_headers(stream_id, [(":status", "200"), ("content-type", "text/event-stream")])
+            for chunk in _events(self.events):
+                conn.send_data(stream_id, chunk)
+                writer.write(conn.data_to_send())
+                await writer.drain()
+                await asyncio.sleep(self.gap)
+            conn.end_stream(stream_id)
+            writer.write(conn.data_to_send())
+
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                if isinstance(event, h2.events.StreamEnded):
+                    task = asyncio.ensure_future(respond(event.stream_id))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            writer.write(conn.data_to_send())
+            await writer.drain()
+
+
+def _make_certificate(directory: str) -> Tuple[str, str]:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1", "-keyout", key, "-out", cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _run_streams(api_base: str, http2: bool, streams: int) -> Tuple[float, List[float]]:
+    # returns the elapsed time of the batch and the time to the first event of each stream
+    req = models.ChatRequest(query="hi", inputs={}, user="bench", response_mode=models.ResponseMode.STREAMING)
+    async with AsyncClient(api_key="bench", api_base=api_base, http2=http2, max_connections=streams) as client:
+        first_events = []
+
+        async def consume():
+            first_event = None
+            async for _ in await client.achat_messages(req):
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+            first_events.append(first_event)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(consume() for _ in range(streams)))
+        return time.perf_counter() - started, first_events
+
+
+def _serve(cert: str, key: str, events: int, gap: float, connections: multiprocessing.Value,
+           ports: multiprocessing.Queue):
+    # runs the stand-in server in its own process, so that it does not compete with the clients for the event loop
+    async def serve():
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert, key)
+        server_context.set_alpn_protocols(["h2", "http/1.1"])
+        stand_in = StandInServer(events, gap, connections)
+        server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0, ssl=server_context, backlog=4096)
+        ports.put(server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()  # until terminated
+
+    asyncio.run(serve())
+
+
+async def main(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = _make_certificate(directory)
+        os.environ["SSL_CERT_FILE"] = cert  # trusted by the clients' default SSL context
+
+        connections, ports = multiprocessing.Value("i", 0), multiprocessing.Queue()
+        server = multiprocessing.Process(target=_serve, args=(cert, key, args.events, args.gap, connections, ports),
+                                         daemon=True)
+        server.start()
+        try:
+            api_base = f"https://127.0.0.1:{ports.get(timeout=30)}/v1"
+            print(f"{args.streams} concurrent streams of {args.events} events, {args.gap * 1000:.0f}ms apart")
+            for http2 in (False, True):
+                connections.value = 0
+                elapsed, first_events = await _run_streams(api_base, http2, args.streams)
+                print(f"{'HTTP/2  ' if http2 else 'HTTP/1.1'}  connections: {connections.value:4d}  "
+                      f"first event p50: {_percentile(first_events, 50) * 1000:7.1f}ms  "
+                      f"p99: {_percentile(first_events, 99) * 1000:7.1f}ms  elapsed: {elapsed:.3f}s")
+        finally:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--gap", type=float, default=.01, help="seconds between two events of a stream")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Measures how many `ChatResponse` and `WorkflowsRunResponse` bodies one core parses per second, and how many request
+bodies it serializes, with the previous dict round trips vs the JSON codecs.
+
+`dict` is what the client did before the codecs: `Model(**response.json())` for the responses, and
+`req.model_dump()` re-serialized by the standard `json` library for the requests. `JSONCodec` and `OrjsonCodec`
+are the codecs of `Client.json_codec`, `orjson` only being measured when it is installed. Both codecs parse and
+serialize the models with pydantic's JSON core, `orjson` only handles the plain values such as the stream events, so
+their rates only differ by noise here. On one core of a Linux box:
+
+    ChatResponse 3,710 bytes, WorkflowsRunResponse 2,134 bytes
+                   ChatResponse/s   WorkflowsRun/s    ChatRequest/s
+            dict           33,187           51,180           97,711
+       JSONCodec           55,159           75,376          230,944
+     OrjsonCodec           48,230           69,203          231,107
+
+Run with:
+
+    python benchmarks/json_codec.py --repeat 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dify_client import JSONCodec, OrjsonCodec, models  # noqa: E402
+
+ANSWER = "Here is a summary of the document you asked about, with the main points listed first. " * 20
+CHAT_RESPONSE = json.dumps({
+    "message_id": "0a1b2c3d-4e5f-4a6b-8c7d-9e0f1a2b3c4d", "conversation_id": "9f8e7d6c-5b4a-4392-8170-6f5e4d3c2b1a",
+    "mode": "advanced-chat", "answer": ANSWER, "created_at": 1705395332,
+    "metadata": {
+        "usage": {"prompt_tokens": 1033, "prompt_unit_price": "0.001", "prompt_price_unit": "0.001",
+                  "prompt_price": "0.0010330", "completion_tokens": 420, "completion_unit_price": "0.002",
+                  "completion_price_unit": "0.001", "completion_price": "0.0008400", "total_tokens": 1453,
+                  "total_price": "0.0018730", "currency": "USD", "latency": 2.47},
+        "retriever_resources": [{"position": i, "dataset_id": "ds", "dataset_name": "handbook",
+                                 "document_id": f"doc-{i}", "document_name": f"chapter-{i}.md",
+                                 "segment_id": f"seg-{i}", "score": .9 - i / 10, "content": ANSWER[:300]}
+                                for i in range(1, 4)],
+    },
+}).encode()
+WORKFLOWS_RUN_RESPONSE = json.dumps({
+    "task_id": "b5d3c2f1-7a8e-4e0b-9c6d-2f1a3b4c5d6e", "workflow_run_id": "1c2d3e4f-5a6b-4c7d-8e9f-0a1b2c3d4e5f",
+    "data": {"id": "1c2d3e4f-5a6b-4c7d-8e9f-0a1b2c3d4e5f", "workflow_id": "wf", "status": "succeeded",
+             "outputs": {"summary": ANSWER, "keywords": ["handbook", "policy", "summary"], "score": .82},
+             "elapsed_time": 3.1, "total_tokens": 1453, "total_steps": 5, "created_at": 1705395332,
+             "finished_at": 1705395335},
+}).encode()
+CHAT_REQUEST = models.ChatRequest(query="Summarize the handbook", inputs={"language": "en", "length": "short"},
+                                  user="user-42", response_mode=models.ResponseMode.BLOCKING,
+                                  conversation_id="9f8e7d6c-5b4a-4392-8170-6f5e4d3c2b1a")
+
+
+def _measure(repeat: int, func, *args) -> float:
+    func(*args)  # warm-up
+    started = time.process_time()
+    for _ in range(repeat):
+        func(*args)
+    return repeat / (time.process_time() - started)
+
+
+def main(args: argparse.Namespace):
+    codecs = [("JSONCodec", JSONCodec())]
+    try:
+        codecs.append(("OrjsonCodec", OrjsonCodec()))
+    except ImportError:
+        pass
+    print(f"ChatResponse {len(CHAT_RESPONSE):,} bytes, WorkflowsRunResponse {len(WORKFLOWS_RUN_RESPONSE):,} bytes")
+    print(f"{'':>12}  {'ChatResponse/s':>15}  {'WorkflowsRun/s':>15}  {'ChatRequest/s':>15}")
+    rates = [_measure(args.repeat, lambda body: models.ChatResponse(**json.loads(body)), CHAT_RESPONSE),
+             _measure(args.repeat, lambda body: models.WorkflowsRunResponse(**json.loads(body)),
+                      WORKFLOWS_RUN_RESPONSE),
+             _measure(args.repeat, lambda req: json.dumps(req.model_dump()).encode(), CHAT_REQUEST)]
+    print(f"{'dict':>12}  " + "  ".join(f"{rate:>15,.0f}" for rate in rates))
+    for name, codec in codecs:
+        rates = [_measure(args.repeat, codec.load_model, models.ChatResponse, CHAT_RESPONSE),
+                 _measure(args.repeat, codec.load_model, models.WorkflowsRunResponse, WORKFLOWS_RUN_RESPONSE),
+                 _measure(args.repeat, codec.dump_model, CHAT_REQUEST)]
+        print(f"{name:>12}  " + "  ".join(f"{rate:>15,.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5000, help="bodies parsed or serialized per measurement")
+    main(parser.parse_args())
@@ -0,0 +1,63 @@
+"""
+Measures how many chat stream events one core decodes per second, with full models vs `MessageDelta` deltas.
+
+Each event of a recorded chatflow answer (`benchmarks/_event_mix.py`) is JSON decoded and built the way
+`Client.chat_messages` builds it, with `build_chat_stream_response`, or with `build_chat_stream_delta` as with
+`fast_stream_deltas=True`. Building the full models for the deltas with `to_model()` is measured too, it is the cost
+a caller pays back when it needs them. On one core of a Linux box, JSON decoding included:
+
+    409 events per stream, 400 of them message deltas
+                models:    106,844 events/s
+                deltas:    163,572 events/s
+     deltas + to_model:     92,954 events/s
+
+Run with:
+
+    python benchmarks/stream_decode.py --deltas 400 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._event_mix import chat_stream_payloads  # noqa: E402
+from dify_client import models  # noqa: E402
+
+
+def _models(payloads):
+    for payload in payloads:
+        models.build_chat_stream_response(json.loads(payload))
+
+
+def _deltas(payloads):
+    for payload in payloads:
+        models.build_chat_stream_delta(json.loads(payload))
+
+
+def _deltas_to_models(payloads):
+    for payload in payloads:
+        event = models.build_chat_stream_delta(json.loads(payload))
+        if isinstance(event, models.MessageDelta):
+            event.to_model()
+
+
+def main(args: argparse.Namespace):
+    payloads = chat_stream_payloads(args.deltas)
+    print(f"{len(payloads)} events per stream, {args.deltas} of them message deltas")
+    for name, decode in (("models", _models), ("deltas", _deltas), ("deltas + to_model", _deltas_to_models)):
+        decode(payloads)  # warm-up
+        started = time.process_time()
+        for _ in range(args.repeat):
+            decode(payloads)
+        elapsed = time.process_time() - started
+        print(f"{name:>18}: {len(payloads) * args.repeat / elapsed:>10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--deltas", type=int, default=400, help="message events per stream")
+    parser.add_argument("--repeat", type=int, default=20, help="streams decoded per measurement")
+    main(parser.parse_args())
@@ -1 +1,63 @@
-from ._clientx import Client, AsyncClient
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import errors, models, utils
+    from ._clientx import Client, AsyncClient
+    from ._ratelimit import RateLimiter
+    from ._retry import RetryPolicy
+    from ._cache import ResponseCache, MemoryCache, SQLiteCache
+    from ._audio import TTSAudioDecoder
+    from ._aggregate import ChatStreamAggregator
+    from ._tracking import WorkflowRunTracker, WorkflowRunTimeline, NodeExecution, NodeLatencyStats
+    from ._json import JSONCodec, OrjsonCodec
+    from ._pool import ClientPool, AsyncClientPool, BalancingStrategy
+    from ._usage import UsageAggregator, UsageTotals
+    from ._metrics import MetricsSink, RequestMetrics, StreamMetrics, PrometheusMetricsSink, OpenTelemetryMetricsSink
+
+# the submodules are imported on first access, so that importing the package stays cheap on cold starts
+_LAZY_ATTRS = {
+    "Client": "._clientx",
+    "AsyncClient": "._clientx",
+    "RateLimiter": "._ratelimit",
+    "RetryPolicy": "._retry",
+    "ResponseCache": "._cache",
+    "MemoryCache": "._cache",
+    "SQLiteCache": "._cache",
+    "TTSAudioDecoder": "._audio",
+    "ChatStreamAggregator": "._aggregate",
+    "WorkflowRunTracker": "._tracking",
+    "WorkflowRunTimeline": "._tracking",
+    "NodeExecution": "._tracking",
+    "NodeLatencyStats": "._tracking",
+    "JSONCodec": "._json",
+    "OrjsonCodec": "._json",
+    "ClientPool": "._pool",
+    "AsyncClientPool": "._pool",
+    "BalancingStrategy": "._pool",
+    "UsageAggregator": "._usage",
+    "UsageTotals": "._usage",
+    "MetricsSink": "._metrics",
+    "RequestMetrics": "._metrics",
+    "StreamMetrics": "._metrics",
+    "PrometheusMetricsSink": "._metrics",
+    "OpenTelemetryMetricsSink": "._metrics",
+}
+_LAZY_SUBMODULES = ("errors", "models", "utils")
+
+__all__ = [*_LAZY_ATTRS, *_LAZY_SUBMODULES]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,105 @@
+from typing import Optional, List, Dict, Iterable, Iterator, AsyncIterable, AsyncIterator, Any
+
+from dify_client import models
+
+_ANSWER_EVENTS = (models.StreamEvent.MESSAGE, models.StreamEvent.AGENT_MESSAGE)
+
+
+class ChatStreamAggregator:
+    """
+    Assembles the events of a chat or completion stream into the final answer.
+
+    Answer deltas are collected in a list and joined once, `message_replace` events replace the answer collected so
+    far, agent thoughts are merged by position and `message_end` provides the metadata with the usage. Both stream
+    responses and `MessageDelta` objects are accepted.
+
+    Usage:
+        aggregator = ChatStreamAggregator()
+        for delta in aggregator.iter(client.chat_messages(req)):
+            print(delta, end="")
+        response = aggregator.response()
+    """
+
+    def __init__(self):
+        self.task_id: Optional[str] = None
+        self.message_id: Optional[str] = None
+        self.conversation_id: Optional[str] = ""
+        self.created_at: Optional[int] = None
+        self.metadata: Optional[models.Metadata] = None
+        self.message_files: List[models.MessageFileStreamResponse] = []
+        self.finished = False  # set once `message_end` is received
+        self._answer: List[str] = []
+        self._agent_thoughts: Dict[int, models.AgentThoughtStreamResponse] = {}
+
+    @property
+    def answer(self) -> str:
+        if len(self._answer) > 1:
+            self._answer = ["".join(self._answer)]
+        return self._answer[0] if self._answer else ""
+
+    @property
+    def agent_thoughts(self) -> List[models.AgentThoughtStreamResponse]:
+        return [self._agent_thoughts[position] for position in sorted(self._agent_thoughts)]
+
+    def feed(self, event: Any) -> Optional[str]:
+        """
+        Adds a stream event to the aggregate.
+
+        Returns:
+            The answer delta carried by the event, if any.
+        """
+        name = event.event
+        self.task_id = self.task_id or event.task_id
+        if name in _ANSWER_EVENTS:
+            self._update_message(event)
+            if event.answer:
+                self._answer.append(event.answer)
+            return event.answer
+        if name == models.StreamEvent.MESSAGE_REPLACE:
+            self._update_message(event)
+            self._answer = [event.answer] if event.answer else []
+        elif name == models.StreamEvent.AGENT_THOUGHT:
+            # agent thoughts are resent with their latest content, until their observation is known
+            self._agent_thoughts[event.position or 0] = event
+        elif name == models.StreamEvent.MESSAGE_FILE:
+            self.message_files.append(event)
+        elif name == models.StreamEvent.MESSAGE_END:
+            self._update_message(event)
+            self.metadata = event.metadata
+            self.finished = True
+        return None
+
+    def iter(self, stream: Iterable[Any]) -> Iterator[str]:
+        """
+        Consumes a stream, yielding the answer deltas as they are received.
+        """
+        for event in stream:
+            delta = self.feed(event)
+            if delta:
+                yield delta
+
+    async def aiter(self, stream: AsyncIterable[Any]) -> AsyncIterator[str]:
+        """
+        Consumes an async stream, yielding the answer deltas as they are received.
+        """
+        async for event in stream:
+            delta = self.feed(event)
+            if delta:
+                yield delta
+
+    def response(self) -> models.ChatResponse:
+        """
+        Returns the blocking response equivalent to the events aggregated so far.
+        """
+        return models.ChatResponse(
+            message_id=self.message_id,
+            conversation_id=self.conversation_id,
+            answer=self.answer,
+            metadata=self.metadata,
+            created_at=self.created_at,
+        )
+
+    def _update_message(self, event: Any):
+        self.message_id = self.message_id or event.message_id
+        self.conversation_id = self.conversation_id or event.conversation_id
+        self.created_at = self.created_at or event.created_at
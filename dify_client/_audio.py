@@ -0,0 +1,50 @@
+import binascii
+import json
+from typing import Optional, Any
+
+from dify_client import models
+
+_TTS_EVENTS = (models.StreamEvent.TTS_MESSAGE.value, models.StreamEvent.TTS_MESSAGE_END.value)
+
+
+class TTSAudioDecoder:
+    """
+    Decodes the base64 audio of `tts_message` / `tts_message_end` stream events incrementally.
+
+    Each chunk is decoded straight from the decoded event payload, without building a stream response model nor
+    keeping the base64 text around, and is written to `sink` if set, e.g. a file, a socket file or an audio player.
+    Chunks which are not a multiple of 4 base64 characters are carried over to the next one.
+    """
+
+    def __init__(self, sink: Optional[Any] = None):
+        """
+        Args:
+            sink: An object with a `write(bytes)` method receiving the decoded audio.
+        """
+        self.sink = sink
+        self.size = 0  # number of decoded audio bytes
+        self._pending = ""
+
+    def feed(self, audio: str) -> bytes:
+        if self._pending:
+            audio, self._pending = self._pending + audio, ""
+        remainder = len(audio) % 4
+        if remainder:
+            audio, self._pending = audio[:-remainder], audio[-remainder:]
+        chunk = binascii.a2b_base64(audio) if audio else b""
+        if chunk:
+            self.size += len(chunk)
+            if self.sink is not None:
+                self.sink.write(chunk)
+        return chunk
+
+    def feed_event(self, data: dict) -> bytes:
+        if data.get(models.STREAM_EVENT_KEY) not in _TTS_EVENTS or not data.get("audio"):
+            return b""
+        return self.feed(data["audio"])
+
+    def feed_sse_data(self, data: str) -> bytes:
+        # the JSON payloads of the events which cannot be TTS events are not even decoded
+        if models.StreamEvent.TTS_MESSAGE.value not in data:
+            return b""
+        return self.feed_event(json.loads(data))
@@ -0,0 +1,85 @@
+import logging
+import queue
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRunner:
+    """
+    Runs fire-and-forget calls on a few daemon threads.
+
+    At most `max_pending` calls wait in the queue, further calls are dropped instead of piling up, and the threads
+    are daemons, so neither the submitting threads nor the interpreter shutdown ever wait on the calls. The threads
+    exit once idle for `idle_timeout` seconds, so a runner left unused holds no thread. The errors of the calls are
+    logged at debug level and otherwise ignored.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 128, idle_timeout: float = 5.):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> bool:
+        """
+        Queues a call.
+
+        Returns:
+            False if the call was dropped because the queue is full.
+        """
+        with self._lock:
+            try:
+                self._queue.put_nowait((fn, args, kwargs))
+            except queue.Full:
+                return False
+            # a worker per queued call, up to max_workers
+            if len(self._workers) < min(self.max_workers, self._queue.qsize() + len(self._workers)):
+                worker = threading.Thread(target=self._work, args=(self._queue,), name="dify-client-background",
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        return True
+
+    def shutdown(self):
+        """
+        Drops the queued calls and stops the threads once their current call is over, without waiting for them.
+
+        The runner can still be used, the calls submitted afterwards start new threads.
+        """
+        with self._lock:
+            calls, self._queue = self._queue, queue.Queue(maxsize=self.max_pending)
+            workers, self._workers = self._workers, []
+        while True:
+            try:
+                calls.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            try:
+                calls.put_nowait(None)  # wakes up a worker to stop it
+            except queue.Full:
+                break
+
+    def _work(self, calls: queue.Queue):
+        while True:
+            try:
+                call = calls.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # the calls are queued under the lock, so none can be left behind without a worker
+                with self._lock:
+                    if calls.empty():
+                        if threading.current_thread() in self._workers:  # unless dropped by a shutdown
+                            self._workers.remove(threading.current_thread())
+                        return
+                continue
+            if call is None:
+                return
+            fn, args, kwargs = call
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.debug("Background call %r failed", fn, exc_info=True)
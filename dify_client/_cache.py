@@ -0,0 +1,181 @@
+import abc
+import collections
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from dify_client import models
+
+
+class ResponseCache(abc.ABC):
+    """
+    Base class of the response cache backends, which store serialized responses by key and count hits and misses.
+
+    Subclasses implement `_get`, `_set` and `clear`, and must be safe to use from several threads. Backends blocking on
+    I/O set `blocking`, the async clients then call them in the default executor of their event loop.
+    """
+    blocking = False
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        Args:
+            ttl: The number of seconds an entry stays valid, forever if unset.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self._set(key, value)
+
+    @abc.abstractmethod
+    def clear(self):
+        pass
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        pass
+
+    @abc.abstractmethod
+    def _set(self, key: str, value: str):
+        pass
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl is not None else None
+
+
+class MemoryCache(ResponseCache):
+    """
+    An in-memory LRU cache, whose entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, self._expires_at())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    An on-disk cache backed by a SQLite database, shared by the processes using the same file.
+
+    Its calls block on disk I/O, the async clients run them in the default executor of their event loop.
+    """
+    blocking = True
+
+    def __init__(self, path: str, ttl: Optional[float] = None, table: str = "dify_responses"):
+        super().__init__(ttl)
+        import sqlite3
+
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                           f"(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            return value
+
+    def _set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                               (key, value, self._expires_at()))
+
+
+def make_cache_key(api_base: str, api_key: str, req: BaseModel, exclude: Optional[set] = None) -> str:
+    # canonical hash of the request model, scoped by app
+    return _hash_key(api_base, api_key, type(req).__name__, req.model_dump(mode="json", exclude=exclude))
+
+
+def make_upload_cache_key(api_base: str, api_key: str, user: str, digest: str) -> str:
+    # uploaded files belong to the user who uploaded them
+    return _hash_key(api_base, api_key, "upload", user, digest)
+
+
+def _hash_key(api_base: str, api_key: str, *parts) -> str:
+    # the api key itself is only stored hashed
+    payload = [api_base, hashlib.sha256(api_key.encode()).hexdigest(), *parts]
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _CompletionStreamRecorder:
+    # rebuilds the blocking response of a completion stream, to cache it once the stream is complete
+    def __init__(self):
+        self._answer = []
+        self._first_event = None
+        self.response: Optional[models.CompletionResponse] = None
+
+    def record(self, data: dict):
+        event = data.get(models.STREAM_EVENT_KEY)
+        if event == models.StreamEvent.MESSAGE:
+            self._answer.append(data.get("answer") or "")
+            self._first_event = self._first_event or data
+        elif event == models.StreamEvent.MESSAGE_REPLACE:
+            self._answer = [data.get("answer") or ""]
+        elif event == models.StreamEvent.MESSAGE_END:
+            first_event = self._first_event or data
+            self.response = models.CompletionResponse(
+                message_id=data.get("message_id"),
+                conversation_id=data.get("conversation_id") or "",
+                mode=models.Mode.COMPLETION,
+                answer="".join(self._answer),
+                metadata=data.get("metadata"),
+                created_at=first_event.get("created_at"),
+            )
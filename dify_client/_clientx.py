@@ -1,4 +1,13 @@
-from typing import Optional, Any, Mapping, Iterator, AsyncIterator, Union, Dict
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import itertools
+import threading
+import time
+from http import HTTPStatus
+from typing import Optional, Any, Mapping, Iterator, AsyncIterator, Union, Dict, Iterable, AsyncIterable, Tuple, List, \
+    Type, Callable
 
 try:
     from enum import StrEnum
@@ -17,14 +26,26 @@ import httpx
 # noinspection PyProtectedMember
 import httpx._types as types
 from httpx_sse import connect_sse, ServerSentEvent, aconnect_sse
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
 
 from dify_client import errors, models
-
-_httpx_client = httpx.Client()
-_async_httpx_client = httpx.AsyncClient()
+from dify_client._audio import TTSAudioDecoder
+from dify_client._background import BackgroundRunner
+from dify_client._core import _Call, _StreamCall, _Attempts
+from dify_client._json import JSONCodec, ModelT, get_default_json_codec
+from dify_client._metrics import MetricsSink, RequestMetrics, StreamMetrics
+from dify_client._cache import ResponseCache, make_cache_key, make_upload_cache_key, _CompletionStreamRecorder
+from dify_client._ratelimit import RateLimiter
+from dify_client._retry import RetryPolicy
+from dify_client._usage import UsageAggregator
+from dify_client._upload import MultipartStream, UploadSource, UploadProgress, DEFAULT_CHUNK_SIZE, hash_upload_source
 
 IGNORED_STREAM_EVENTS = (models.StreamEvent.PING.value,)
+# the last events of a stream, whose task is over
+FINISHED_STREAM_EVENTS = (models.StreamEvent.MESSAGE_END, models.StreamEvent.WORKFLOW_FINISHED,
+                          models.StreamEvent.ERROR)
+# the maximum number of stop requests of abandoned streams waiting to be sent
+MAX_PENDING_STOPS = 128
 
 # feedback
 ENDPOINT_FEEDBACKS = "/messages/{message_id}/feedbacks"
@@ -41,15 +62,390 @@ ENDPOINT_STOP_CHAT_MESSAGES = "/chat-messages/{task_id}/stop"
 # workflow
 ENDPOINT_RUN_WORKFLOWS = "/workflows/run"
 ENDPOINT_STOP_WORKFLOWS = "/workflows/{task_id}/stop"
+ENDPOINT_WORKFLOWS_RUN_DETAIL = "/workflows/run/{workflow_run_id}"
 # audio <-> text
 ENDPOINT_TEXT_TO_AUDIO = "/text-to-audio"
 ENDPOINT_AUDIO_TO_TEXT = "/audio-to-text"
 
 
-class Client(BaseModel):
+class _BaseClient(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     api_key: str
     api_base: Optional[str] = "https://api.dify.ai/v1"
 
+    # connection pool of the underlying httpx client, owned by each client instance
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 5.
+    http2: bool = False
+
+    # timeouts in seconds, each per-phase timeout falls back to `timeout` when unset
+    timeout: Optional[float] = 5.
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    write_timeout: Optional[float] = None
+    pool_timeout: Optional[float] = None
+
+    # yield lightweight `models.MessageDelta` objects instead of pydantic models for message deltas in streams
+    fast_stream_deltas: bool = False
+
+    # paces the requests of this client, share one limiter between the clients of an API key
+    rate_limiter: Optional[RateLimiter] = None
+    # retries failed requests, and streams until their first event, no retries if unset
+    retry_policy: Optional[RetryPolicy] = None
+    # caches completion messages by request, for deterministic prompts, no caching if unset
+    completion_cache: Optional[ResponseCache] = None
+    # maps the content hash of the files uploaded by `bulk_upload` to their upload response, per user
+    upload_cache: Optional[ResponseCache] = None
+    # serializes the request bodies and parses the response bodies, uses orjson when installed
+    json_codec: JSONCodec = Field(default_factory=get_default_json_codec)
+    # receives the timings of the requests and streams, no instrumentation if unset
+    metrics_sink: Optional[MetricsSink] = None
+    # accumulates the token usage and spend of the responses and stream events, no accounting if unset
+    usage_aggregator: Optional[UsageAggregator] = None
+    # the app of the API key, as recorded in the usage
+    app_name: Optional[str] = None
+    # stops the task of a chat, completion or workflow stream closed by the consumer before its end, in the background
+    stop_on_close: bool = True
+
+    _http_client_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _urls: Dict[Tuple[str, str], str] = PrivateAttr(default_factory=dict)
+    _auth_headers: Tuple[Optional[str], Dict[str, str]] = PrivateAttr(default=(None, {}))
+
+    @field_validator("http2")
+    def check_http2_support(cls, http2: bool) -> bool:
+        # HTTP/2 multiplexes concurrent requests and SSE streams over a few connections, but needs the optional `h2`
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError("http2=True requires the `h2` package, install it with `pip install httpx[http2]`")
+        return http2
+
+    def _prepare_url(self, endpoint: str, **kwargs) -> str:
+        if kwargs:
+            return self.api_base + endpoint.format(**kwargs)
+        # the URLs of the endpoints without path parameters are built once per API base
+        key = (self.api_base, endpoint)
+        url = self._urls.get(key)
+        if url is None:
+            url = self._urls[key] = self.api_base + endpoint
+        return url
+
+    def _prepare_headers(self, headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+        api_key, auth_headers = self._auth_headers
+        if api_key != self.api_key:
+            auth_headers = {"Authorization": f"Bearer {self.api_key}"}
+            self._auth_headers = (self.api_key, auth_headers)
+        # always a new dict, the content type of the body may be added to it
+        if not headers:
+            return dict(auth_headers)
+        merged_headers = dict(headers)
+        if "authorization" not in (key.lower() for key in merged_headers.keys()):
+            merged_headers.update(auth_headers)
+        return merged_headers
+
+    def _prepare_json_content(self, json: Any, headers: Dict[str, str]) -> bytes:
+        if "content-type" not in (key.lower() for key in headers.keys()):
+            headers["Content-Type"] = "application/json"
+        if isinstance(json, BaseModel):
+            return self.json_codec.dump_model(json)
+        return self.json_codec.dumps(json)
+
+    def _prepare_body(self, headers: Optional[Mapping[str, str]], content: Optional[types.RequestContent],
+                      json: Optional[Any]) -> Tuple[Dict[str, str], Optional[types.RequestContent]]:
+        merged_headers = self._prepare_headers(headers)
+        if json is not None:
+            content = self._prepare_json_content(json, merged_headers)
+        return merged_headers, content
+
+    def _parse_response(self, model_cls: Type[ModelT], response: httpx.Response) -> ModelT:
+        return self.json_codec.load_model(model_cls, response.content)
+
+    def _new_request_metrics(self, method: str, url: str) -> Optional[RequestMetrics]:
+        return RequestMetrics(method, url) if self.metrics_sink is not None else None
+
+    def _new_stream_metrics(self, method: str, url: str) -> Optional[StreamMetrics]:
+        return StreamMetrics(method, url) if self.metrics_sink is not None else None
+
+    def _new_attempts(self, method: str, url: str, metrics: Optional[RequestMetrics], kwargs: Dict[str, Any],
+                      is_async: bool = False) -> _Attempts:
+        if metrics is not None:
+            metrics.bind(kwargs, is_async=is_async)
+        retry_policy = self.retry_policy
+        if retry_policy is None or retry_policy.deadline is None:
+            return _Attempts(method, url, retry_policy, metrics)
+        timeout = kwargs.get("timeout", httpx.USE_CLIENT_DEFAULT)
+        timeout = self._prepare_timeout() if timeout is httpx.USE_CLIENT_DEFAULT else httpx.Timeout(timeout)
+        return _Attempts(method, url, retry_policy, metrics, kwargs, timeout)
+
+    def _report_request(self, metrics: Optional[RequestMetrics], response: Optional[httpx.Response],
+                        error: Optional[Exception] = None):
+        if metrics is not None:
+            metrics.finish(response, error)
+            self.metrics_sink.on_request(metrics)
+
+    def _report_stream(self, metrics: Optional[StreamMetrics], response: Optional[httpx.Response],
+                       error: Optional[Exception] = None):
+        if metrics is not None:
+            metrics.finish(response, error)
+            self.metrics_sink.on_stream(metrics)
+
+    def _parse_stream_event(self, call: _StreamCall, sse: ServerSentEvent) -> Any:
+        metrics = call.metrics
+        if metrics is None:
+            event = call.build(self.json_codec.loads(sse.data))
+        else:
+            started = time.perf_counter()
+            event = call.build(self.json_codec.loads(sse.data))
+            metrics.parse_time += time.perf_counter() - started
+        if self.usage_aggregator is not None:
+            self.usage_aggregator.record_event(event, self.app_name, call.user, call.node_usage)
+        return event
+
+    @staticmethod
+    def _build_resumed_workflows_finished(task_id: Optional[str], detail: models.WorkflowsRunDetailResponse) \
+            -> models.WorkflowsStreamResponse:
+        return models.WorkflowsStreamResponse(
+            event=models.StreamEvent.WORKFLOW_FINISHED,
+            task_id=task_id,
+            workflow_run_id=detail.id,
+            data=models.WorkflowFinishedData(
+                id=detail.id,
+                workflow_id=detail.workflow_id,
+                status=detail.status,
+                outputs=detail.outputs if isinstance(detail.outputs, dict) else None,
+                error=detail.error,
+                elapsed_time=detail.elapsed_time,
+                total_tokens=detail.total_tokens,
+                total_steps=detail.total_steps,
+                created_at=detail.created_at,
+                finished_at=detail.finished_at,
+            ),
+        )
+
+    def _raise_for_status(self, response: httpx.Response):
+        rate_limiter = self.rate_limiter
+        if response.is_success:
+            if rate_limiter is not None:
+                rate_limiter.on_success()
+            return
+        try:
+            errors.raise_for_response(response)
+        except errors.DifyAPIError as e:
+            if rate_limiter is not None and (e.status == HTTPStatus.TOO_MANY_REQUESTS or
+                                             isinstance(e, errors.DifyProviderQuotaExceeded)):
+                rate_limiter.on_throttle(e.retry_after)
+            raise
+
+    def _check_stream_response(self, response: httpx.Response) -> bool:
+        # False if the response is an error to be read and raised, instead of an event stream
+        if not _check_stream_content_type(response):
+            return False
+        if self.rate_limiter is not None:
+            self.rate_limiter.on_success()
+        return True
+
+    def _check_stream_event(self, sse: ServerSentEvent, metrics: Optional[StreamMetrics]) -> bool:
+        # raises the error events, and returns False for the events not to be yielded
+        if metrics is not None:
+            metrics.on_event()
+        try:
+            errors.raise_for_event(sse)
+        except errors.DifyProviderQuotaExceeded:
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_throttle()
+            raise
+        return sse.event not in IGNORED_STREAM_EVENTS and sse.data not in IGNORED_STREAM_EVENTS
+
+    def _get_completion_cache_key(self, req: models.CompletionRequest) -> str:
+        # blocking and streaming requests share their cache entries
+        return make_cache_key(self.api_base, self.api_key, req, exclude={"response_mode"})
+
+    def _get_cached_completion(self, key: str) -> Optional[models.CompletionResponse]:
+        cached = self.completion_cache.get(key)
+        return models.CompletionResponse.model_validate_json(cached) if cached is not None else None
+
+    def _set_cached_completion(self, key: str, response: models.CompletionResponse):
+        self.completion_cache.set(key, response.model_dump_json())
+
+    def _get_cached_upload(self, user: str, digest: Optional[str]) \
+            -> Tuple[Optional[str], Optional[models.UploadFileResponse]]:
+        if self.upload_cache is None or digest is None:
+            return None, None
+        key = make_upload_cache_key(self.api_base, self.api_key, user, digest)
+        cached = self.upload_cache.get(key)
+        return key, models.UploadFileResponse.model_validate_json(cached) if cached is not None else None
+
+    def _replay_completion_stream(self, response: models.CompletionResponse) \
+            -> List[Union[models.MessageDelta, models.CompletionStreamResponse]]:
+        data = response.model_dump(mode="json", include={"message_id", "conversation_id", "created_at"})
+        return [
+            self._build_completion_stream_response({**data, models.STREAM_EVENT_KEY: models.StreamEvent.MESSAGE.value,
+                                                    "answer": response.answer}),
+            self._build_completion_stream_response({**data,
+                                                    models.STREAM_EVENT_KEY: models.StreamEvent.MESSAGE_END.value,
+                                                    "metadata": response.model_dump(mode="json")["metadata"]}),
+        ]
+
+    def _build_completion_stream_response(self, data: dict) \
+            -> Union[models.MessageDelta, models.CompletionStreamResponse]:
+        if self.fast_stream_deltas:
+            return models.build_completion_stream_delta(data)
+        return models.build_completion_stream_response(data)
+
+    def _build_chat_stream_response(self, data: dict) -> Union[models.MessageDelta, models.ChatStreamResponse]:
+        if self.fast_stream_deltas:
+            return models.build_chat_stream_delta(data)
+        return models.build_chat_stream_response(data)
+
+    def _parser(self, model_cls: Type[ModelT]) -> Callable[[httpx.Response], ModelT]:
+        return functools.partial(self._parse_response, model_cls)
+
+    def _parse_usage_response(self, model_cls: Type[ModelT], response: httpx.Response, user: Optional[str]) -> ModelT:
+        parsed = self._parse_response(model_cls, response)
+        if self.usage_aggregator is not None:
+            self.usage_aggregator.record_event(parsed, self.app_name, user)
+        return parsed
+
+    def _new_stream_call(self, url: str, build: Callable[[dict], Any], req: BaseModel, stop_endpoint: str,
+                         lookup: Optional[Callable[[], Optional[Iterable]]] = None,
+                         on_end: Optional[Callable[[], None]] = None, offload: bool = False,
+                         node_usage: bool = False) -> _StreamCall:
+        return _StreamCall(HTTPMethod.POST, url, build, self._new_stream_metrics(HTTPMethod.POST, url), req.user,
+                           stop_endpoint if self.stop_on_close else None, lookup, on_end, offload, node_usage, json=req)
+
+    def _feedback_call(self, message_id: str, req: models.FeedbackRequest) -> _Call:
+        return _Call(HTTPMethod.POST, self._prepare_url(ENDPOINT_FEEDBACKS, message_id=message_id),
+                     self._parser(models.FeedbackResponse), json=req)
+
+    def _suggest_call(self, message_id: str, req: models.ChatSuggestRequest) -> _Call:
+        return _Call(HTTPMethod.GET, self._prepare_url(ENDPOINT_SUGGESTED, message_id=message_id),
+                     self._parser(models.ChatSuggestResponse), params=req.model_dump())
+
+    def _upload_files_call(self, file: types.FileTypes, req: models.UploadFileRequest) -> _Call:
+        return _Call(HTTPMethod.POST, self._prepare_url(ENDPOINT_FILES_UPLOAD), self._parser(models.UploadFileResponse),
+                     data=req.model_dump(), files=[("file", file)])
+
+    def _multipart_call(self, endpoint: str, model_cls: Type[ModelT], body: MultipartStream,
+                        content: types.RequestContent, headers: Optional[Mapping[str, str]]) -> _Call:
+        # the content is the body itself, or its async iterator for the async client
+        return _Call(HTTPMethod.POST, self._prepare_url(endpoint), self._parser(model_cls), content=content,
+                     headers={**body.headers, **(headers or {})})
+
+    def _completion_call(self, req: models.CompletionRequest) -> Union[_Call, _StreamCall]:
+        url = self._prepare_url(ENDPOINT_COMPLETION_MESSAGES)
+        # the cache is only read and written when the call is sent
+        if req.response_mode == models.ResponseMode.BLOCKING:
+            parse = functools.partial(self._parse_usage_response, models.CompletionResponse, user=req.user)
+            if self.completion_cache is None:
+                return _Call(HTTPMethod.POST, url, parse, json=req)
+            cache_key = self._get_completion_cache_key(req)
+            return _Call(HTTPMethod.POST, url, parse, functools.partial(self._get_cached_completion, cache_key),
+                         functools.partial(self._set_cached_completion, cache_key), self.completion_cache.blocking,
+                         json=req)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            if self.completion_cache is None:
+                return self._new_stream_call(url, self._build_completion_stream_response, req,
+                                             ENDPOINT_STOP_COMPLETION_MESSAGES)
+            cache_key = self._get_completion_cache_key(req)
+            recorder = _CompletionStreamRecorder()
+
+            def lookup() -> Optional[List[Union[models.MessageDelta, models.CompletionStreamResponse]]]:
+                cached = self._get_cached_completion(cache_key)
+                return self._replay_completion_stream(cached) if cached is not None else None
+
+            def build(data: dict) -> Union[models.MessageDelta, models.CompletionStreamResponse]:
+                recorder.record(data)
+                return self._build_completion_stream_response(data)
+
+            def on_end():
+                if recorder.response is not None:
+                    self._set_cached_completion(cache_key, recorder.response)
+
+            return self._new_stream_call(url, build, req, ENDPOINT_STOP_COMPLETION_MESSAGES, lookup, on_end,
+                                         self.completion_cache.blocking)
+        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+
+    def _chat_call(self, req: models.ChatRequest) -> Union[_Call, _StreamCall]:
+        url = self._prepare_url(ENDPOINT_CHAT_MESSAGES)
+        if req.response_mode == models.ResponseMode.BLOCKING:
+            return _Call(HTTPMethod.POST, url,
+                         functools.partial(self._parse_usage_response, models.ChatResponse, user=req.user), json=req)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._new_stream_call(url, self._build_chat_stream_response, req, ENDPOINT_STOP_CHAT_MESSAGES)
+        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+
+    def _run_workflows_call(self, req: models.WorkflowsRunRequest) -> Union[_Call, _StreamCall]:
+        url = self._prepare_url(ENDPOINT_RUN_WORKFLOWS)
+        if req.response_mode == models.ResponseMode.BLOCKING:
+            return _Call(HTTPMethod.POST, url, self._parser(models.WorkflowsRunResponse), json=req)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._new_stream_call(url, models.build_workflows_stream_response, req, ENDPOINT_STOP_WORKFLOWS,
+                                         node_usage=True)
+        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+
+    def _workflows_run_detail_call(self, workflow_run_id: str) -> _Call:
+        return _Call(HTTPMethod.GET, self._prepare_url(ENDPOINT_WORKFLOWS_RUN_DETAIL, workflow_run_id=workflow_run_id),
+                     self._parser(models.WorkflowsRunDetailResponse))
+
+    def _stop_call(self, endpoint: str, task_id: str, req: models.StopRequest) -> _Call:
+        return _Call(HTTPMethod.POST, self._prepare_url(endpoint, task_id=task_id), self._parser(models.StopResponse),
+                     json=req)
+
+    def _get_abandoned_stop_call(self, call: _StreamCall, task_id: Optional[str], event: Any) -> Optional[_Call]:
+        # the task of an abandoned stream would keep generating, and billing, tokens nobody reads
+        if call.stop_endpoint is None or not task_id or getattr(event, "event", None) in FINISHED_STREAM_EVENTS:
+            return None
+        return self._stop_call(call.stop_endpoint, task_id, models.StopRequest(user=call.user))
+
+    def _prepare_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _prepare_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            self.timeout,
+            connect=self.connect_timeout if self.connect_timeout is not None else self.timeout,
+            read=self.read_timeout if self.read_timeout is not None else self.timeout,
+            write=self.write_timeout if self.write_timeout is not None else self.timeout,
+            pool=self.pool_timeout if self.pool_timeout is not None else self.timeout,
+        )
+
+
+class Client(_BaseClient):
+    _http_client: Optional[httpx.Client] = PrivateAttr(default=None)
+    _background: BackgroundRunner = PrivateAttr(default_factory=lambda: BackgroundRunner(max_pending=MAX_PENDING_STOPS))
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection pool owned by this client, and drops its pending background stops. A new pool is
+        created if the client is used again.
+        """
+        self._background.shutdown()
+        with self._http_client_lock:
+            http_client, self._http_client = self._http_client, None
+        if http_client is not None:
+            http_client.close()
+
+    def _get_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            with self._http_client_lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=self._prepare_limits(), timeout=self._prepare_timeout(),
+                                                     http2=self.http2)
+        return self._http_client
+
     def request(self, endpoint: str, method: str,
                 content: Optional[types.RequestContent] = None,
                 data: Optional[types.RequestData] = None,
@@ -68,7 +464,7 @@ class Client(BaseModel):
             content: Raw content to include in the request body.
             data: Form data to include in the request body.
             files: Files to include in the request body.
-            json: JSON data to include in the request body.
+            json: JSON data, or a pydantic model, to include in the request body.
             params: Query parameters to include in the request URL.
             headers: Additional headers to include in the request.
             **kwargs: Extra keyword arguments to pass to the request function.
@@ -79,15 +475,26 @@ class Client(BaseModel):
         Raises:
             Various DifyAPIError exceptions if the response contains an error.
         """
-        merged_headers = {}
-        if headers:
-            merged_headers.update(headers)
-        self._prepare_auth_headers(merged_headers)
-
-        response = _httpx_client.request(method, endpoint, content=content, data=data, files=files, json=json,
-                                         params=params, headers=merged_headers, **kwargs)
-        errors.raise_for_status(response)
-        return response
+        merged_headers, content = self._prepare_body(headers, content, json)
+        attempts = self._new_attempts(method, endpoint, self._new_request_metrics(method, endpoint), kwargs)
+        while True:
+            response = None
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                attempts.start()
+                response = self._get_http_client().request(method, endpoint, content=content, data=data, files=files,
+                                                           params=params, headers=merged_headers, **kwargs)
+                self._raise_for_status(response)
+            except Exception as e:
+                delay = attempts.get_retry_delay(e)
+                if delay is None:
+                    self._report_request(attempts.metrics, response, e)
+                    raise
+                time.sleep(delay)
+                continue
+            self._report_request(attempts.metrics, response)
+            return response
 
     def request_stream(self, endpoint: str, method: str,
                        content: Optional[types.RequestContent] = None,
@@ -107,7 +514,7 @@ class Client(BaseModel):
             content: Raw content to include in the request body.
             data: Form data to include in the request body.
             files: Files to include in the request body.
-            json: JSON data to include in the request body.
+            json: JSON data, or a pydantic model, to include in the request body.
             params: Query parameters to include in the request URL.
             headers: Additional headers to include in the request.
             **kwargs: Extra keyword arguments to pass to the request function.
@@ -118,21 +525,78 @@ class Client(BaseModel):
         Raises:
             Various DifyAPIError exceptions if an error event is received in the stream.
         """
-        merged_headers = {}
-        if headers:
-            merged_headers.update(headers)
-        self._prepare_auth_headers(merged_headers)
-
-        with connect_sse(_httpx_client, method, endpoint, headers=merged_headers,
-                         content=content, data=data, files=files, json=json, params=params, **kwargs) as event_source:
-            if not _check_stream_content_type(event_source.response):
-                event_source.response.read()
-                errors.raise_for_status(event_source.response)
-            for sse in event_source.iter_sse():
-                errors.raise_for_status(sse)
-                if sse.event in IGNORED_STREAM_EVENTS or sse.data in IGNORED_STREAM_EVENTS:
-                    continue
-                yield sse
+        return self._request_stream(endpoint, method, self._new_stream_metrics(method, endpoint), content=content,
+                                    data=data, files=files, json=json, params=params, headers=headers, **kwargs)
+
+    def _request_stream(self, endpoint: str, method: str, metrics: Optional[StreamMetrics],
+                        content: Optional[types.RequestContent] = None,
+                        data: Optional[types.RequestData] = None,
+                        files: Optional[types.RequestFiles] = None,
+                        json: Optional[Any] = None,
+                        params: Optional[types.QueryParamTypes] = None,
+                        headers: Optional[Mapping[str, str]] = None,
+                        **kwargs,
+                        ) -> Iterator[ServerSentEvent]:
+        merged_headers, content = self._prepare_body(headers, content, json)
+        attempts = self._new_attempts(method, endpoint, metrics, kwargs)
+        response, error = None, None
+        try:
+            while True:
+                streaming, response = False, None
+                try:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.acquire()
+                    attempts.start()
+                    with connect_sse(self._get_http_client(), method, endpoint, headers=merged_headers,
+                                     content=content, data=data, files=files, params=params,
+                                     **kwargs) as event_source:
+                        response = event_source.response
+                        if not self._check_stream_response(response):
+                            response.read()
+                            self._raise_for_status(response)
+                        for sse in event_source.iter_sse():
+                            streaming = True
+                            if self._check_stream_event(sse, metrics):
+                                yield sse
+                    return
+                except Exception as e:
+                    delay = None if streaming else attempts.get_retry_delay(e)
+                    if delay is None:
+                        error = e
+                        raise
+                time.sleep(delay)
+        finally:
+            self._report_stream(metrics, response, error)
+
+    def _request_bytes_stream(self, endpoint: str, method: str, chunk_size: Optional[int] = None,
+                              headers: Optional[Mapping[str, str]] = None, **kwargs) -> Iterator[bytes]:
+        merged_headers, content = self._prepare_body(headers, kwargs.pop("content", None), kwargs.pop("json", None))
+        attempts = self._new_attempts(method, endpoint, self._new_request_metrics(method, endpoint), kwargs)
+        response, error = None, None
+        try:
+            while True:
+                streaming, response = False, None
+                try:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.acquire()
+                    attempts.start()
+                    with self._get_http_client().stream(method, endpoint, content=content, headers=merged_headers,
+                                                        **kwargs) as response:
+                        if not response.is_success:
+                            response.read()
+                        self._raise_for_status(response)
+                        for chunk in response.iter_bytes(chunk_size):
+                            streaming = True
+                            yield chunk
+                    return
+                except Exception as e:
+                    delay = None if streaming else attempts.get_retry_delay(e)
+                    if delay is None:
+                        error = e
+                        raise
+                time.sleep(delay)
+        finally:
+            self._report_request(attempts.metrics, response, error)
 
     def feedback_messages(self, message_id: str, req: models.FeedbackRequest, **kwargs) -> models.FeedbackResponse:
         """
@@ -146,13 +610,7 @@ class Client(BaseModel):
         Returns:
             A `FeedbackResponse` object containing the result of the feedback submission.
         """
-        response = self.request(
-            self._prepare_url(ENDPOINT_FEEDBACKS, message_id=message_id),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.FeedbackResponse(**response.json())
+        return self._send(self._feedback_call(message_id, req), **kwargs)
 
     def suggest_messages(self, message_id: str, req: models.ChatSuggestRequest, **kwargs) -> models.ChatSuggestResponse:
         """
@@ -166,13 +624,7 @@ class Client(BaseModel):
         Returns:
             A `ChatSuggestResponse` object containing suggested messages.
         """
-        response = self.request(
-            self._prepare_url(ENDPOINT_SUGGESTED, message_id=message_id),
-            HTTPMethod.GET,
-            params=req.model_dump(),
-            **kwargs,
-        )
-        return models.ChatSuggestResponse(**response.json())
+        return self._send(self._suggest_call(message_id, req), **kwargs)
 
     def upload_files(self, file: types.FileTypes, req: models.UploadFileRequest,
                      **kwargs) -> models.UploadFileResponse:
@@ -188,14 +640,73 @@ class Client(BaseModel):
         Returns:
             An `UploadFileResponse` object containing details about the uploaded file, such as its identifier and URL.
         """
-        response = self.request(
-            self._prepare_url(ENDPOINT_FILES_UPLOAD),
-            HTTPMethod.POST,
-            data=req.model_dump(),
-            files=[("file", file)],
-            **kwargs,
-        )
-        return models.UploadFileResponse(**response.json())
+        return self._send(self._upload_files_call(file, req), **kwargs)
+
+    def upload_files_stream(self, file: UploadSource, req: models.UploadFileRequest,
+                            filename: Optional[str] = None, mime_type: Optional[str] = None,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, use_mmap: bool = False,
+                            progress: Optional[UploadProgress] = None, **kwargs) -> models.UploadFileResponse:
+        """
+        Uploads a file without reading it into memory, the multipart body is built and sent chunk by chunk.
+
+        Args:
+            file: The file to upload. This can be a path, a binary file-like object, bytes, or an iterator of bytes.
+            req: An `UploadFileRequest` object containing the upload details, such as the user who is uploading.
+            filename: The name of the uploaded file, guessed from the path or the file object if unset.
+            mime_type: The MIME type of the uploaded file, guessed from the filename if unset.
+            chunk_size: The size in bytes of the chunks read from the file.
+            use_mmap: Reads the file through a memory map when it is given as a path.
+            progress: Called after each chunk with the number of bytes sent and the file size, if known.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An `UploadFileResponse` object containing details about the uploaded file, such as its identifier and URL.
+        """
+        body = MultipartStream(req.model_dump(exclude_none=True), "file", file, filename=filename,
+                               mime_type=mime_type, chunk_size=chunk_size, use_mmap=use_mmap, progress=progress)
+        call = self._multipart_call(ENDPOINT_FILES_UPLOAD, models.UploadFileResponse, body, body,
+                                    kwargs.pop("headers", None))
+        return self._send(call, **kwargs)
+
+    def bulk_upload(self, files: Iterable[UploadSource], req: models.UploadFileRequest, max_concurrency: int = 4,
+                    **kwargs) -> List[models.UploadFileResponse]:
+        """
+        Uploads several files concurrently, each file content being uploaded only once per user.
+
+        Files with the same content are uploaded once, and with `upload_cache` set, content uploaded before by the
+        same user is not uploaded again, its cached file id is returned instead.
+
+        Args:
+            files: The files to upload, as accepted by `upload_files_stream`. Iterators of bytes are always uploaded.
+            req: An `UploadFileRequest` object containing the upload details, such as the user who is uploading.
+            max_concurrency: The maximum number of files hashed or uploaded at the same time.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            The `UploadFileResponse` objects of the files, in input order.
+        """
+        files = list(files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            digests = list(executor.map(hash_upload_source, files))
+            futures, uploads = [], {}
+            for file, digest in zip(files, digests):
+                future = uploads.get(digest) if digest is not None else None
+                if future is None:
+                    future = executor.submit(self._bulk_upload_item, file, digest, req, **kwargs)
+                    if digest is not None:
+                        uploads[digest] = future
+                futures.append(future)
+            return [future.result() for future in futures]
+
+    def _bulk_upload_item(self, file: UploadSource, digest: Optional[str], req: models.UploadFileRequest,
+                          **kwargs) -> models.UploadFileResponse:
+        cache_key, cached = self._get_cached_upload(req.user, digest)
+        if cached is not None:
+            return cached
+        uploaded = self.upload_files_stream(file, req, **kwargs)
+        if cache_key is not None:
+            self.upload_cache.set(cache_key, uploaded.model_dump_json())
+        return uploaded
 
     def completion_messages(self, req: models.CompletionRequest, **kwargs) \
             -> Union[models.CompletionResponse, Iterator[models.CompletionStreamResponse]]:
@@ -207,31 +718,7 @@ class Client(BaseModel):
             If the response mode is streaming, it returns an iterator of `CompletionStreamResponse` objects containing
             the stream of generated events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return self._completion_messages(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._completion_messages_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
-
-    def _completion_messages(self, req: models.CompletionRequest, **kwargs) -> models.CompletionResponse:
-        response = self.request(
-            self._prepare_url(ENDPOINT_COMPLETION_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.CompletionResponse(**response.json())
-
-    def _completion_messages_stream(self, req: models.CompletionRequest, **kwargs) \
-            -> Iterator[models.CompletionStreamResponse]:
-        event_source = self.request_stream(
-            self._prepare_url(ENDPOINT_COMPLETION_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        for sse in event_source:
-            yield models.build_completion_stream_response(sse.json())
+        return self._execute(self._completion_call(req), **kwargs)
 
     def stop_completion_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -240,7 +727,7 @@ class Client(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return self._stop_stream(self._prepare_url(ENDPOINT_STOP_COMPLETION_MESSAGES, task_id=task_id), req, **kwargs)
+        return self._send(self._stop_call(ENDPOINT_STOP_COMPLETION_MESSAGES, task_id, req), **kwargs)
 
     def chat_messages(self, req: models.ChatRequest, **kwargs) \
             -> Union[models.ChatResponse, Iterator[models.ChatStreamResponse]]:
@@ -252,30 +739,32 @@ class Client(BaseModel):
             If the response mode is streaming, it returns an iterator of `ChatStreamResponse` objects containing the
             stream of chat events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return self._chat_messages(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._chat_messages_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+        return self._execute(self._chat_call(req), **kwargs)
 
-    def _chat_messages(self, req: models.ChatRequest, **kwargs) -> models.ChatResponse:
-        response = self.request(
-            self._prepare_url(ENDPOINT_CHAT_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.ChatResponse(**response.json())
+    def chat_messages_audio(self, req: models.ChatRequest, sink: Optional[Any] = None, **kwargs) -> Iterator[bytes]:
+        """
+        Streams the speech of a chat answer, for apps with text to speech auto-play enabled.
 
-    def _chat_messages_stream(self, req: models.ChatRequest, **kwargs) -> Iterator[models.ChatStreamResponse]:
-        event_source = self.request_stream(
-            self._prepare_url(ENDPOINT_CHAT_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        for sse in event_source:
-            yield models.build_chat_stream_response(sse.json())
+        The base64 audio of the TTS events is decoded incrementally as it is received, and the other events are
+        skipped without building their stream responses.
+
+        Args:
+            req: A `ChatRequest` object, its response mode is ignored.
+            sink: An object with a `write(bytes)` method receiving the decoded audio, e.g. a file or a socket file.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An iterator of decoded audio chunks.
+        """
+        decoder = TTSAudioDecoder(sink)
+        for sse in self.request_stream(
+                self._prepare_url(ENDPOINT_CHAT_MESSAGES),
+                HTTPMethod.POST,
+                json=req.model_copy(update={"response_mode": models.ResponseMode.STREAMING}),
+                **kwargs):
+            chunk = decoder.feed_sse_data(sse.data)
+            if chunk:
+                yield chunk
 
     def stop_chat_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -284,7 +773,7 @@ class Client(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return self._stop_stream(self._prepare_url(ENDPOINT_STOP_CHAT_MESSAGES, task_id=task_id), req, **kwargs)
+        return self._send(self._stop_call(ENDPOINT_STOP_CHAT_MESSAGES, task_id, req), **kwargs)
 
     def run_workflows(self, req: models.WorkflowsRunRequest, **kwargs) \
             -> Union[models.WorkflowsRunResponse, Iterator[models.WorkflowsRunStreamResponse]]:
@@ -297,31 +786,125 @@ class Client(BaseModel):
             If the response mode is streaming, it returns an iterator of `WorkflowsRunStreamResponse` objects
             containing the stream of workflow events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return self._run_workflows(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._run_workflows_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+        return self._execute(self._run_workflows_call(req), **kwargs)
 
-    def _run_workflows(self, req: models.WorkflowsRunRequest, **kwargs) -> models.WorkflowsRunResponse:
-        response = self.request(
-            self._prepare_url(ENDPOINT_RUN_WORKFLOWS),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.WorkflowsRunResponse(**response.json())
-
-    def _run_workflows_stream(self, req: models.WorkflowsRunRequest, **kwargs) \
+    def run_workflows_resumable(self, req: models.WorkflowsRunRequest, max_reconnects: int = 5,
+                                backoff_base: float = 1., backoff_max: float = 16., **kwargs) \
             -> Iterator[models.WorkflowsRunStreamResponse]:
-        event_source = self.request_stream(
-            self._prepare_url(ENDPOINT_RUN_WORKFLOWS),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        for sse in event_source:
-            yield models.build_workflows_stream_response(sse.json())
+        """
+        Runs a workflow in streaming mode and survives the stream being dropped mid-run.
+
+        The Service API cannot replay a dropped stream, so instead of running the workflow again this follows the
+        run through `get_workflows_run`, polling with an exponential backoff until it is over, and then yields a
+        `workflow_finished` event built from the run details. The node events emitted while disconnected are lost.
+
+        Args:
+            req: A `WorkflowsRunRequest` object, its response mode is ignored.
+            max_reconnects: The maximum number of consecutive failed attempts to fetch the run details.
+            backoff_base: The initial delay in seconds between two attempts.
+            backoff_max: The maximum delay in seconds between two attempts.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An iterator of `WorkflowsRunStreamResponse` objects containing the stream of workflow events.
+        """
+        req = req.model_copy(update={"response_mode": models.ResponseMode.STREAMING})
+        task_id, workflow_run_id = None, None
+        try:
+            for event in self._stream(self._run_workflows_call(req), **kwargs):
+                task_id = task_id or event.task_id
+                workflow_run_id = workflow_run_id or getattr(event, "workflow_run_id", None)
+                yield event
+                if event.event == models.StreamEvent.WORKFLOW_FINISHED:
+                    return
+        except httpx.TransportError:
+            if not workflow_run_id:
+                raise
+        if not workflow_run_id:
+            return
+
+        failures, delay = 0, backoff_base
+        while True:
+            time.sleep(delay)
+            delay = min(backoff_max, delay * 2)
+            try:
+                detail = self.get_workflows_run(workflow_run_id, **kwargs)
+            except (httpx.TransportError, errors.DifyInternalServerError):
+                failures += 1
+                if failures > max_reconnects:
+                    raise
+                continue
+            failures = 0
+            if detail.status not in (None, models.WorkflowStatus.RUNNING):
+                yield self._build_resumed_workflows_finished(task_id, detail)
+                return
+
+    def get_workflows_run(self, workflow_run_id: str, **kwargs) -> models.WorkflowsRunDetailResponse:
+        """
+        Retrieves the current state and results of a workflow run.
+
+        Args:
+            workflow_run_id: The identifier of the workflow run.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            A `WorkflowsRunDetailResponse` object containing the status and outputs of the run.
+        """
+        return self._send(self._workflows_run_detail_call(workflow_run_id), **kwargs)
+
+    def run_workflows_batch(self, reqs: Iterable[models.WorkflowsRunRequest], max_concurrency: int = 8,
+                            ordered: bool = False, **kwargs) -> Iterator[models.WorkflowsBatchResult]:
+        """
+        Executes a batch of blocking workflow runs on a thread pool, keeping at most `max_concurrency` in flight.
+
+        Requests are pulled from `reqs` lazily, so memory stays flat regardless of the batch size. A failed run is
+        reported in its result and does not abort the batch.
+
+        Args:
+            reqs: An iterable of `WorkflowsRunRequest` objects with the blocking response mode.
+            max_concurrency: The maximum number of workflow runs in flight.
+            ordered: Yields the results in input order if set, otherwise in completion order.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An iterator of `WorkflowsBatchResult` objects, each carrying either the response or the error of a run.
+        """
+        requests = enumerate(reqs)
+        in_flight = collections.deque()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+        def submit(count: int):
+            for index, req in itertools.islice(requests, count):
+                in_flight.append(executor.submit(self._run_workflows_batch_item, index, req, **kwargs))
+
+        try:
+            submit(max_concurrency)
+            while in_flight:
+                if ordered:
+                    done = (in_flight.popleft(),)
+                    concurrent.futures.wait(done)
+                else:
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                submit(len(done))
+                for future in done:
+                    yield future.result()
+        finally:
+            # a batch closed early does not wait for the runs already started, they finish in the background
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _run_workflows_batch_item(self, index: int, req: models.WorkflowsRunRequest, **kwargs) \
+            -> models.WorkflowsBatchResult:
+        try:
+            if req.response_mode != models.ResponseMode.BLOCKING:
+                raise ValueError(f"Invalid request_mode for batch execution: {req.response_mode}")
+            response = self._send(self._run_workflows_call(req), **kwargs)
+            return models.WorkflowsBatchResult(index=index, request=req, response=response)
+        except Exception as e:
+            return models.WorkflowsBatchResult(index=index, request=req, error=e)
 
     def stop_workflows(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -330,28 +913,123 @@ class Client(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return self._stop_stream(self._prepare_url(ENDPOINT_STOP_WORKFLOWS, task_id=task_id), req, **kwargs)
+        return self._send(self._stop_call(ENDPOINT_STOP_WORKFLOWS, task_id, req), **kwargs)
+
+    def _execute(self, call: Union[_Call, _StreamCall], **kwargs) -> Any:
+        if isinstance(call, _StreamCall):
+            return self._stream(call, **kwargs)
+        return self._send(call, **kwargs)
+
+    def _send(self, call: _Call, **kwargs) -> Any:
+        if call.lookup is not None:
+            result = call.lookup()
+            if result is not None:
+                return result
+        result = call.parse(self.request(call.url, call.method, **call.options, **kwargs))
+        if call.store is not None:
+            call.store(result)
+        return result
+
+    def _stream(self, call: _StreamCall, **kwargs) -> Iterator[Any]:
+        replay = call.lookup() if call.lookup is not None else None
+        if replay is not None:
+            yield from replay
+            return
+        task_id, event = None, None
+        try:
+            for sse in self._request_stream(call.url, call.method, call.metrics, **call.options, **kwargs):
+                event = self._parse_stream_event(call, sse)
+                if task_id is None:
+                    task_id = getattr(event, "task_id", None)
+                yield event
+        except GeneratorExit:
+            stop_call = self._get_abandoned_stop_call(call, task_id, event)
+            if stop_call is not None:
+                self._background.submit(self._send_background_stop, stop_call)
+            raise
+        if call.on_end is not None:
+            call.on_end()
+
+    def _send_background_stop(self, call: _Call):
+        # skipped once the client is closed, not to create a new connection pool for it
+        if self._http_client is not None:
+            self._send(call)
+
+    def text_to_audio(self, req: models.TextToAudioRequest, chunk_size: Optional[int] = None, **kwargs) \
+            -> Iterator[bytes]:
+        """
+        Converts text to speech, streaming the audio out chunk by chunk as it is synthesized.
+
+        Args:
+            req: A `TextToAudioRequest` object containing the text or the message to convert.
+            chunk_size: The size in bytes of the yielded chunks, the chunks are yielded as received if unset.
+            **kwargs: Extra keyword arguments to pass to the request function.
 
-    def _stop_stream(self, endpoint: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
-        response = self.request(
-            endpoint,
+        Returns:
+            An iterator of audio bytes, which can be written straight to a file or a socket.
+        """
+        return self._request_bytes_stream(
+            self._prepare_url(ENDPOINT_TEXT_TO_AUDIO),
             HTTPMethod.POST,
-            json=req.model_dump(),
+            json=req.model_dump(exclude_none=True),
+            chunk_size=chunk_size,
             **kwargs,
         )
-        return models.StopResponse(**response.json())
 
-    def _prepare_url(self, endpoint: str, **kwargs) -> str:
-        return self.api_base + endpoint.format(**kwargs)
+    def audio_to_text(self, file: UploadSource, req: models.AudioToTextRequest, filename: Optional[str] = None,
+                      mime_type: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      **kwargs) -> models.AudioToTextResponse:
+        """
+        Converts speech to text, the audio is streamed to the server without being read into memory.
 
-    def _prepare_auth_headers(self, headers: Dict[str, str]):
-        if "authorization" not in (key.lower() for key in headers.keys()):
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        Args:
+            file: The audio to convert, as accepted by `upload_files_stream`. The filename must carry a supported
+            audio extension (mp3, mp4, mpeg, mpga, m4a, wav or webm), pass it for file objects and iterators.
+            req: An `AudioToTextRequest` object containing the request details.
+            filename: The name of the audio file, guessed from the path or the file object if unset.
+            mime_type: The MIME type of the audio, guessed from the filename if unset.
+            chunk_size: The size in bytes of the chunks read from the audio.
+            **kwargs: Extra keyword arguments to pass to the request function.
 
+        Returns:
+            An `AudioToTextResponse` object containing the recognized text.
+        """
+        body = MultipartStream(req.model_dump(exclude_none=True), "file", file, filename=filename,
+                               mime_type=mime_type, chunk_size=chunk_size)
+        call = self._multipart_call(ENDPOINT_AUDIO_TO_TEXT, models.AudioToTextResponse, body, body,
+                                    kwargs.pop("headers", None))
+        return self._send(call, **kwargs)
 
-class AsyncClient(BaseModel):
-    api_key: str
-    api_base: Optional[str] = "https://api.dify.ai/v1"
+
+class AsyncClient(_BaseClient):
+    _http_client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    _background_stops: set = PrivateAttr(default_factory=set)
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Closes the connection pool owned by this client, and cancels its pending background stops. A new pool is
+        created if the client is used again.
+        """
+        for task in list(self._background_stops):
+            task.cancel()
+        with self._http_client_lock:
+            http_client, self._http_client = self._http_client, None
+        if http_client is not None:
+            await http_client.aclose()
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            with self._http_client_lock:
+                if self._http_client is None:
+                    self._http_client = httpx.AsyncClient(limits=self._prepare_limits(),
+                                                          timeout=self._prepare_timeout(), http2=self.http2)
+        return self._http_client
 
     async def arequest(self, endpoint: str, method: str,
                        content: Optional[types.RequestContent] = None,
@@ -371,7 +1049,7 @@ class AsyncClient(BaseModel):
             content: Raw content to include in the request body, if any.
             data: Form data to be sent in the request body.
             files: Files to be uploaded with the request.
-            json: JSON data to be sent in the request body.
+            json: JSON data, or a pydantic model, to be sent in the request body.
             params: Query parameters to be included in the request URL.
             headers: Additional headers to be sent with the request.
             **kwargs: Extra keyword arguments to be passed to the underlying HTTPX request function.
@@ -382,25 +1060,38 @@ class AsyncClient(BaseModel):
         Raises:
             Various DifyAPIError exceptions if the response contains an error.
         """
-        merged_headers = {}
-        if headers:
-            merged_headers.update(headers)
-        self._prepare_auth_headers(merged_headers)
-
-        response = await _async_httpx_client.request(method, endpoint, content=content, data=data, files=files,
-                                                     json=json, params=params, headers=merged_headers, **kwargs)
-        errors.raise_for_status(response)
-        return response
-
-    async def arequest_stream(self, endpoint: str, method: str,
-                              content: Optional[types.RequestContent] = None,
-                              data: Optional[types.RequestData] = None,
-                              files: Optional[types.RequestFiles] = None,
-                              json: Optional[Any] = None,
-                              params: Optional[types.QueryParamTypes] = None,
-                              headers: Optional[Mapping[str, str]] = None,
-                              **kwargs,
-                              ) -> AsyncIterator[ServerSentEvent]:
+        merged_headers, content = self._prepare_body(headers, content, json)
+        attempts = self._new_attempts(method, endpoint, self._new_request_metrics(method, endpoint), kwargs,
+                                      is_async=True)
+        while True:
+            response = None
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.aacquire()
+                attempts.start()
+                response = await self._get_http_client().request(method, endpoint, content=content, data=data,
+                                                                 files=files, params=params, headers=merged_headers,
+                                                                 **kwargs)
+                self._raise_for_status(response)
+            except Exception as e:
+                delay = attempts.get_retry_delay(e)
+                if delay is None:
+                    self._report_request(attempts.metrics, response, e)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._report_request(attempts.metrics, response)
+            return response
+
+    def arequest_stream(self, endpoint: str, method: str,
+                        content: Optional[types.RequestContent] = None,
+                        data: Optional[types.RequestData] = None,
+                        files: Optional[types.RequestFiles] = None,
+                        json: Optional[Any] = None,
+                        params: Optional[types.QueryParamTypes] = None,
+                        headers: Optional[Mapping[str, str]] = None,
+                        **kwargs,
+                        ) -> AsyncIterator[ServerSentEvent]:
         """
         Asynchronously establishes a streaming connection to the specified Dify API endpoint.
 
@@ -410,7 +1101,7 @@ class AsyncClient(BaseModel):
             content: Raw content to include in the request body, if any.
             data: Form data to be sent in the request body.
             files: Files to be uploaded with the request.
-            json: JSON data to be sent in the request body.
+            json: JSON data, or a pydantic model, to be sent in the request body.
             params: Query parameters to be included in the request URL.
             headers: Additional headers to be sent with the request.
             **kwargs: Extra keyword arguments to be passed to the underlying HTTPX request function.
@@ -421,22 +1112,79 @@ class AsyncClient(BaseModel):
         Raises:
             Various DifyAPIError exceptions if an error event is received in the stream.
         """
-        merged_headers = {}
-        if headers:
-            merged_headers.update(headers)
-        self._prepare_auth_headers(merged_headers)
-
-        async with aconnect_sse(_async_httpx_client, method, endpoint, headers=merged_headers,
-                                content=content, data=data, files=files, json=json, params=params,
-                                **kwargs) as event_source:
-            if not _check_stream_content_type(event_source.response):
-                await event_source.response.aread()
-                errors.raise_for_status(event_source.response)
-            async for sse in event_source.aiter_sse():
-                errors.raise_for_status(sse)
-                if sse.event in IGNORED_STREAM_EVENTS or sse.data in IGNORED_STREAM_EVENTS:
-                    continue
-                yield sse
+        return self._arequest_stream(endpoint, method, self._new_stream_metrics(method, endpoint), content=content,
+                                     data=data, files=files, json=json, params=params, headers=headers, **kwargs)
+
+    async def _arequest_stream(self, endpoint: str, method: str, metrics: Optional[StreamMetrics],
+                               content: Optional[types.RequestContent] = None,
+                               data: Optional[types.RequestData] = None,
+                               files: Optional[types.RequestFiles] = None,
+                               json: Optional[Any] = None,
+                               params: Optional[types.QueryParamTypes] = None,
+                               headers: Optional[Mapping[str, str]] = None,
+                               **kwargs,
+                               ) -> AsyncIterator[ServerSentEvent]:
+        merged_headers, content = self._prepare_body(headers, content, json)
+        attempts = self._new_attempts(method, endpoint, metrics, kwargs, is_async=True)
+        response, error = None, None
+        try:
+            while True:
+                streaming, response = False, None
+                try:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.aacquire()
+                    attempts.start()
+                    async with aconnect_sse(self._get_http_client(), method, endpoint, headers=merged_headers,
+                                            content=content, data=data, files=files, params=params,
+                                            **kwargs) as event_source:
+                        response = event_source.response
+                        if not self._check_stream_response(response):
+                            await response.aread()
+                            self._raise_for_status(response)
+                        async for sse in event_source.aiter_sse():
+                            streaming = True
+                            if self._check_stream_event(sse, metrics):
+                                yield sse
+                    return
+                except Exception as e:
+                    delay = None if streaming else attempts.get_retry_delay(e)
+                    if delay is None:
+                        error = e
+                        raise
+                await asyncio.sleep(delay)
+        finally:
+            self._report_stream(metrics, response, error)
+
+    async def _arequest_bytes_stream(self, endpoint: str, method: str, chunk_size: Optional[int] = None,
+                                     headers: Optional[Mapping[str, str]] = None, **kwargs) -> AsyncIterator[bytes]:
+        merged_headers, content = self._prepare_body(headers, kwargs.pop("content", None), kwargs.pop("json", None))
+        attempts = self._new_attempts(method, endpoint, self._new_request_metrics(method, endpoint), kwargs,
+                                      is_async=True)
+        response, error = None, None
+        try:
+            while True:
+                streaming, response = False, None
+                try:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.aacquire()
+                    attempts.start()
+                    async with self._get_http_client().stream(method, endpoint, content=content,
+                                                              headers=merged_headers, **kwargs) as response:
+                        if not response.is_success:
+                            await response.aread()
+                        self._raise_for_status(response)
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            streaming = True
+                            yield chunk
+                    return
+                except Exception as e:
+                    delay = None if streaming else attempts.get_retry_delay(e)
+                    if delay is None:
+                        error = e
+                        raise
+                await asyncio.sleep(delay)
+        finally:
+            self._report_request(attempts.metrics, response, error)
 
     async def afeedback_messages(self, message_id: str, req: models.FeedbackRequest, **kwargs) \
             -> models.FeedbackResponse:
@@ -451,13 +1199,7 @@ class AsyncClient(BaseModel):
         Returns:
             A `FeedbackResponse` object containing the result of the feedback submission.
         """
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_FEEDBACKS, message_id=message_id),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.FeedbackResponse(**response.json())
+        return await self._asend(self._feedback_call(message_id, req), **kwargs)
 
     async def asuggest_messages(self, message_id: str, req: models.ChatSuggestRequest, **kwargs) \
             -> models.ChatSuggestResponse:
@@ -472,13 +1214,7 @@ class AsyncClient(BaseModel):
         Returns:
             A `ChatSuggestResponse` object containing suggested messages.
         """
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_SUGGESTED, message_id=message_id),
-            HTTPMethod.GET,
-            params=req.model_dump(),
-            **kwargs,
-        )
-        return models.ChatSuggestResponse(**response.json())
+        return await self._asend(self._suggest_call(message_id, req), **kwargs)
 
     async def aupload_files(self, file: types.FileTypes, req: models.UploadFileRequest, **kwargs) \
             -> models.UploadFileResponse:
@@ -494,14 +1230,87 @@ class AsyncClient(BaseModel):
         Returns:
             An `UploadFileResponse` object containing details about the uploaded file, such as its identifier and URL.
         """
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_FILES_UPLOAD),
-            HTTPMethod.POST,
-            data=req.model_dump(),
-            files=[("file", file)],
-            **kwargs,
-        )
-        return models.UploadFileResponse(**response.json())
+        return await self._asend(self._upload_files_call(file, req), **kwargs)
+
+    async def aupload_files_stream(self, file: UploadSource, req: models.UploadFileRequest,
+                                   filename: Optional[str] = None, mime_type: Optional[str] = None,
+                                   chunk_size: int = DEFAULT_CHUNK_SIZE, use_mmap: bool = False,
+                                   progress: Optional[UploadProgress] = None, **kwargs) \
+            -> models.UploadFileResponse:
+        """
+        Uploads a file without reading it into memory, the multipart body is built and sent chunk by chunk.
+
+        Args:
+            file: The file to upload. This can be a path, a binary file-like object, bytes, or an iterator or async
+            iterator of bytes.
+            req: An `UploadFileRequest` object containing the upload details, such as the user who is uploading.
+            filename: The name of the uploaded file, guessed from the path or the file object if unset.
+            mime_type: The MIME type of the uploaded file, guessed from the filename if unset.
+            chunk_size: The size in bytes of the chunks read from the file.
+            use_mmap: Reads the file through a memory map when it is given as a path.
+            progress: Called after each chunk with the number of bytes sent and the file size, if known.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An `UploadFileResponse` object containing details about the uploaded file, such as its identifier and URL.
+        """
+        body = MultipartStream(req.model_dump(exclude_none=True), "file", file, filename=filename,
+                               mime_type=mime_type, chunk_size=chunk_size, use_mmap=use_mmap, progress=progress)
+        call = self._multipart_call(ENDPOINT_FILES_UPLOAD, models.UploadFileResponse, body, body.as_async(),
+                                    kwargs.pop("headers", None))
+        return await self._asend(call, **kwargs)
+
+    async def abulk_upload(self, files: Iterable[UploadSource], req: models.UploadFileRequest,
+                           max_concurrency: int = 4, **kwargs) -> List[models.UploadFileResponse]:
+        """
+        Uploads several files concurrently, each file content being uploaded only once per user.
+
+        Files with the same content are uploaded once, and with `upload_cache` set, content uploaded before by the
+        same user is not uploaded again, its cached file id is returned instead.
+
+        Args:
+            files: The files to upload, as accepted by `aupload_files_stream`. Iterators of bytes are always uploaded.
+            req: An `UploadFileRequest` object containing the upload details, such as the user who is uploading.
+            max_concurrency: The maximum number of files hashed or uploaded at the same time.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            The `UploadFileResponse` objects of the files, in input order.
+        """
+        files = list(files)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def hash_file(file: UploadSource) -> Optional[str]:
+            async with semaphore:
+                # hashing reads the file, keep it off the event loop
+                return await loop.run_in_executor(None, hash_upload_source, file)
+
+        async def upload_file(file: UploadSource, digest: Optional[str]) -> models.UploadFileResponse:
+            async with semaphore:
+                return await self._abulk_upload_item(file, digest, req, **kwargs)
+
+        digests = await asyncio.gather(*(hash_file(file) for file in files))
+        tasks, uploads = [], {}
+        for file, digest in zip(files, digests):
+            task = uploads.get(digest) if digest is not None else None
+            if task is None:
+                task = asyncio.ensure_future(upload_file(file, digest))
+                if digest is not None:
+                    uploads[digest] = task
+            tasks.append(task)
+        return list(await asyncio.gather(*tasks))
+
+    async def _abulk_upload_item(self, file: UploadSource, digest: Optional[str], req: models.UploadFileRequest,
+                                 **kwargs) -> models.UploadFileResponse:
+        blocking = self.upload_cache is not None and self.upload_cache.blocking
+        cache_key, cached = await self._call_cache(blocking, self._get_cached_upload, req.user, digest)
+        if cached is not None:
+            return cached
+        uploaded = await self.aupload_files_stream(file, req, **kwargs)
+        if cache_key is not None:
+            await self._call_cache(blocking, self.upload_cache.set, cache_key, uploaded.model_dump_json())
+        return uploaded
 
     async def acompletion_messages(self, req: models.CompletionRequest, **kwargs) \
             -> Union[models.CompletionResponse, AsyncIterator[models.CompletionStreamResponse]]:
@@ -513,29 +1322,7 @@ class AsyncClient(BaseModel):
             If the response mode is streaming, it returns an iterator of `CompletionStreamResponse` objects containing
             the stream of generated events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return await self._acompletion_messages(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._acompletion_messages_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
-
-    async def _acompletion_messages(self, req: models.CompletionRequest, **kwargs) -> models.CompletionResponse:
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_COMPLETION_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.CompletionResponse(**response.json())
-
-    async def _acompletion_messages_stream(self, req: models.CompletionRequest, **kwargs) \
-            -> AsyncIterator[models.CompletionStreamResponse]:
-        async for sse in self.arequest_stream(
-                self._prepare_url(ENDPOINT_COMPLETION_MESSAGES),
-                HTTPMethod.POST,
-                json=req.model_dump(),
-                **kwargs):
-            yield models.build_completion_stream_response(sse.json())
+        return await self._aexecute(self._completion_call(req), **kwargs)
 
     async def astop_completion_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -544,8 +1331,7 @@ class AsyncClient(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return await self._astop_stream(
-            self._prepare_url(ENDPOINT_STOP_COMPLETION_MESSAGES, task_id=task_id), req, **kwargs)
+        return await self._asend(self._stop_call(ENDPOINT_STOP_COMPLETION_MESSAGES, task_id, req), **kwargs)
 
     async def achat_messages(self, req: models.ChatRequest, **kwargs) \
             -> Union[models.ChatResponse, AsyncIterator[models.ChatStreamResponse]]:
@@ -557,29 +1343,33 @@ class AsyncClient(BaseModel):
             If the response mode is streaming, it returns an iterator of `ChatStreamResponse` objects containing the
             stream of chat events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return await self._achat_messages(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._achat_messages_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
+        return await self._aexecute(self._chat_call(req), **kwargs)
 
-    async def _achat_messages(self, req: models.ChatRequest, **kwargs) -> models.ChatResponse:
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_CHAT_MESSAGES),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.ChatResponse(**response.json())
+    async def achat_messages_audio(self, req: models.ChatRequest, sink: Optional[Any] = None, **kwargs) \
+            -> AsyncIterator[bytes]:
+        """
+        Streams the speech of a chat answer, for apps with text to speech auto-play enabled.
+
+        The base64 audio of the TTS events is decoded incrementally as it is received, and the other events are
+        skipped without building their stream responses.
 
-    async def _achat_messages_stream(self, req: models.ChatRequest, **kwargs) \
-            -> AsyncIterator[models.ChatStreamResponse]:
+        Args:
+            req: A `ChatRequest` object, its response mode is ignored.
+            sink: An object with a `write(bytes)` method receiving the decoded audio, e.g. a file or a socket file.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Yields:
+            Decoded audio chunks.
+        """
+        decoder = TTSAudioDecoder(sink)
         async for sse in self.arequest_stream(
                 self._prepare_url(ENDPOINT_CHAT_MESSAGES),
                 HTTPMethod.POST,
-                json=req.model_dump(),
+                json=req.model_copy(update={"response_mode": models.ResponseMode.STREAMING}),
                 **kwargs):
-            yield models.build_chat_stream_response(sse.json())
+            chunk = decoder.feed_sse_data(sse.data)
+            if chunk:
+                yield chunk
 
     async def astop_chat_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -588,7 +1378,7 @@ class AsyncClient(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return await self._astop_stream(self._prepare_url(ENDPOINT_STOP_CHAT_MESSAGES, task_id=task_id), req, **kwargs)
+        return await self._asend(self._stop_call(ENDPOINT_STOP_CHAT_MESSAGES, task_id, req), **kwargs)
 
     async def arun_workflows(self, req: models.WorkflowsRunRequest, **kwargs) \
             -> Union[models.WorkflowsRunResponse, AsyncIterator[models.WorkflowsStreamResponse]]:
@@ -601,29 +1391,131 @@ class AsyncClient(BaseModel):
             If the response mode is streaming, it returns an iterator of `WorkflowsRunStreamResponse` objects
             containing the stream of workflow events.
         """
-        if req.response_mode == models.ResponseMode.BLOCKING:
-            return await self._arun_workflows(req, **kwargs)
-        if req.response_mode == models.ResponseMode.STREAMING:
-            return self._arun_workflows_stream(req, **kwargs)
-        raise ValueError(f"Invalid request_mode: {req.response_mode}")
-
-    async def _arun_workflows(self, req: models.WorkflowsRunRequest, **kwargs) -> models.WorkflowsRunResponse:
-        response = await self.arequest(
-            self._prepare_url(ENDPOINT_RUN_WORKFLOWS),
-            HTTPMethod.POST,
-            json=req.model_dump(),
-            **kwargs,
-        )
-        return models.WorkflowsRunResponse(**response.json())
+        return await self._aexecute(self._run_workflows_call(req), **kwargs)
 
-    async def _arun_workflows_stream(self, req: models.WorkflowsRunRequest, **kwargs) \
+    async def arun_workflows_resumable(self, req: models.WorkflowsRunRequest, max_reconnects: int = 5,
+                                       backoff_base: float = 1., backoff_max: float = 16., **kwargs) \
             -> AsyncIterator[models.WorkflowsRunStreamResponse]:
-        async for sse in self.arequest_stream(
-                self._prepare_url(ENDPOINT_RUN_WORKFLOWS),
-                HTTPMethod.POST,
-                json=req.model_dump(),
-                **kwargs):
-            yield models.build_workflows_stream_response(sse.json())
+        """
+        Runs a workflow in streaming mode and survives the stream being dropped mid-run.
+
+        The Service API cannot replay a dropped stream, so instead of running the workflow again this follows the
+        run through `aget_workflows_run`, polling with an exponential backoff until it is over, and then yields a
+        `workflow_finished` event built from the run details. The node events emitted while disconnected are lost.
+
+        Args:
+            req: A `WorkflowsRunRequest` object, its response mode is ignored.
+            max_reconnects: The maximum number of consecutive failed attempts to fetch the run details.
+            backoff_base: The initial delay in seconds between two attempts.
+            backoff_max: The maximum delay in seconds between two attempts.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Yields:
+            `WorkflowsRunStreamResponse` objects containing the stream of workflow events.
+        """
+        req = req.model_copy(update={"response_mode": models.ResponseMode.STREAMING})
+        task_id, workflow_run_id = None, None
+        try:
+            async for event in self._astream(self._run_workflows_call(req), **kwargs):
+                task_id = task_id or event.task_id
+                workflow_run_id = workflow_run_id or getattr(event, "workflow_run_id", None)
+                yield event
+                if event.event == models.StreamEvent.WORKFLOW_FINISHED:
+                    return
+        except httpx.TransportError:
+            if not workflow_run_id:
+                raise
+        if not workflow_run_id:
+            return
+
+        failures, delay = 0, backoff_base
+        while True:
+            await asyncio.sleep(delay)
+            delay = min(backoff_max, delay * 2)
+            try:
+                detail = await self.aget_workflows_run(workflow_run_id, **kwargs)
+            except (httpx.TransportError, errors.DifyInternalServerError):
+                failures += 1
+                if failures > max_reconnects:
+                    raise
+                continue
+            failures = 0
+            if detail.status not in (None, models.WorkflowStatus.RUNNING):
+                yield self._build_resumed_workflows_finished(task_id, detail)
+                return
+
+    async def aget_workflows_run(self, workflow_run_id: str, **kwargs) -> models.WorkflowsRunDetailResponse:
+        """
+        Retrieves the current state and results of a workflow run.
+
+        Args:
+            workflow_run_id: The identifier of the workflow run.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            A `WorkflowsRunDetailResponse` object containing the status and outputs of the run.
+        """
+        return await self._asend(self._workflows_run_detail_call(workflow_run_id), **kwargs)
+
+    async def arun_workflows_batch(self,
+                                   reqs: Union[Iterable[models.WorkflowsRunRequest],
+                                               AsyncIterable[models.WorkflowsRunRequest]],
+                                   max_concurrency: int = 8, ordered: bool = False, **kwargs) \
+            -> AsyncIterator[models.WorkflowsBatchResult]:
+        """
+        Executes a batch of blocking workflow runs concurrently, keeping at most `max_concurrency` in flight.
+
+        Requests are pulled from `reqs` lazily, so memory stays flat regardless of the batch size. A failed run is
+        reported in its result and does not abort the batch.
+
+        Args:
+            reqs: An iterable or async iterable of `WorkflowsRunRequest` objects with the blocking response mode.
+            max_concurrency: The maximum number of workflow runs in flight.
+            ordered: Yields the results in input order if set, otherwise in completion order.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Yields:
+            `WorkflowsBatchResult` objects, each carrying either the response or the error of a run.
+        """
+        requests = _aenumerate(reqs)
+        in_flight = collections.deque()
+
+        async def submit(count: int):
+            for _ in range(count):
+                try:
+                    index, req = await requests.__anext__()
+                except StopAsyncIteration:
+                    return
+                in_flight.append(asyncio.ensure_future(self._arun_workflows_batch_item(index, req, **kwargs)))
+
+        await submit(max_concurrency)
+        try:
+            while in_flight:
+                if ordered:
+                    done = (in_flight.popleft(),)
+                    await asyncio.wait(done)
+                else:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        in_flight.remove(task)
+                await submit(len(done))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            await requests.aclose()
+
+    async def _arun_workflows_batch_item(self, index: int, req: models.WorkflowsRunRequest, **kwargs) \
+            -> models.WorkflowsBatchResult:
+        try:
+            if req.response_mode != models.ResponseMode.BLOCKING:
+                raise ValueError(f"Invalid request_mode for batch execution: {req.response_mode}")
+            response = await self._asend(self._run_workflows_call(req), **kwargs)
+            return models.WorkflowsBatchResult(index=index, request=req, response=response)
+        except Exception as e:
+            return models.WorkflowsBatchResult(index=index, request=req, error=e)
 
     async def astop_workflows(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
         """
@@ -632,23 +1524,124 @@ class AsyncClient(BaseModel):
         Returns:
             A `StopResponse` object indicating the success of the operation.
         """
-        return await self._astop_stream(self._prepare_url(ENDPOINT_STOP_WORKFLOWS, task_id=task_id), req, **kwargs)
+        return await self._asend(self._stop_call(ENDPOINT_STOP_WORKFLOWS, task_id, req), **kwargs)
+
+    async def _aexecute(self, call: Union[_Call, _StreamCall], **kwargs) -> Any:
+        if isinstance(call, _StreamCall):
+            return self._astream(call, **kwargs)
+        return await self._asend(call, **kwargs)
+
+    async def _asend(self, call: _Call, **kwargs) -> Any:
+        if call.lookup is not None:
+            result = await self._call_cache(call.offload, call.lookup)
+            if result is not None:
+                return result
+        result = call.parse(await self.arequest(call.url, call.method, **call.options, **kwargs))
+        if call.store is not None:
+            await self._call_cache(call.offload, call.store, result)
+        return result
+
+    async def _astream(self, call: _StreamCall, **kwargs) -> AsyncIterator[Any]:
+        replay = await self._call_cache(call.offload, call.lookup) if call.lookup is not None else None
+        if replay is not None:
+            for event in replay:
+                yield event
+            return
+        task_id, event = None, None
+        try:
+            async for sse in self._arequest_stream(call.url, call.method, call.metrics, **call.options, **kwargs):
+                event = self._parse_stream_event(call, sse)
+                if task_id is None:
+                    task_id = getattr(event, "task_id", None)
+                yield event
+        except (GeneratorExit, asyncio.CancelledError):
+            stop_call = self._get_abandoned_stop_call(call, task_id, event)
+            if stop_call is not None:
+                self._stop_in_background(stop_call)
+            raise
+        if call.on_end is not None:
+            await self._call_cache(call.offload, call.on_end)
+
+    @staticmethod
+    async def _call_cache(blocking: bool, func: Callable, *args) -> Any:
+        # blocking cache backends are called off the event loop
+        if not blocking:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _stop_in_background(self, call: _Call):
+        # skipped once the client is closed, not to create a new connection pool for it
+        if self._http_client is None or len(self._background_stops) >= MAX_PENDING_STOPS:
+            return
+        try:
+            task = asyncio.ensure_future(self._asend(call))
+        except RuntimeError:
+            # no running event loop anymore
+            return
+        self._background_stops.add(task)
+        task.add_done_callback(self._on_background_stop_done)
+
+    def _on_background_stop_done(self, task: asyncio.Future):
+        self._background_stops.discard(task)
+        if not task.cancelled():
+            task.exception()  # the errors of background stops are ignored
+
+    async def atext_to_audio(self, req: models.TextToAudioRequest, chunk_size: Optional[int] = None, **kwargs) \
+            -> AsyncIterator[bytes]:
+        """
+        Converts text to speech, streaming the audio out chunk by chunk as it is synthesized.
+
+        Args:
+            req: A `TextToAudioRequest` object containing the text or the message to convert.
+            chunk_size: The size in bytes of the yielded chunks, the chunks are yielded as received if unset.
+            **kwargs: Extra keyword arguments to pass to the request function.
 
-    async def _astop_stream(self, endpoint: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
-        response = await self.arequest(
-            endpoint,
+        Returns:
+            An async iterator of audio bytes, which can be written straight to a file or a socket.
+        """
+        return self._arequest_bytes_stream(
+            self._prepare_url(ENDPOINT_TEXT_TO_AUDIO),
             HTTPMethod.POST,
-            json=req.model_dump(),
+            json=req.model_dump(exclude_none=True),
+            chunk_size=chunk_size,
             **kwargs,
         )
-        return models.StopResponse(**response.json())
 
-    def _prepare_url(self, endpoint: str, **kwargs) -> str:
-        return self.api_base + endpoint.format(**kwargs)
+    async def aaudio_to_text(self, file: UploadSource, req: models.AudioToTextRequest, filename: Optional[str] = None,
+                             mime_type: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             **kwargs) -> models.AudioToTextResponse:
+        """
+        Converts speech to text, the audio is streamed to the server without being read into memory.
 
-    def _prepare_auth_headers(self, headers: Dict[str, str]):
-        if "authorization" not in (key.lower() for key in headers.keys()):
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        Args:
+            file: The audio to convert, as accepted by `aupload_files_stream`. The filename must carry a supported
+            audio extension (mp3, mp4, mpeg, mpga, m4a, wav or webm), pass it for file objects and iterators.
+            req: An `AudioToTextRequest` object containing the request details.
+            filename: The name of the audio file, guessed from the path or the file object if unset.
+            mime_type: The MIME type of the audio, guessed from the filename if unset.
+            chunk_size: The size in bytes of the chunks read from the audio.
+            **kwargs: Extra keyword arguments to pass to the request function.
+
+        Returns:
+            An `AudioToTextResponse` object containing the recognized text.
+        """
+        body = MultipartStream(req.model_dump(exclude_none=True), "file", file, filename=filename,
+                               mime_type=mime_type, chunk_size=chunk_size)
+        call = self._multipart_call(ENDPOINT_AUDIO_TO_TEXT, models.AudioToTextResponse, body, body.as_async(),
+                                    kwargs.pop("headers", None))
+        return await self._asend(call, **kwargs)
+
+
+async def _aenumerate(iterable: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    index = 0
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield index, item
+            index += 1
+    else:
+        for item in iterable:
+            yield index, item
+            index += 1
 
 
 def _get_content_type(headers: httpx.Headers) -> str:
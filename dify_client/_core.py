@@ -0,0 +1,84 @@
+import time
+from typing import Optional, Any, Callable, Iterable, Dict
+
+import httpx
+
+from dify_client._metrics import RequestMetrics, StreamMetrics
+from dify_client._retry import RetryPolicy
+
+
+class _Call:
+    # a request to an endpoint and the parsing of its response, built without any I/O by the `_BaseClient`, the
+    # clients only differ by how they send it
+    __slots__ = ("method", "url", "parse", "lookup", "store", "offload", "options")
+
+    def __init__(self, method: str, url: str, parse: Callable[[httpx.Response], Any],
+                 lookup: Optional[Callable[[], Any]] = None, store: Optional[Callable[[Any], None]] = None,
+                 offload: bool = False, **options: Any):
+        self.method = method
+        self.url = url
+        self.parse = parse
+        self.lookup = lookup  # called when sent, its result is returned without sending the request unless None
+        self.store = store  # called with the parsed response, e.g. to cache it
+        self.offload = offload  # lookup and store block on I/O, the async client runs them in an executor
+        self.options = options  # the body, params and headers of the request
+
+
+class _StreamCall:
+    # a request to a server-sent events endpoint and the parsing of its events
+    __slots__ = ("method", "url", "build", "metrics", "user", "stop_endpoint", "lookup", "on_end", "offload",
+                 "node_usage", "options")
+
+    def __init__(self, method: str, url: str, build: Callable[[dict], Any], metrics: Optional[StreamMetrics],
+                 user: Optional[str] = None, stop_endpoint: Optional[str] = None,
+                 lookup: Optional[Callable[[], Optional[Iterable]]] = None, on_end: Optional[Callable[[], None]] = None,
+                 offload: bool = False, node_usage: bool = False, **options: Any):
+        self.method = method
+        self.url = url
+        self.build = build  # builds a stream response from the data of an event
+        self.metrics = metrics
+        self.user = user
+        self.stop_endpoint = stop_endpoint  # the task is stopped there when the stream is abandoned, if set
+        self.lookup = lookup  # called when consumed, its events are yielded without sending the request unless None
+        self.on_end = on_end  # called once the stream is fully consumed
+        self.offload = offload  # lookup and on_end block on I/O, the async client runs them in an executor
+        self.node_usage = node_usage  # the usage is reported by the node events, not at the end of the message
+        self.options = options
+
+
+class _Attempts:
+    # the retry state of a request, shared by the sync and async request loops
+    __slots__ = ("method", "url", "retry_policy", "metrics", "kwargs", "timeout", "count", "started_at")
+
+    def __init__(self, method: str, url: str, retry_policy: Optional[RetryPolicy],
+                 metrics: Optional[RequestMetrics] = None, kwargs: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[httpx.Timeout] = None):
+        self.method = method
+        self.url = url
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        self.kwargs = kwargs  # the keyword arguments of the httpx request, the timeout of each attempt is set there
+        self.timeout = timeout  # the timeout of an attempt, cut to the rest of the deadline of the retry policy
+        self.count = 0
+        self.started_at = time.monotonic()
+
+    def start(self):
+        self.count += 1
+        if self.metrics is not None:
+            self.metrics.start_attempt(self.count)
+        if self.timeout is not None:
+            self.kwargs["timeout"] = _cut_timeout(self.timeout,
+                                                  self.retry_policy.deadline - (time.monotonic() - self.started_at))
+
+    def get_retry_delay(self, error: Exception) -> Optional[float]:
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.get_delay(self.count, time.monotonic() - self.started_at, self.method, self.url,
+                                           error)
+
+
+def _cut_timeout(timeout: httpx.Timeout, remaining: float) -> httpx.Timeout:
+    # no phase of an attempt outlasts the deadline, an attempt started past it times out right away
+    remaining = max(remaining, .001)
+    return httpx.Timeout(**{phase: remaining if value is None else min(value, remaining)
+                            for phase, value in timeout.as_dict().items()})
@@ -0,0 +1,88 @@
+import json
+from typing import Any, Type, TypeVar, Union, Dict, Tuple
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# request fields the Service API expects even when they are empty, e.g. it rejects a chat request without `inputs`
+WIRE_REQUIRED_FIELDS = frozenset({"inputs", "query", "response_mode", "user"})
+
+
+class JSONCodec:
+    """
+    Serializes the request bodies and parses the response bodies of a client.
+
+    Request models are serialized straight to JSON bytes, and response bodies are validated straight into models, by
+    pydantic's JSON core, without building intermediate dicts. The optional fields of a request model which are unset
+    or left to their default are not sent. Subclass it to plug in another JSON library.
+    """
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dump_model(self, model: BaseModel) -> bytes:
+        return _get_request_serializer(type(model)).to_json(model)
+
+    def load_model(self, model_cls: Type[ModelT], data: Union[bytes, str]) -> ModelT:
+        return model_cls.model_validate_json(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    A `JSONCodec` parsing and serializing the plain JSON values, e.g. the stream events, with `orjson`.
+    """
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+
+def get_default_json_codec() -> JSONCodec:
+    # orjson is optional, fall back to the standard library when it is not installed
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JSONCodec()
+
+
+class _RequestSerializer:
+    # compiled once per request model: its fields which are left out of the body when unset, None or default
+    __slots__ = ("omittable_fields",)
+
+    def __init__(self, model_cls: Type[BaseModel]):
+        omittable = []
+        for name, field in model_cls.model_fields.items():
+            if name in WIRE_REQUIRED_FIELDS:
+                continue
+            default = None if field.is_required() else field.get_default(call_default_factory=True)
+            omittable.append((name, default))
+        self.omittable_fields: Tuple[Tuple[str, Any], ...] = tuple(omittable)
+
+    def to_json(self, model: BaseModel) -> bytes:
+        exclude = set()
+        for name, default in self.omittable_fields:
+            value = getattr(model, name)
+            if value is None or value == default:
+                exclude.add(name)
+        return model.__pydantic_serializer__.to_json(model, exclude=exclude or None)
+
+
+_REQUEST_SERIALIZERS: Dict[Type[BaseModel], _RequestSerializer] = {}
+
+
+def _get_request_serializer(model_cls: Type[BaseModel]) -> _RequestSerializer:
+    serializer = _REQUEST_SERIALIZERS.get(model_cls)
+    if serializer is None:
+        serializer = _REQUEST_SERIALIZERS[model_cls] = _RequestSerializer(model_cls)
+    return serializer
@@ -0,0 +1,238 @@
+import abc
+import re
+import time
+from typing import Optional, Any, List, Dict, Callable
+
+import httpx
+
+# the ids in the endpoint paths, left out of the endpoint labels to bound their cardinality
+_ID_PATTERN = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)")
+
+
+class RequestMetrics:
+    """
+    The timings of a request, measured from the `httpx` trace extension.
+
+    The connection timings are only set when a new connection was opened for the last attempt, and the DNS resolution
+    is part of `connect_time`, `httpcore` resolves the host while connecting. All the times are in seconds.
+    """
+    __slots__ = ("method", "url", "attempts", "status_code", "error", "total_time", "connect_time", "tls_time",
+                 "server_time", "bytes_received", "_started", "_marks", "_trace")
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        self.attempts = 0
+        self.status_code: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.total_time = 0.  # from the first attempt to the response, or the end of the stream, retries included
+        self.connect_time: Optional[float] = None  # DNS resolution and TCP connection
+        self.tls_time: Optional[float] = None  # TLS handshake
+        self.server_time: Optional[float] = None  # from the request sent to the response headers received
+        self.bytes_received = 0
+        self._started = time.perf_counter()
+        self._marks: Dict[str, float] = {}
+        self._trace: Optional[Callable] = None  # the trace extension of the caller, if any
+
+    @property
+    def endpoint(self) -> str:
+        """
+        The path of the URL without its ids, e.g. `/v1/chat-messages/{id}/stop`.
+        """
+        return _ID_PATTERN.sub("/{id}", httpx.URL(self.url).path)
+
+    def start_attempt(self, attempt: int):
+        self.attempts = attempt
+        self._marks.clear()
+
+    def bind(self, kwargs: Dict[str, Any], is_async: bool = False):
+        # installs the trace extension in the keyword arguments of the httpx request, when the request starts
+        self._started = time.perf_counter()
+        extensions = dict(kwargs.get("extensions") or {})
+        self._trace = extensions.get("trace")
+        extensions["trace"] = self.atrace if is_async else self.trace
+        kwargs["extensions"] = extensions
+
+    def trace(self, name: str, info: Dict[str, Any]):
+        # e.g. `connection.connect_tcp.started` or `http11.receive_response_headers.complete`
+        self._marks[name.partition(".")[2]] = time.perf_counter()
+        if self._trace is not None:
+            self._trace(name, info)
+
+    async def atrace(self, name: str, info: Dict[str, Any]):
+        self._marks[name.partition(".")[2]] = time.perf_counter()
+        if self._trace is not None:
+            await self._trace(name, info)
+
+    def finish(self, response: Optional[httpx.Response], error: Optional[BaseException] = None):
+        self.total_time = time.perf_counter() - self._started
+        self.error = error
+        if response is not None:
+            self.status_code = response.status_code
+            self.bytes_received = response.num_bytes_downloaded
+        self.connect_time = self._get_duration("connect_tcp")
+        self.tls_time = self._get_duration("start_tls")
+        self.server_time = self._get_duration("receive_response_headers")
+
+    def _get_duration(self, step: str) -> Optional[float]:
+        started, completed = self._marks.get(f"{step}.started"), self._marks.get(f"{step}.complete")
+        return completed - started if started is not None and completed is not None else None
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(method={self.method!r}, url={self.url!r}, status_code={self.status_code}, "
+                f"total_time={self.total_time:.4f})")
+
+
+class StreamMetrics(RequestMetrics):
+    """
+    The timings of a server-sent events stream, and of the client-side parsing of its events.
+    """
+    __slots__ = ("time_to_first_event", "events", "event_gaps", "parse_time", "_last_event")
+
+    def __init__(self, method: str, url: str):
+        super().__init__(method, url)
+        self.time_to_first_event: Optional[float] = None  # from the first attempt, retries included
+        self.events = 0
+        self.event_gaps: List[float] = []  # the time between consecutive events, pings included
+        self.parse_time = 0.  # building the stream responses from the event data
+        self._last_event: Optional[float] = None
+
+    @property
+    def max_event_gap(self) -> Optional[float]:
+        return max(self.event_gaps) if self.event_gaps else None
+
+    @property
+    def mean_event_gap(self) -> Optional[float]:
+        return sum(self.event_gaps) / len(self.event_gaps) if self.event_gaps else None
+
+    def on_event(self):
+        now = time.perf_counter()
+        if self._last_event is None:
+            self.time_to_first_event = now - self._started
+        else:
+            self.event_gaps.append(now - self._last_event)
+        self._last_event = now
+        self.events += 1
+
+
+class MetricsSink:
+    """
+    Receives the metrics of the requests and streams of a client. The methods are called inline once a request or a
+    stream is over, including when it failed, and should be cheap. Subclass it and override the methods needed.
+    """
+
+    def on_request(self, metrics: RequestMetrics):
+        pass
+
+    def on_stream(self, metrics: StreamMetrics):
+        pass
+
+
+class _InstrumentsSink(MetricsSink, abc.ABC):
+    # maps the metrics onto histograms and counters, labelled by method, endpoint and status
+
+    def on_request(self, metrics: RequestMetrics):
+        labels = self._get_labels(metrics)
+        self._observe("request_duration", metrics.total_time, labels)
+        self._count("response_bytes", metrics.bytes_received, labels)
+        for name, value in (("connect_duration", metrics.connect_time), ("tls_duration", metrics.tls_time),
+                            ("server_duration", metrics.server_time)):
+            if value is not None:
+                self._observe(name, value, labels)
+
+    def on_stream(self, metrics: StreamMetrics):
+        self.on_request(metrics)
+        labels = self._get_labels(metrics)
+        if metrics.time_to_first_event is not None:
+            self._observe("stream_first_event", metrics.time_to_first_event, labels)
+        for gap in metrics.event_gaps:
+            self._observe("stream_event_gap", gap, labels)
+        self._count("stream_events", metrics.events, labels)
+        self._observe("stream_parse_duration", metrics.parse_time, labels)
+
+    @staticmethod
+    def _get_labels(metrics: RequestMetrics) -> Dict[str, str]:
+        status = str(metrics.status_code) if metrics.status_code is not None else \
+            type(metrics.error).__name__ if metrics.error is not None else "closed"
+        return {"method": metrics.method, "endpoint": metrics.endpoint, "status": status}
+
+    @abc.abstractmethod
+    def _observe(self, name: str, value: float, labels: Dict[str, str]):
+        pass
+
+    @abc.abstractmethod
+    def _count(self, name: str, value: float, labels: Dict[str, str]):
+        pass
+
+
+_INSTRUMENTS = {
+    # name: (histogram or counter, unit, description)
+    "request_duration": (True, "s", "Duration of the requests and streams, retries included"),
+    "connect_duration": (True, "s", "Duration of the DNS resolution and TCP connection of new connections"),
+    "tls_duration": (True, "s", "Duration of the TLS handshake of new connections"),
+    "server_duration": (True, "s", "Time from the request sent to the response headers received"),
+    "response_bytes": (False, "By", "Bytes received"),
+    "stream_first_event": (True, "s", "Time to the first event of the streams"),
+    "stream_event_gap": (True, "s", "Time between consecutive events of the streams"),
+    "stream_events": (False, "1", "Events received by the streams"),
+    "stream_parse_duration": (True, "s", "Client-side parse time of the events of a stream"),
+}
+
+
+class PrometheusMetricsSink(_InstrumentsSink):
+    """
+    Exports the metrics of a client as Prometheus histograms and counters, requires `prometheus_client`.
+    """
+
+    def __init__(self, namespace: str = "dify_client", registry: Optional[Any] = None):
+        """
+        Args:
+            namespace: The prefix of the metric names.
+            registry: The `prometheus_client` registry to register the metrics in, the default registry if unset.
+        """
+        import prometheus_client
+
+        kwargs = {"registry": registry} if registry is not None else {}
+        labels = ("method", "endpoint", "status")
+        self._instruments = {}
+        for name, (histogram, unit, description) in _INSTRUMENTS.items():
+            if histogram:
+                metric = prometheus_client.Histogram(f"{namespace}_{name}_seconds", description, labels, **kwargs)
+            else:
+                suffix = "bytes" if unit == "By" else ""
+                metric = prometheus_client.Counter(f"{namespace}_{name}", description, labels, unit=suffix, **kwargs)
+            self._instruments[name] = metric
+
+    def _observe(self, name: str, value: float, labels: Dict[str, str]):
+        self._instruments[name].labels(**labels).observe(value)
+
+    def _count(self, name: str, value: float, labels: Dict[str, str]):
+        self._instruments[name].labels(**labels).inc(value)
+
+
+class OpenTelemetryMetricsSink(_InstrumentsSink):
+    """
+    Exports the metrics of a client as OpenTelemetry histograms and counters, requires `opentelemetry-api`.
+    """
+
+    def __init__(self, meter: Optional[Any] = None, prefix: str = "dify_client"):
+        """
+        Args:
+            meter: The OpenTelemetry meter creating the instruments, the `dify_client` meter of the global meter
+                provider if unset.
+            prefix: The prefix of the instrument names.
+        """
+        if meter is None:
+            from opentelemetry import metrics
+
+            meter = metrics.get_meter("dify_client")
+        self._instruments = {}
+        for name, (histogram, unit, description) in _INSTRUMENTS.items():
+            create = meter.create_histogram if histogram else meter.create_counter
+            self._instruments[name] = create(f"{prefix}.{name}", unit=unit, description=description)
+
+    def _observe(self, name: str, value: float, labels: Dict[str, str]):
+        self._instruments[name].record(value, labels)
+
+    def _count(self, name: str, value: float, labels: Dict[str, str]):
+        self._instruments[name].add(value, labels)
@@ -0,0 +1,456 @@
+import collections
+import threading
+import time
+from typing import Optional, Any, Iterable, Iterator, AsyncIterator, Callable, Awaitable, Union, List, Sequence
+
+try:
+    from enum import StrEnum
+except ImportError:
+    from strenum import StrEnum
+
+import httpx
+
+from dify_client import errors, models
+from dify_client._clientx import Client, AsyncClient
+from dify_client._upload import UploadSource
+
+# the response and event fields holding ids of resources which only exist on the backend that created them
+_PINNED_ID_FIELDS = ("conversation_id", "message_id", "task_id", "workflow_run_id")
+
+
+class BalancingStrategy(StrEnum):
+    # the backend with the fewest requests in flight
+    LEAST_OUTSTANDING = "least_outstanding"
+    # the backend with the lowest expected wait, its latency weighted by its requests in flight
+    LATENCY = "latency"
+
+
+class PoolBackend:
+    """
+    The health and load of a client in a pool.
+    """
+    __slots__ = ("client", "outstanding", "latency", "failures", "ejected_until")
+
+    def __init__(self, client: Union[Client, AsyncClient]):
+        self.client = client
+        self.outstanding = 0  # requests and streams in flight
+        self.latency: Optional[float] = None  # moving average of the response, or first event, time in seconds
+        self.failures = 0  # consecutive failures
+        self.ejected_until = 0.  # monotonic time
+
+    def __repr__(self) -> str:
+        return (f"PoolBackend(api_base={self.client.api_base!r}, outstanding={self.outstanding}, "
+                f"latency={self.latency!r}, failures={self.failures})")
+
+
+class _BasePool:
+    def __init__(self, clients: Sequence[Union[Client, AsyncClient]],
+                 strategy: BalancingStrategy = BalancingStrategy.LEAST_OUTSTANDING,
+                 eject_after: int = 3, eject_duration: float = 30., latency_decay: float = .3,
+                 max_pinned_ids: int = 100_000):
+        if not clients:
+            raise ValueError("A pool needs at least one client")
+        self.backends = [PoolBackend(client) for client in clients]
+        self.strategy = BalancingStrategy(strategy)
+        self.eject_after = eject_after
+        self.eject_duration = eject_duration
+        self.latency_decay = latency_decay
+        self.max_pinned_ids = max_pinned_ids
+
+        self._lock = threading.Lock()
+        self._pins = collections.OrderedDict()  # resource id -> backend, least recently used first
+        self._next = 0  # rotates the first backend considered, to spread the ties
+
+    def _acquire(self, pin_ids: Iterable[Optional[str]] = ()) -> PoolBackend:
+        with self._lock:
+            backend = self._get_pinned(pin_ids) or self._select()
+            backend.outstanding += 1
+        return backend
+
+    def _get_pinned(self, pin_ids: Iterable[Optional[str]]) -> Optional[PoolBackend]:
+        # a pinned backend is used even when ejected, the resource does not exist anywhere else
+        for pin_id in pin_ids:
+            if pin_id:
+                backend = self._pins.get(pin_id)
+                if backend is not None:
+                    self._pins.move_to_end(pin_id)
+                    return backend
+        return None
+
+    def _select(self) -> PoolBackend:
+        now = time.monotonic()
+        count = len(self.backends)
+        start, self._next = self._next, (self._next + 1) % count
+        backends = [self.backends[(start + i) % count] for i in range(count)]
+        healthy = [backend for backend in backends if backend.ejected_until <= now]
+        if not healthy:
+            # all ejected, fail open on the backend which comes back first
+            return min(backends, key=lambda backend: backend.ejected_until)
+        if self.strategy == BalancingStrategy.LATENCY:
+            # the backends without a latency yet are tried first
+            return min(healthy, key=lambda backend: (backend.latency or 0.) * (backend.outstanding + 1))
+        return min(healthy, key=lambda backend: backend.outstanding)
+
+    def _release(self, backend: PoolBackend, error: Optional[BaseException] = None, latency: Optional[float] = None):
+        with self._lock:
+            backend.outstanding -= 1
+            if latency is not None:
+                backend.latency = latency if backend.latency is None else \
+                    backend.latency + self.latency_decay * (latency - backend.latency)
+            if error is None:
+                backend.failures = 0
+            elif _is_backend_failure(error):
+                backend.failures += 1
+                if backend.failures >= self.eject_after:
+                    backend.ejected_until = time.monotonic() + self.eject_duration
+
+    def _pin(self, backend: PoolBackend, response: Any, *pin_ids: Optional[str]):
+        ids = [getattr(response, field, None) for field in _PINNED_ID_FIELDS]
+        with self._lock:
+            for pin_id in (*ids, *pin_ids):
+                if pin_id:
+                    self._pins[pin_id] = backend
+                    self._pins.move_to_end(pin_id)
+            while len(self._pins) > self.max_pinned_ids:
+                self._pins.popitem(last=False)
+
+    def _get_client(self, *pin_ids: Optional[str]) -> Union[Client, AsyncClient]:
+        with self._lock:
+            return (self._get_pinned(pin_ids) or self._select()).client
+
+
+class ClientPool(_BasePool):
+    """
+    Spreads the requests over several clients, e.g. several Dify deployments or API keys of the same app.
+
+    Each request goes to the healthy client with the fewest requests in flight, or with the lowest latency weighted
+    by its requests in flight. A client is ejected for `eject_duration` seconds after `eject_after` consecutive
+    transport errors, 5xx responses or `app_unavailable` errors. Conversations, messages, tasks and workflow runs
+    only exist on the deployment which created them, so the requests referring to them are pinned to the client
+    which created them.
+
+    Usage:
+        pool = ClientPool([Client(api_key=api_key, api_base=api_base) for api_base, api_key in backends])
+        response = pool.chat_messages(req)
+    """
+
+    def __init__(self, clients: Sequence[Client], strategy: BalancingStrategy = BalancingStrategy.LEAST_OUTSTANDING,
+                 eject_after: int = 3, eject_duration: float = 30., latency_decay: float = .3,
+                 max_pinned_ids: int = 100_000):
+        """
+        Args:
+            clients: The clients to spread the requests over.
+            strategy: How a client is selected for the requests which are not pinned.
+            eject_after: The number of consecutive failures after which a client is ejected.
+            eject_duration: How long an ejected client is left out of the selection, in seconds.
+            latency_decay: The weight of the last sample in the moving average of the latency of a client.
+            max_pinned_ids: The maximum number of pinned resource ids, the least recently used ones are forgotten.
+        """
+        super().__init__(clients, strategy, eject_after, eject_duration, latency_decay, max_pinned_ids)
+
+    def __enter__(self) -> "ClientPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection pools of all the clients.
+        """
+        for backend in self.backends:
+            backend.client.close()
+
+    def get_client(self, *pin_ids: Optional[str]) -> Client:
+        """
+        Returns the client a conversation, message, task or workflow run is pinned to, or else the client a new
+        request would be sent to, for the requests the pool does not wrap.
+        """
+        return self._get_client(*pin_ids)
+
+    def _call(self, pin_ids: Iterable[Optional[str]], call: Callable[[Client], Any]) -> Any:
+        backend = self._acquire(pin_ids)
+        started_at, latency, error = time.monotonic(), None, None
+        try:
+            response = call(backend.client)
+            latency = time.monotonic() - started_at
+        except BaseException as e:  # a cancelled call releases its backend too, without counting as a success
+            error = e
+            raise
+        finally:
+            self._release(backend, error, latency)
+        self._pin(backend, response)
+        return response
+
+    def _stream(self, pin_ids: Iterable[Optional[str]], call: Callable[[Client], Iterator[Any]]) -> Iterator[Any]:
+        # the client is selected when the stream is first iterated, like the request of a client stream is sent
+        backend = self._acquire(pin_ids)
+        started_at, latency, error = time.monotonic(), None, None
+        try:
+            for event in call(backend.client):
+                if latency is None:
+                    latency = time.monotonic() - started_at
+                    self._pin(backend, event)
+                yield event
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, error, latency)
+
+    def completion_messages(self, req: models.CompletionRequest, **kwargs) \
+            -> Union[models.CompletionResponse, Iterator[models.CompletionStreamResponse]]:
+        """
+        Sends a completion request to a client of the pool, see `Client.completion_messages`.
+        """
+        pin_ids = _get_file_ids(req.files)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._stream(pin_ids, lambda client: client.completion_messages(req, **kwargs))
+        return self._call(pin_ids, lambda client: client.completion_messages(req, **kwargs))
+
+    def stop_completion_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
+        """
+        Stops a streaming completion task on the client which started it, see `Client.stop_completion_messages`.
+        """
+        return self._call((task_id,), lambda client: client.stop_completion_messages(task_id, req, **kwargs))
+
+    def chat_messages(self, req: models.ChatRequest, **kwargs) \
+            -> Union[models.ChatResponse, Iterator[models.ChatStreamResponse]]:
+        """
+        Sends a chat request to the client its conversation is pinned to, or else to a client of the pool, see
+        `Client.chat_messages`.
+        """
+        pin_ids = (req.conversation_id, *_get_file_ids(req.files))
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._stream(pin_ids, lambda client: client.chat_messages(req, **kwargs))
+        return self._call(pin_ids, lambda client: client.chat_messages(req, **kwargs))
+
+    def stop_chat_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
+        """
+        Stops a streaming chat task on the client which started it, see `Client.stop_chat_messages`.
+        """
+        return self._call((task_id,), lambda client: client.stop_chat_messages(task_id, req, **kwargs))
+
+    def feedback_messages(self, message_id: str, req: models.FeedbackRequest, **kwargs) -> models.FeedbackResponse:
+        """
+        Submits feedback for a message on the client which created it, see `Client.feedback_messages`.
+        """
+        return self._call((message_id,), lambda client: client.feedback_messages(message_id, req, **kwargs))
+
+    def suggest_messages(self, message_id: str, req: models.ChatSuggestRequest, **kwargs) -> models.ChatSuggestResponse:
+        """
+        Retrieves the suggested messages of a message from the client which created it, see `Client.suggest_messages`.
+        """
+        return self._call((message_id,), lambda client: client.suggest_messages(message_id, req, **kwargs))
+
+    def upload_files_stream(self, file: UploadSource, req: models.UploadFileRequest, **kwargs) \
+            -> models.UploadFileResponse:
+        """
+        Uploads a file to a client of the pool, and pins the file to it, see `Client.upload_files_stream`.
+        """
+        backend = self._acquire()
+        error = None
+        try:
+            response = backend.client.upload_files_stream(file, req, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, error)
+        self._pin(backend, response, response.id)
+        return response
+
+    def run_workflows(self, req: models.WorkflowsRunRequest, **kwargs) \
+            -> Union[models.WorkflowsRunResponse, Iterator[models.WorkflowsRunStreamResponse]]:
+        """
+        Runs a workflow on a client of the pool, see `Client.run_workflows`.
+        """
+        pin_ids = _get_file_ids(req.files)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._stream(pin_ids, lambda client: client.run_workflows(req, **kwargs))
+        return self._call(pin_ids, lambda client: client.run_workflows(req, **kwargs))
+
+    def get_workflows_run(self, workflow_run_id: str, **kwargs) -> models.WorkflowsRunDetailResponse:
+        """
+        Retrieves a workflow run from the client which started it, see `Client.get_workflows_run`.
+        """
+        return self._call((workflow_run_id,), lambda client: client.get_workflows_run(workflow_run_id, **kwargs))
+
+    def stop_workflows(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
+        """
+        Stops a streaming workflow task on the client which started it, see `Client.stop_workflows`.
+        """
+        return self._call((task_id,), lambda client: client.stop_workflows(task_id, req, **kwargs))
+
+
+class AsyncClientPool(_BasePool):
+    """
+    Spreads the requests over several async clients, see `ClientPool`.
+    """
+
+    def __init__(self, clients: Sequence[AsyncClient],
+                 strategy: BalancingStrategy = BalancingStrategy.LEAST_OUTSTANDING,
+                 eject_after: int = 3, eject_duration: float = 30., latency_decay: float = .3,
+                 max_pinned_ids: int = 100_000):
+        """
+        Args:
+            clients: The async clients to spread the requests over.
+            strategy: How a client is selected for the requests which are not pinned.
+            eject_after: The number of consecutive failures after which a client is ejected.
+            eject_duration: How long an ejected client is left out of the selection, in seconds.
+            latency_decay: The weight of the last sample in the moving average of the latency of a client.
+            max_pinned_ids: The maximum number of pinned resource ids, the least recently used ones are forgotten.
+        """
+        super().__init__(clients, strategy, eject_after, eject_duration, latency_decay, max_pinned_ids)
+
+    async def __aenter__(self) -> "AsyncClientPool":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Closes the connection pools of all the clients.
+        """
+        for backend in self.backends:
+            await backend.client.aclose()
+
+    def get_client(self, *pin_ids: Optional[str]) -> AsyncClient:
+        """
+        Returns the client a conversation, message, task or workflow run is pinned to, or else the client a new
+        request would be sent to, for the requests the pool does not wrap.
+        """
+        return self._get_client(*pin_ids)
+
+    async def _acall(self, pin_ids: Iterable[Optional[str]], call: Callable[[AsyncClient], Awaitable[Any]]) -> Any:
+        backend = self._acquire(pin_ids)
+        started_at, latency, error = time.monotonic(), None, None
+        try:
+            response = await call(backend.client)
+            latency = time.monotonic() - started_at
+        except BaseException as e:  # a cancelled call releases its backend too, without counting as a success
+            error = e
+            raise
+        finally:
+            self._release(backend, error, latency)
+        self._pin(backend, response)
+        return response
+
+    async def _astream(self, pin_ids: Iterable[Optional[str]],
+                       call: Callable[[AsyncClient], Awaitable[AsyncIterator[Any]]]) -> AsyncIterator[Any]:
+        backend = self._acquire(pin_ids)
+        started_at, latency, error = time.monotonic(), None, None
+        try:
+            async for event in await call(backend.client):
+                if latency is None:
+                    latency = time.monotonic() - started_at
+                    self._pin(backend, event)
+                yield event
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, error, latency)
+
+    async def acompletion_messages(self, req: models.CompletionRequest, **kwargs) \
+            -> Union[models.CompletionResponse, AsyncIterator[models.CompletionStreamResponse]]:
+        """
+        Sends a completion request to a client of the pool, see `AsyncClient.acompletion_messages`.
+        """
+        pin_ids = _get_file_ids(req.files)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._astream(pin_ids, lambda client: client.acompletion_messages(req, **kwargs))
+        return await self._acall(pin_ids, lambda client: client.acompletion_messages(req, **kwargs))
+
+    async def astop_completion_messages(self, task_id: str, req: models.StopRequest, **kwargs) \
+            -> models.StopResponse:
+        """
+        Stops a streaming completion task on the client which started it, see
+        `AsyncClient.astop_completion_messages`.
+        """
+        return await self._acall((task_id,), lambda client: client.astop_completion_messages(task_id, req, **kwargs))
+
+    async def achat_messages(self, req: models.ChatRequest, **kwargs) \
+            -> Union[models.ChatResponse, AsyncIterator[models.ChatStreamResponse]]:
+        """
+        Sends a chat request to the client its conversation is pinned to, or else to a client of the pool, see
+        `AsyncClient.achat_messages`.
+        """
+        pin_ids = (req.conversation_id, *_get_file_ids(req.files))
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._astream(pin_ids, lambda client: client.achat_messages(req, **kwargs))
+        return await self._acall(pin_ids, lambda client: client.achat_messages(req, **kwargs))
+
+    async def astop_chat_messages(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
+        """
+        Stops a streaming chat task on the client which started it, see `AsyncClient.astop_chat_messages`.
+        """
+        return await self._acall((task_id,), lambda client: client.astop_chat_messages(task_id, req, **kwargs))
+
+    async def afeedback_messages(self, message_id: str, req: models.FeedbackRequest, **kwargs) \
+            -> models.FeedbackResponse:
+        """
+        Submits feedback for a message on the client which created it, see `AsyncClient.afeedback_messages`.
+        """
+        return await self._acall((message_id,), lambda client: client.afeedback_messages(message_id, req, **kwargs))
+
+    async def asuggest_messages(self, message_id: str, req: models.ChatSuggestRequest, **kwargs) \
+            -> models.ChatSuggestResponse:
+        """
+        Retrieves the suggested messages of a message from the client which created it, see
+        `AsyncClient.asuggest_messages`.
+        """
+        return await self._acall((message_id,), lambda client: client.asuggest_messages(message_id, req, **kwargs))
+
+    async def aupload_files_stream(self, file: UploadSource, req: models.UploadFileRequest, **kwargs) \
+            -> models.UploadFileResponse:
+        """
+        Uploads a file to a client of the pool, and pins the file to it, see `AsyncClient.aupload_files_stream`.
+        """
+        backend = self._acquire()
+        error = None
+        try:
+            response = await backend.client.aupload_files_stream(file, req, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, error)
+        self._pin(backend, response, response.id)
+        return response
+
+    async def arun_workflows(self, req: models.WorkflowsRunRequest, **kwargs) \
+            -> Union[models.WorkflowsRunResponse, AsyncIterator[models.WorkflowsRunStreamResponse]]:
+        """
+        Runs a workflow on a client of the pool, see `AsyncClient.arun_workflows`.
+        """
+        pin_ids = _get_file_ids(req.files)
+        if req.response_mode == models.ResponseMode.STREAMING:
+            return self._astream(pin_ids, lambda client: client.arun_workflows(req, **kwargs))
+        return await self._acall(pin_ids, lambda client: client.arun_workflows(req, **kwargs))
+
+    async def aget_workflows_run(self, workflow_run_id: str, **kwargs) -> models.WorkflowsRunDetailResponse:
+        """
+        Retrieves a workflow run from the client which started it, see `AsyncClient.aget_workflows_run`.
+        """
+        return await self._acall((workflow_run_id,),
+                                 lambda client: client.aget_workflows_run(workflow_run_id, **kwargs))
+
+    async def astop_workflows(self, task_id: str, req: models.StopRequest, **kwargs) -> models.StopResponse:
+        """
+        Stops a streaming workflow task on the client which started it, see `AsyncClient.astop_workflows`.
+        """
+        return await self._acall((task_id,), lambda client: client.astop_workflows(task_id, req, **kwargs))
+
+
+def _get_file_ids(files: Optional[List[models.File]]) -> List[str]:
+    # the uploaded files of a request only exist on the deployment they were uploaded to
+    return [file.upload_file_id for file in files or () if file.upload_file_id]
+
+
+def _is_backend_failure(error: BaseException) -> bool:
+    if isinstance(error, errors.DifyAPIError):
+        return isinstance(error, (errors.DifyAppUnavailable, errors.DifyInternalServerError)) \
+            or (error.status or 0) >= 500
+    return isinstance(error, httpx.TransportError)
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    An adaptive client-side rate limiter, a token bucket whose rate follows an AIMD (additive increase,
+    multiplicative decrease) policy.
+
+    The rate is cut by `decrease` whenever the API reports throttling (HTTP 429 or `provider_quota_exceeded`), at most
+    once per `1 / rate` seconds so that a burst of throttled requests in flight counts as a single signal, and all
+    requests are paused for `Retry-After` when the server provides it. Each successful request raises the rate
+    again, by about `increase` requests/s per second of successes, up to `max_rate`.
+
+    A limiter is safe to share across threads and asyncio tasks, share one instance between all the clients of an
+    API key so they are paced together.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: Optional[float] = None,
+                 max_rate: Optional[float] = None, increase: float = 1., decrease: float = .5):
+        """
+        Args:
+            rate: The initial rate in requests per second.
+            burst: The bucket capacity, i.e. how many requests may be sent at once, defaults to `rate`.
+            min_rate: The lowest rate reached when backing off, defaults to a tenth of `rate`.
+            max_rate: The highest rate reached when ramping up, defaults to `rate`.
+            increase: The additive increase of the rate, in requests/s per second of successful requests.
+            decrease: The multiplicative decrease factor of the rate on throttling, in (0, 1).
+        """
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"Invalid decrease: {decrease}")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.)
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.
+        self._last_cut: Optional[float] = None
+
+    def acquire(self):
+        """
+        Blocks the calling thread until a request may be sent.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        """
+        Waits until a request may be sent, without blocking the event loop.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        """
+        Records a successful request and ramps the rate up.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Records a throttled request and backs the rate off.
+
+        Args:
+            retry_after: The delay in seconds requested by the server, if any, before sending any other request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._last_cut is None or now - self._last_cut >= 1 / self.rate:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_cut = now
+            self._tokens = min(self._tokens, 0.)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    def _reserve(self) -> float:
+        # takes a token, possibly in advance, and returns how long to wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.
+            return max(delay, self._paused_until - now)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
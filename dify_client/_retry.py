@@ -0,0 +1,83 @@
+import random
+import re
+from typing import Optional, Tuple, FrozenSet
+
+import httpx
+from pydantic import BaseModel, PrivateAttr
+
+from dify_client import errors
+
+# the request never reached the server, retrying them is always safe
+_UNSENT_REQUEST_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# the server may have processed the request, only idempotent requests are retried
+_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+class RetryPolicy(BaseModel):
+    """
+    Decides whether and when a failed request is retried, with a jittered exponential backoff.
+
+    Connection failures are always retried since the request never reached the server. Read timeouts, dropped
+    connections, `retry_statuses` and internal server errors are only retried for idempotent requests, i.e. requests
+    with an idempotent method or an endpoint matching `idempotent_endpoints`, unless `retry_non_idempotent` is set.
+    Streams are only retried until their first event is received. The `Retry-After` delay of an error response is
+    honoured, and the error is not retried when that delay exceeds `backoff_max`. With a `deadline`, the timeouts of
+    each attempt are cut to the rest of the budget, so an attempt started late cannot run past it.
+    """
+    max_attempts: int = 3  # including the first attempt
+    backoff_base: float = .5  # seconds
+    backoff_max: float = 8.  # seconds
+    jitter: bool = True  # draws each delay uniformly from [0, backoff]
+    deadline: Optional[float] = None  # total seconds budget for all attempts and delays, bounds their timeouts too
+    retry_statuses: FrozenSet[int] = frozenset({502, 503, 504})
+    retry_non_idempotent: bool = False
+    idempotent_methods: FrozenSet[str] = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    idempotent_endpoints: Tuple[str, ...] = (
+        r"/messages/[^/]+/feedbacks$",
+        r"/completion-messages/[^/]+/stop$",
+        r"/chat-messages/[^/]+/stop$",
+        r"/workflows/[^/]+/stop$",
+    )
+
+    _idempotent_endpoints_pattern: Optional[re.Pattern] = PrivateAttr(default=None)
+
+    def get_delay(self, attempt: int, elapsed: float, method: str, url: str, error: Exception) -> Optional[float]:
+        """
+        Returns the delay in seconds before retrying a failed attempt, or None if it must not be retried.
+
+        Args:
+            attempt: The number of attempts made so far, starting from 1.
+            elapsed: The seconds elapsed since the first attempt.
+            method: The HTTP method of the request.
+            url: The URL of the request.
+            error: The error raised by the attempt.
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(method, url, error):
+            return None
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_after = error.retry_after if isinstance(error, errors.DifyAPIError) else None
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                return None
+            delay = max(delay, retry_after)
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    def is_retryable(self, method: str, url: str, error: Exception) -> bool:
+        if isinstance(error, _UNSENT_REQUEST_ERRORS):
+            return True
+        if isinstance(error, errors.DifyAPIError):
+            transient = error.status in self.retry_statuses or isinstance(error, errors.DifyInternalServerError)
+        else:
+            transient = isinstance(error, _TRANSIENT_ERRORS)
+        return transient and (self.retry_non_idempotent or self.is_idempotent(method, url))
+
+    def is_idempotent(self, method: str, url: str) -> bool:
+        if method.upper() in self.idempotent_methods:
+            return True
+        if self._idempotent_endpoints_pattern is None:
+            self._idempotent_endpoints_pattern = re.compile("|".join(f"(?:{p})" for p in self.idempotent_endpoints))
+        return bool(self.idempotent_endpoints and self._idempotent_endpoints_pattern.search(url.partition("?")[0]))
@@ -0,0 +1,251 @@
+import collections
+import threading
+from decimal import Decimal
+from typing import Optional, Dict, List, Iterable, Iterator, AsyncIterable, AsyncIterator, Any, Tuple
+
+from dify_client import models, utils
+
+
+class NodeExecution:
+    """
+    The timing and usage of a workflow node within a run, accumulated over its executions (e.g. in iterations).
+    """
+    __slots__ = ("node_id", "node_type", "title", "predecessor_node_id", "index", "started_at", "executions",
+                 "elapsed_time", "status", "total_tokens", "total_price", "currency")
+
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+        self.node_type: Optional[str] = None
+        self.title: Optional[str] = None
+        self.predecessor_node_id: Optional[str] = None
+        self.index: Optional[int] = None  # execution index of the first execution in the run
+        self.started_at: Optional[int] = None  # unix timestamp seconds
+        self.executions = 0
+        self.elapsed_time = 0.  # seconds, summed over the executions
+        self.status: Optional[str] = None  # status of the last execution
+        self.total_tokens = 0
+        self.total_price = Decimal(0)
+        self.currency: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return (f"NodeExecution(node_id={self.node_id!r}, title={self.title!r}, executions={self.executions}, "
+                f"elapsed_time={self.elapsed_time!r}, total_tokens={self.total_tokens})")
+
+
+class WorkflowRunTimeline:
+    """
+    The compact DAG of the nodes executed by a workflow run, linked by their predecessor node.
+    """
+
+    def __init__(self, workflow_run_id: str):
+        self.workflow_run_id = workflow_run_id
+        self.workflow_id: Optional[str] = None
+        self.status: Optional[str] = None
+        self.elapsed_time: Optional[float] = None  # seconds
+        self.total_tokens: Optional[int] = None
+        self.nodes: Dict[str, NodeExecution] = {}
+
+    def critical_path(self) -> List[NodeExecution]:
+        """
+        Returns the chain of nodes with the longest total elapsed time, from the start node to the last node.
+        """
+        path_times: Dict[str, Tuple[float, Optional[str]]] = {}  # node id -> (path elapsed time, previous node id)
+
+        def path_time(node_id: str) -> float:
+            # iterative walk up the predecessors, cycles are cut where they close
+            chain, visiting = [], set()
+            while node_id in self.nodes and node_id not in path_times and node_id not in visiting:
+                visiting.add(node_id)
+                chain.append(node_id)
+                node_id = self.nodes[node_id].predecessor_node_id
+            total = path_times[node_id][0] if node_id in path_times else 0.
+            previous = node_id if node_id in path_times else None
+            for chained_id in reversed(chain):
+                total += self.nodes[chained_id].elapsed_time
+                path_times[chained_id] = (total, previous)
+                previous = chained_id
+            return total
+
+        last_id = max(self.nodes, key=path_time, default=None)
+        path = []
+        while last_id is not None:
+            path.append(self.nodes[last_id])
+            last_id = path_times[last_id][1]
+        return path[::-1]
+
+
+class NodeLatencyStats:
+    """
+    The latency and usage of a workflow node aggregated over the finished runs.
+    """
+    __slots__ = ("workflow_id", "node_id", "node_type", "title", "runs", "executions", "total_elapsed_time",
+                 "max_elapsed_time", "critical_runs", "total_tokens", "total_price")
+
+    def __init__(self, workflow_id: Optional[str], node_id: str):
+        self.workflow_id = workflow_id
+        self.node_id = node_id
+        self.node_type: Optional[str] = None
+        self.title: Optional[str] = None
+        self.runs = 0
+        self.executions = 0
+        self.total_elapsed_time = 0.
+        self.max_elapsed_time = 0.
+        self.critical_runs = 0  # number of runs with the node on their critical path
+        self.total_tokens = 0
+        self.total_price = Decimal(0)
+
+    @property
+    def mean_elapsed_time(self) -> float:
+        return self.total_elapsed_time / self.runs if self.runs else 0.
+
+    def __repr__(self) -> str:
+        return (f"NodeLatencyStats(node_id={self.node_id!r}, title={self.title!r}, runs={self.runs}, "
+                f"mean_elapsed_time={self.mean_elapsed_time:.3f}, critical_runs={self.critical_runs})")
+
+
+class WorkflowRunTracker:
+    """
+    Builds the node timeline of workflow runs from their stream events, and aggregates the node latencies of the
+    finished runs.
+
+    Only the timelines of the runs in progress are kept, plus the last `keep_runs` finished ones, so thousands of
+    runs can be tracked without keeping their raw events in memory. The runs of streams ending before their
+    `workflow_finished` event are discarded by `track` / `atrack`, and beyond `max_runs` runs in progress the oldest
+    one is discarded. A tracker is safe to share across threads.
+
+    Usage:
+        tracker = WorkflowRunTracker()
+        for event in tracker.track(client.run_workflows(req)):
+            ...
+        slowest = tracker.node_stats()[:5]
+    """
+
+    def __init__(self, keep_runs: int = 0, max_runs: int = 1024):
+        self.finished_runs = collections.deque(maxlen=keep_runs)
+        self.max_runs = max_runs
+        self._runs: Dict[str, WorkflowRunTimeline] = {}
+        self._stats: Dict[Tuple[Optional[str], str], NodeLatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def feed(self, event: Any) -> Optional[WorkflowRunTimeline]:
+        """
+        Adds a workflow stream event to the timeline of its run.
+
+        Returns:
+            The timeline of the run if the event finished it.
+        """
+        name = event.event
+        data = getattr(event, "data", None)
+        run_id = getattr(event, "workflow_run_id", None)
+        if data is None or run_id is None:
+            return None
+        with self._lock:
+            timeline = self._runs.get(run_id)
+            if timeline is None:
+                timeline = self._runs[run_id] = WorkflowRunTimeline(run_id)
+                if len(self._runs) > self.max_runs:
+                    del self._runs[next(iter(self._runs))]
+            if name == models.StreamEvent.WORKFLOW_STARTED:
+                timeline.workflow_id = data.workflow_id
+            elif name == models.StreamEvent.NODE_STARTED:
+                node = self._get_node(timeline, data)
+                node.started_at = node.started_at or data.created_at
+            elif name == models.StreamEvent.NODE_FINISHED:
+                node = self._get_node(timeline, data)
+                node.executions += 1
+                node.elapsed_time += data.elapsed_time or 0.
+                node.status = data.status
+                if data.execution_metadata is not None:
+                    node.total_tokens += data.execution_metadata.total_tokens or 0
+                    node.total_price += utils.parse_price(data.execution_metadata.total_price)
+                    node.currency = node.currency or data.execution_metadata.currency
+            elif name == models.StreamEvent.WORKFLOW_FINISHED:
+                timeline.workflow_id = timeline.workflow_id or data.workflow_id
+                timeline.status = data.status
+                timeline.elapsed_time = data.elapsed_time
+                timeline.total_tokens = data.total_tokens
+                del self._runs[run_id]
+                self._aggregate(timeline)
+                self.finished_runs.append(timeline)
+                return timeline
+        return None
+
+    def track(self, stream: Iterable[Any]) -> Iterator[Any]:
+        """
+        Passes the events of a workflow stream through, feeding them to the tracker.
+        """
+        run_id = None
+        try:
+            for event in stream:
+                self.feed(event)
+                run_id = run_id or getattr(event, "workflow_run_id", None)
+                yield event
+        finally:
+            if run_id is not None:
+                self.discard(run_id)
+
+    async def atrack(self, stream: AsyncIterable[Any]) -> AsyncIterator[Any]:
+        """
+        Passes the events of an async workflow stream through, feeding them to the tracker.
+        """
+        run_id = None
+        try:
+            async for event in stream:
+                self.feed(event)
+                run_id = run_id or getattr(event, "workflow_run_id", None)
+                yield event
+        finally:
+            if run_id is not None:
+                self.discard(run_id)
+
+    def get_run(self, workflow_run_id: str) -> Optional[WorkflowRunTimeline]:
+        """
+        Returns the timeline of a run in progress.
+        """
+        return self._runs.get(workflow_run_id)
+
+    def discard(self, workflow_run_id: str):
+        """
+        Drops the timeline of a run in progress, e.g. when its stream failed, its node latencies are not aggregated.
+        """
+        with self._lock:
+            self._runs.pop(workflow_run_id, None)
+
+    def node_stats(self, workflow_id: Optional[str] = None) -> List[NodeLatencyStats]:
+        """
+        Returns the node latency stats of the finished runs, from the node with the highest total elapsed time.
+
+        Args:
+            workflow_id: Only returns the nodes of this workflow if set.
+        """
+        with self._lock:
+            stats = [s for s in self._stats.values() if workflow_id is None or s.workflow_id == workflow_id]
+        return sorted(stats, key=lambda s: s.total_elapsed_time, reverse=True)
+
+    @staticmethod
+    def _get_node(timeline: WorkflowRunTimeline, data: Any) -> NodeExecution:
+        node = timeline.nodes.get(data.node_id)
+        if node is None:
+            node = timeline.nodes[data.node_id] = NodeExecution(data.node_id)
+            node.node_type = data.node_type
+            node.title = data.title
+            node.predecessor_node_id = data.predecessor_node_id
+            node.index = data.index
+        return node
+
+    def _aggregate(self, timeline: WorkflowRunTimeline):
+        critical_ids = {node.node_id for node in timeline.critical_path()}
+        for node in timeline.nodes.values():
+            key = (timeline.workflow_id, node.node_id)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = NodeLatencyStats(timeline.workflow_id, node.node_id)
+                stats.node_type = node.node_type
+                stats.title = node.title
+            stats.runs += 1
+            stats.executions += node.executions
+            stats.total_elapsed_time += node.elapsed_time
+            stats.max_elapsed_time = max(stats.max_elapsed_time, node.elapsed_time)
+            stats.critical_runs += node.node_id in critical_ids
+            stats.total_tokens += node.total_tokens
+            stats.total_price += node.total_price
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+from typing import Union, Iterable, AsyncIterable, BinaryIO, Optional, Callable, Dict, Iterator, AsyncIterator
+
+# a path, a binary file object, bytes, or an iterator / async iterator of bytes
+UploadSource = Union[str, os.PathLike, BinaryIO, bytes, Iterable[bytes], AsyncIterable[bytes]]
+# called with the number of file bytes sent so far and the file size if known
+UploadProgress = Callable[[int, Optional[int]], None]
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class MultipartStream:
+    """
+    A `multipart/form-data` request body built incrementally, so that the file is never buffered in memory.
+
+    The body can be iterated synchronously, or asynchronously through `as_async`, and again from the start for
+    paths, bytes and seekable file objects, which lets the request be retried. Its length is announced when the file
+    size is known, otherwise the body is sent with chunked transfer encoding.
+    """
+
+    def __init__(self, fields: Dict[str, str], file_field: str, source: UploadSource,
+                 filename: Optional[str] = None, mime_type: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, use_mmap: bool = False,
+                 progress: Optional[UploadProgress] = None):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
+        self.progress = progress
+        self.filename = filename or _guess_filename(source)
+        self.mime_type = mime_type or mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        self.boundary = os.urandom(16).hex()
+
+        head = b"".join(self._encode_field(name, value) for name, value in fields.items())
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+                 f'filename="{_quote(self.filename)}"\r\nContent-Type: {self.mime_type}\r\n\r\n').encode()
+        self._head = head
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.file_size = _get_size(source)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if self.file_size is not None:
+            headers["Content-Length"] = str(len(self._head) + self.file_size + len(self._tail))
+        return headers
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        sent = 0
+        for chunk in self._iter_file():
+            sent += len(chunk)
+            yield chunk
+            if self.progress is not None:
+                self.progress(sent, self.file_size)
+        yield self._tail
+
+    def as_async(self) -> AsyncIterable[bytes]:
+        # httpx sends any iterable body synchronously, async clients need a body which is only async iterable
+        return _AsyncMultipartStream(self)
+
+    async def _aiter(self) -> AsyncIterator[bytes]:
+        yield self._head
+        sent = 0
+        async for chunk in self._aiter_file():
+            sent += len(chunk)
+            yield chunk
+            if self.progress is not None:
+                self.progress(sent, self.file_size)
+        yield self._tail
+
+    async def _aiter_file(self) -> AsyncIterator[bytes]:
+        source = self.source
+        if hasattr(source, "__aiter__"):
+            async for chunk in source:
+                yield bytes(chunk)
+            return
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            for chunk in self._iter_file():  # already in memory, nothing blocks
+                yield chunk
+            return
+        # the files are opened and read on the default executor, to keep the disk I/O off the event loop
+        loop = asyncio.get_running_loop()
+        chunks, pending = self._iter_file(), None
+        try:
+            while True:
+                pending = loop.run_in_executor(None, next, chunks, None)
+                chunk = await pending
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            if pending is None or pending.done():
+                chunks.close()
+            else:  # cancelled while reading, the file is closed once the read is over
+                pending.add_done_callback(lambda _: chunks.close())
+
+    def _encode_field(self, name: str, value: str) -> bytes:
+        return (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f'{value}\r\n').encode()
+
+    def _iter_file(self) -> Iterator[bytes]:
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            for offset in range(0, len(view), self.chunk_size):
+                yield bytes(view[offset:offset + self.chunk_size])
+        elif isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield from self._iter_file_object(f, self.use_mmap)
+        elif hasattr(source, "read"):
+            if _is_seekable(source):
+                source.seek(0)
+            yield from self._iter_file_object(source, False)
+        else:
+            for chunk in source:
+                yield bytes(chunk)
+
+    def _iter_file_object(self, f: BinaryIO, use_mmap: bool) -> Iterator[bytes]:
+        if use_mmap and self.file_size:
+            import mmap
+
+            # the pages are read lazily through the page cache, no read() copy into the process
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), self.chunk_size):
+                    yield mm[offset:offset + self.chunk_size]
+            return
+        while True:
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class _AsyncMultipartStream:
+    def __init__(self, stream: MultipartStream):
+        self._stream = stream
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._stream._aiter()
+
+
+def hash_upload_source(source: UploadSource, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[str]:
+    # sha256 of the file content, None for iterators which cannot be read twice
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    elif hasattr(source, "read") and _is_seekable(source):
+        source.seek(0)
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+        source.seek(0)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def _guess_filename(source: UploadSource) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and name and not name.startswith("<"):
+        return os.path.basename(name)
+    return "file"
+
+
+def _get_size(source: UploadSource) -> Optional[int]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.stat(source).st_size
+    if hasattr(source, "read") and _is_seekable(source):
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    return None
+
+
+def _is_seekable(f: BinaryIO) -> bool:
+    seekable = getattr(f, "seekable", None)
+    return seekable is not None and seekable()
+
+
+def _quote(value: str) -> str:
+    # same escaping as the HTML5 form submission algorithm
+    return value.replace("\r", "%0D").replace("\n", "%0A").replace('"', "%22")
@@ -0,0 +1,195 @@
+import math
+import threading
+import time
+from decimal import Decimal
+from typing import Optional, Dict, Tuple, List, Any
+
+from dify_client import models, utils
+
+# (app, user, model)
+UsageKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+class UsageTotals:
+    """
+    Token counts and spend summed over requests.
+    """
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "total_price", "currency")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.total_price = Decimal(0)
+        self.currency: Optional[str] = None
+
+    def add(self, prompt_tokens: int, completion_tokens: int, total_tokens: int, total_price: Decimal,
+            currency: Optional[str]):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.total_tokens += total_tokens
+        self.total_price += total_price
+        self.currency = self.currency or currency
+
+    def merge(self, other: "UsageTotals"):
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.total_tokens += other.total_tokens
+        self.total_price += other.total_price
+        self.currency = self.currency or other.currency
+
+    def __repr__(self) -> str:
+        return (f"UsageTotals(requests={self.requests}, total_tokens={self.total_tokens}, "
+                f"total_price={self.total_price}, currency={self.currency!r})")
+
+
+class _UsageShard:
+    __slots__ = ("lock", "totals", "buckets")
+
+    def __init__(self, bucket_count: int):
+        self.lock = threading.Lock()
+        self.totals: Dict[UsageKey, UsageTotals] = {}
+        # ring of (bucket id, totals) covering the rolling window
+        self.buckets: List[Tuple[int, Dict[UsageKey, UsageTotals]]] = [(-1, {}) for _ in range(bucket_count)]
+
+
+class UsageAggregator:
+    """
+    Accumulates the token usage and spend reported by the API, per app, user and model, over the lifetime of the
+    aggregator and over a rolling window.
+
+    Set it as the `usage_aggregator` of clients and it is fed from every blocking chat and completion response, every
+    `message_end` event and every `node_finished` event. The counters are split in shards by key, each with its own
+    lock, so that concurrent requests rarely contend, and the prices are parsed into `Decimal` once when recorded.
+    An aggregator is safe to share across threads and clients.
+
+    The model of the chat and completion usage is not reported by the API and is recorded as None, the model of
+    workflow nodes is read from their process data when they call an LLM.
+    """
+
+    def __init__(self, window: float = 300., bucket_duration: float = 10., shards: int = 16):
+        """
+        Args:
+            window: The duration of the rolling window, in seconds.
+            bucket_duration: The resolution of the rolling window, in seconds.
+            shards: The number of independently locked shards of counters.
+        """
+        self.window = window
+        self.bucket_duration = bucket_duration
+        self._bucket_count = max(math.ceil(window / bucket_duration), 1)
+        self._shards = [_UsageShard(self._bucket_count) for _ in range(shards)]
+
+    def record(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+               total_tokens: Optional[int] = None, total_price: Optional[Decimal] = None,
+               currency: Optional[str] = None, app: Optional[str] = None, user: Optional[str] = None,
+               model: Optional[str] = None):
+        """
+        Records the usage of a request.
+        """
+        key = (app, user, model)
+        values = (prompt_tokens or 0, completion_tokens or 0, total_tokens or 0,
+                  total_price if total_price is not None else Decimal(0), currency)
+        bucket_id = int(time.time() // self.bucket_duration)
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            totals = shard.totals.get(key)
+            if totals is None:
+                totals = shard.totals[key] = UsageTotals()
+            totals.add(*values)
+
+            slot = bucket_id % self._bucket_count
+            slot_id, bucket = shard.buckets[slot]
+            if slot_id != bucket_id:
+                bucket = {}
+                shard.buckets[slot] = (bucket_id, bucket)
+            totals = bucket.get(key)
+            if totals is None:
+                totals = bucket[key] = UsageTotals()
+            totals.add(*values)
+
+    def record_usage(self, usage: models.Usage, app: Optional[str] = None, user: Optional[str] = None,
+                     model: Optional[str] = None):
+        """
+        Records the `Usage` of a chat or completion message.
+        """
+        self.record(usage.prompt_tokens, usage.completion_tokens, usage.total_tokens,
+                    utils.parse_price(usage.total_price), usage.currency, app, user, model)
+
+    def record_execution(self, metadata: models.ExecutionMetadata, app: Optional[str] = None,
+                         user: Optional[str] = None, model: Optional[str] = None):
+        """
+        Records the `ExecutionMetadata` of a workflow node.
+        """
+        self.record(None, None, metadata.total_tokens, utils.parse_price(metadata.total_price), metadata.currency,
+                    app, user, model)
+
+    def record_event(self, event: Any, app: Optional[str] = None, user: Optional[str] = None,
+                     node_usage: bool = True):
+        """
+        Records the usage carried by a response or a stream event, if any.
+
+        Args:
+            event: The response or stream event.
+            app: The app of the usage.
+            user: The user of the usage.
+            node_usage: Records the usage of the `node_finished` events if set. The chat streams of chatflow apps
+                also report the total usage of their nodes at `message_end`, leave it unset for them.
+        """
+        metadata = getattr(event, "metadata", None)
+        if isinstance(metadata, models.Metadata):
+            if metadata.usage is not None:
+                self.record_usage(metadata.usage, app, user)
+            return
+        if not node_usage:
+            return
+        data = getattr(event, "data", None)
+        if isinstance(data, models.NodeFinishedData) and data.execution_metadata is not None:
+            model = data.process_data.get("model_name") if data.process_data else None
+            self.record_execution(data.execution_metadata, app, user, model)
+
+    def totals(self, window: bool = False) -> Dict[UsageKey, UsageTotals]:
+        """
+        Returns the totals per (app, user, model) key.
+
+        Args:
+            window: Only sums the usage recorded in the rolling window if set, else since the aggregator was created.
+        """
+        oldest_bucket_id = int(time.time() // self.bucket_duration) - self._bucket_count + 1
+        merged: Dict[UsageKey, UsageTotals] = {}
+        for shard in self._shards:
+            with shard.lock:
+                if window:
+                    parts = [bucket for bucket_id, bucket in shard.buckets if bucket_id >= oldest_bucket_id]
+                else:
+                    parts = [shard.totals]
+                for part in parts:
+                    for key, totals in part.items():
+                        merged_totals = merged.get(key)
+                        if merged_totals is None:
+                            merged_totals = merged[key] = UsageTotals()
+                        merged_totals.merge(totals)
+        return merged
+
+    def total(self, app: Optional[str] = None, user: Optional[str] = None, model: Optional[str] = None,
+              window: bool = False) -> UsageTotals:
+        """
+        Returns the totals of the keys matching the given app, user and model, any of them matching if unset.
+        """
+        total = UsageTotals()
+        for (key_app, key_user, key_model), totals in self.totals(window).items():
+            if (app is None or app == key_app) and (user is None or user == key_user) and \
+                    (model is None or model == key_model):
+                total.merge(totals)
+        return total
+
+    def reset(self):
+        """
+        Clears all the counters.
+        """
+        for shard in self._shards:
+            with shard.lock:
+                shard.totals = {}
+                shard.buckets = [(-1, {}) for _ in range(self._bucket_count)]
@@ -1,18 +1,51 @@
 from http import HTTPStatus
-from typing import Union
+from typing import Union, Optional, Mapping
 
 import httpx
 import httpx_sse
 
-from dify_client import models
+from dify_client import models, utils
+
+ERROR_STREAM_EVENT = models.StreamEvent.ERROR.value
+# Dify sends the stream errors as `data: {"event": "error", ...}` without an `event:` field, only the data of the
+# events containing this marker is decoded to look for them
+_ERROR_DATA_MARKER = f'"{ERROR_STREAM_EVENT}"'
+# the headers carrying the id of a request, set by the API or by the gateways and proxies in front of it
+REQUEST_ID_HEADERS = ("x-request-id", "x-trace-id", "x-amzn-requestid", "cf-ray")
+# the maximum length of the message of the errors whose body is not a Dify error, e.g. the HTML page of a proxy
+MAX_RAW_ERROR_MESSAGE_LENGTH = 200
 
 
 class DifyAPIError(Exception):
-    def __init__(self, status: int, code: str, message: str):
+    def __init__(self, status: int, code: str, message: str, headers: Optional[Mapping[str, str]] = None):
         super().__init__(f"status_code={status}, code={code}, {message}")
         self.status = status
         self.code = code
         self.message = message
+        # the headers of the error response, None for the error events of streams
+        self.headers = headers
+
+    @property
+    def request_id(self) -> Optional[str]:
+        """
+        The id of the failed request, as set by the API or by a gateway in front of it, if any.
+        """
+        if self.headers is None:
+            return None
+        for name in REQUEST_ID_HEADERS:
+            value = self.headers.get(name)
+            if value:
+                return value
+        return None
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """
+        The delay in seconds requested by the server before retrying, from the `Retry-After` header, if any.
+        """
+        if self.headers is None:
+            return None
+        return utils.parse_retry_after(self.headers.get("retry-after"))
 
 
 class DifyInvalidParam(DifyAPIError):
@@ -110,23 +143,92 @@ SPEC_CODE_ERRORS = {
 
 
 def raise_for_status(response: Union[httpx.Response, httpx_sse.ServerSentEvent]):
-    if isinstance(response, httpx.Response):
-        if response.is_success:
-            return
-        json = response.json()
-        if "status" not in json:
-            json["status"] = response.status_code
-        details = models.ErrorResponse(**json)
-    elif isinstance(response, httpx_sse.ServerSentEvent):
-        if response.event != models.StreamEvent.ERROR.value:
-            return
-        details = models.ErrorStreamResponse(**response.json())
+    if isinstance(response, httpx_sse.ServerSentEvent):
+        raise_for_event(response)
+    elif isinstance(response, httpx.Response):
+        raise_for_response(response)
     else:
         raise ValueError(f"Invalid dify response type: {type(response)}")
 
-    if details.status == HTTPStatus.NOT_FOUND:
-        raise DifyResourceNotFound(details.status, details.code, details.message)
-    elif details.status == HTTPStatus.INTERNAL_SERVER_ERROR:
-        raise DifyInternalServerError(details.status, details.code, details.message)
+
+def raise_for_response(response: httpx.Response):
+    """
+    Raises the error of a response, if it is not successful.
+
+    The body is parsed as a Dify error when it is a JSON object with a `code` or a `message`. Other bodies, e.g. empty
+    bodies or the HTML error pages of proxies, raise an error with the status of the response and an excerpt of the
+    body as message.
+
+    Raises:
+        DifyAPIError, or one of its subclasses, carrying the headers of the response.
+    """
+    if response.is_success:
+        return
+    details = _parse_error_body(response)
+    _raise_error(details.status, details.code, details.message, response.headers)
+
+
+def raise_for_event(sse: httpx_sse.ServerSentEvent):
+    """
+    Raises the error of a server-sent event, if it is an `error` event, either by its `event` field or by the `event`
+    key of its data.
+
+    Raises:
+        DifyAPIError, or one of its subclasses.
+    """
+    is_error_event = sse.event == ERROR_STREAM_EVENT
+    if not is_error_event and _ERROR_DATA_MARKER not in sse.data:
+        return
+    try:
+        body = sse.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        if is_error_event:
+            _raise_error(HTTPStatus.INTERNAL_SERVER_ERROR, "", _truncate(sse.data))
+        return
+    if not is_error_event and body.get(models.STREAM_EVENT_KEY) != ERROR_STREAM_EVENT:
+        return  # e.g. a node finished with the `error` status
+    try:
+        details = models.ErrorResponse(**body)
+    except (ValueError, TypeError):
+        details = models.ErrorResponse()
+    if not details.code and not details.message:
+        details.message = _truncate(sse.data)
+    _raise_error(details.status, details.code, details.message)
+
+
+def _parse_error_body(response: httpx.Response) -> models.ErrorResponse:
+    content = response.content
+    if content.lstrip()[:1] == b"{":
+        try:
+            body = response.json()
+            if "status" not in body:
+                body["status"] = response.status_code
+            details = models.ErrorResponse(**body)
+            if details.code or details.message:
+                return details
+        except (ValueError, TypeError):
+            pass
+        # not a Dify error after all, e.g. `{"detail": "upstream timed out"}` from a gateway
+    message = response.reason_phrase
+    if content:
+        message = f"{message}: {_truncate(response.text)}" if message else _truncate(response.text)
+    return models.ErrorResponse(status=response.status_code, message=message)
+
+
+def _truncate(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) > MAX_RAW_ERROR_MESSAGE_LENGTH:
+        return text[:MAX_RAW_ERROR_MESSAGE_LENGTH] + "..."
+    return text
+
+
+def _raise_error(status: int, code: str, message: str, headers: Optional[Mapping[str, str]] = None):
+    if status == HTTPStatus.NOT_FOUND:
+        error_cls = DifyResourceNotFound
+    elif status == HTTPStatus.INTERNAL_SERVER_ERROR:
+        error_cls = DifyInternalServerError
     else:
-        raise SPEC_CODE_ERRORS.get(details.code, DifyAPIError)(details.status, details.code, details.message)
+        error_cls = SPEC_CODE_ERRORS.get(code, DifyAPIError)
+    raise error_cls(status, code, message, headers)
@@ -1,3 +1,4 @@
+from .audio import *
 from .chat import *
 from .completion import *
 from .feedback import *
@@ -0,0 +1,18 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class TextToAudioRequest(BaseModel):
+    # the message to synthesize, takes priority over `text` when both are set
+    message_id: Optional[str] = None
+    text: Optional[str] = None
+    user: Optional[str] = None
+
+
+class AudioToTextRequest(BaseModel):
+    user: Optional[str] = None
+
+
+class AudioToTextResponse(BaseModel):
+    text: Optional[str] = None
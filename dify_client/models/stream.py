@@ -2,7 +2,7 @@ try:
     from enum import StrEnum
 except ImportError:
     from strenum import StrEnum
-from typing import Union, Optional, List
+from typing import Union, Optional, List, Iterable, Type
 
 from pydantic import BaseModel, ConfigDict, field_validator
 
@@ -26,6 +26,7 @@ class StreamEvent(StrEnum):
     MESSAGE_REPLACE = "message_replace"
     ERROR = "error"
     PING = "ping"
+    TTS_MESSAGE = 'tts_message'  # base64 audio chunk
     TTS_MESSAGE_END = 'tts_message_end'
     ITERATION_STARTED = 'iteration_started'
     ITERATION_NEXT = 'iteration_next'
@@ -48,12 +49,17 @@ class StreamEvent(StrEnum):
 class StreamResponse(BaseModel):
     model_config = ConfigDict(extra='allow')
 
-    event: StreamEvent
+    event: Union[StreamEvent, str]  # the raw event name is kept for events this client does not know yet
     task_id: Optional[str] = ""
 
     @field_validator("event", mode="before")
-    def transform_stream_event(cls, event: Union[StreamEvent, str]) -> StreamEvent:
-        return StreamEvent.new(event)
+    def transform_stream_event(cls, event: Union[StreamEvent, str]) -> Union[StreamEvent, str]:
+        return utils.str_to_enum(StreamEvent, event, ignore_not_found=True, enum_default=event)
+
+
+class UnknownStreamResponse(StreamResponse):
+    # the decoded payload of an event without a registered model, kept as-is and not validated
+    raw: Optional[dict] = None
 
 
 class PingResponse(StreamResponse):
@@ -85,6 +91,13 @@ class MessageReplaceStreamResponse(MessageStreamResponse):
     answer: Optional[str] = None
 
 
+class TTSMessageStreamResponse(StreamResponse):
+    audio: Optional[str] = ""  # base64 encoded audio chunk
+    created_at: Optional[int] = None  # unix timestamp seconds
+    message_id: Optional[str] = None
+    conversation_id: Optional[str] = ""
+
+
 class TTSMessageEndStreamResponse(StreamResponse):
     audio: Optional[str] = ""
     created_at: Optional[int] = None  # unix timestamp seconds
@@ -134,11 +147,23 @@ class ChatWorkflowsStreamResponse(WorkflowsStreamResponse):
     created_at: Optional[int] = None
 
 
+def _build_stream_response(mapping: dict, data: dict) -> StreamResponse:
+    # StreamEvent members hash like their str values, the event is converted only once by the model validator
+    event = data.get(STREAM_EVENT_KEY)
+    model = mapping.get(event)
+    if model is not None:
+        return model(**data)
+    if utils.str_to_enum(StreamEvent, event, ignore_not_found=True) is not None:
+        return StreamResponse(**data)
+    return UnknownStreamResponse.model_construct(event=event, task_id=data.get("task_id", ""), raw=data)
+
+
 _COMPLETION_EVENT_TO_STREAM_RESP_MAPPING = {
     StreamEvent.PING: PingResponse,
     StreamEvent.MESSAGE: MessageStreamResponse,
     StreamEvent.MESSAGE_END: MessageEndStreamResponse,
     StreamEvent.MESSAGE_REPLACE: MessageReplaceStreamResponse,
+    StreamEvent.TTS_MESSAGE: TTSMessageStreamResponse,
     StreamEvent.TTS_MESSAGE_END: MessageEndStreamResponse
 }
 
@@ -147,13 +172,20 @@ CompletionStreamResponse = Union[
     MessageStreamResponse,
     MessageEndStreamResponse,
     MessageReplaceStreamResponse,
-    TTSMessageEndStreamResponse
+    TTSMessageStreamResponse,
+    TTSMessageEndStreamResponse,
+    UnknownStreamResponse,
 ]
 
 
 def build_completion_stream_response(data: dict) -> CompletionStreamResponse:
-    event = StreamEvent.new(data.get(STREAM_EVENT_KEY))
-    return _COMPLETION_EVENT_TO_STREAM_RESP_MAPPING.get(event, StreamResponse)(**data)
+    return _build_stream_response(_COMPLETION_EVENT_TO_STREAM_RESP_MAPPING, data)
+
+
+def build_completion_stream_delta(data: dict) -> Union["MessageDelta", CompletionStreamResponse]:
+    if data.get(STREAM_EVENT_KEY) == StreamEvent.MESSAGE.value:
+        return MessageDelta(data, _COMPLETION_EVENT_TO_STREAM_RESP_MAPPING)
+    return build_completion_stream_response(data)
 
 
 _CHAT_EVENT_TO_STREAM_RESP_MAPPING = {
@@ -163,6 +195,7 @@ _CHAT_EVENT_TO_STREAM_RESP_MAPPING = {
     StreamEvent.MESSAGE_END: MessageEndStreamResponse,
     StreamEvent.MESSAGE_REPLACE: MessageReplaceStreamResponse,
     StreamEvent.MESSAGE_FILE: MessageFileStreamResponse,
+    StreamEvent.TTS_MESSAGE: TTSMessageStreamResponse,
     StreamEvent.TTS_MESSAGE_END: TTSMessageEndStreamResponse,
     # agent
     StreamEvent.AGENT_MESSAGE: AgentMessageStreamResponse,
@@ -183,17 +216,54 @@ ChatStreamResponse = Union[
     AgentMessageStreamResponse,
     AgentThoughtStreamResponse,
     WorkflowsStreamResponse,
-    TTSMessageEndStreamResponse
+    TTSMessageStreamResponse,
+    TTSMessageEndStreamResponse,
+    UnknownStreamResponse,
 ]
 
 
 def build_chat_stream_response(data: dict) -> ChatStreamResponse:
-    event = StreamEvent.new(data.get(STREAM_EVENT_KEY))
-    return _CHAT_EVENT_TO_STREAM_RESP_MAPPING.get(event, StreamResponse)(**data)
+    return _build_stream_response(_CHAT_EVENT_TO_STREAM_RESP_MAPPING, data)
+
+
+class MessageDelta:
+    """
+    A lightweight view of a `message` / `agent_message` event which skips pydantic validation.
+
+    These token-sized events dominate long streams, so their fields are read straight from the decoded payload.
+    Use `to_model` to get the fully validated stream response when needed.
+    """
+    __slots__ = ("event", "task_id", "message_id", "conversation_id", "answer", "created_at", "_data", "_mapping")
+
+    def __init__(self, data: dict, mapping: dict):
+        self.event = data.get(STREAM_EVENT_KEY)
+        self.task_id = data.get("task_id", "")
+        self.message_id = data.get("message_id")
+        self.conversation_id = data.get("conversation_id", "")
+        self.answer = data.get("answer")
+        self.created_at = data.get("created_at")
+        self._data = data
+        self._mapping = mapping
+
+    def to_model(self) -> Union[MessageStreamResponse, AgentMessageStreamResponse]:
+        return self._mapping[self.event](**self._data)
+
+    def __repr__(self) -> str:
+        return f"MessageDelta(event={self.event!r}, message_id={self.message_id!r}, answer={self.answer!r})"
+
+
+_DELTA_EVENTS = frozenset((StreamEvent.MESSAGE.value, StreamEvent.AGENT_MESSAGE.value))
+
+
+def build_chat_stream_delta(data: dict) -> Union[MessageDelta, ChatStreamResponse]:
+    if data.get(STREAM_EVENT_KEY) in _DELTA_EVENTS:
+        return MessageDelta(data, _CHAT_EVENT_TO_STREAM_RESP_MAPPING)
+    return build_chat_stream_response(data)
 
 
 _WORKFLOW_EVENT_TO_STREAM_RESP_MAPPING = {
     StreamEvent.PING: PingResponse,
+    StreamEvent.TTS_MESSAGE: TTSMessageStreamResponse,
     StreamEvent.TTS_MESSAGE_END: TTSMessageEndStreamResponse,
     # workflow
     StreamEvent.WORKFLOW_STARTED: WorkflowsStreamResponse,
@@ -205,9 +275,59 @@ _WORKFLOW_EVENT_TO_STREAM_RESP_MAPPING = {
 WorkflowsRunStreamResponse = Union[
     PingResponse,
     WorkflowsStreamResponse,
+    UnknownStreamResponse,
 ]
 
 
 def build_workflows_stream_response(data: dict) -> WorkflowsRunStreamResponse:
-    event = StreamEvent.new(data.get(STREAM_EVENT_KEY))
-    return _WORKFLOW_EVENT_TO_STREAM_RESP_MAPPING.get(event, StreamResponse)(**data)
+    return _build_stream_response(_WORKFLOW_EVENT_TO_STREAM_RESP_MAPPING, data)
+
+
+class StreamType(StrEnum):
+    COMPLETION = "completion"
+    CHAT = "chat"
+    WORKFLOWS = "workflows"
+
+
+_STREAM_TYPE_TO_MAPPING = {
+    StreamType.COMPLETION: _COMPLETION_EVENT_TO_STREAM_RESP_MAPPING,
+    StreamType.CHAT: _CHAT_EVENT_TO_STREAM_RESP_MAPPING,
+    StreamType.WORKFLOWS: _WORKFLOW_EVENT_TO_STREAM_RESP_MAPPING,
+}
+# restored by `unregister_stream_response`
+_DEFAULT_STREAM_TYPE_TO_MAPPING = {
+    stream_type: dict(mapping) for stream_type, mapping in _STREAM_TYPE_TO_MAPPING.items()
+}
+
+
+def register_stream_response(event: Union[StreamEvent, str], model: Type[StreamResponse],
+                             stream_types: Iterable[StreamType] = tuple(StreamType)):
+    """
+    Registers the model used to build the stream responses of an event, overriding any existing mapping.
+
+    Args:
+        event: The event name, which may be an event unknown to this client.
+        model: A `StreamResponse` subclass built from the decoded event payload.
+        stream_types: The streams the mapping applies to, all of them by default.
+    """
+    if not issubclass(model, StreamResponse):
+        raise TypeError(f"Invalid stream response model: {model}")
+    for stream_type in stream_types:
+        _STREAM_TYPE_TO_MAPPING[StreamType(stream_type)][event] = model
+
+
+def unregister_stream_response(event: Union[StreamEvent, str], stream_types: Iterable[StreamType] = tuple(StreamType)):
+    """
+    Removes the model registered for an event, restoring the default model of a known event.
+
+    Args:
+        event: The event name.
+        stream_types: The streams the mapping is removed from, all of them by default.
+    """
+    for stream_type in stream_types:
+        stream_type = StreamType(stream_type)
+        default = _DEFAULT_STREAM_TYPE_TO_MAPPING[stream_type].get(event)
+        if default is None:
+            _STREAM_TYPE_TO_MAPPING[stream_type].pop(event, None)
+        else:
+            _STREAM_TYPE_TO_MAPPING[stream_type][event] = default
@@ -2,9 +2,10 @@ try:
     from enum import StrEnum
 except ImportError:
     from strenum import StrEnum
-from typing import Dict, List, Optional
+import json
+from typing import Dict, List, Optional, Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 
 from dify_client.models.base import ResponseMode, File
 
@@ -90,3 +91,36 @@ class WorkflowsRunResponse(BaseModel):
     task_id: Optional[str] = None
     workflow_run_id: Optional[str] = None
     data: WorkflowFinishedData
+
+
+class WorkflowsRunDetailResponse(BaseModel):
+    id: Optional[str] = None  # workflow run id
+    workflow_id: Optional[str] = None  # workflow id
+    status: Optional[WorkflowStatus] = None
+    inputs: Optional[Any] = None
+    outputs: Optional[Any] = None
+    error: Optional[str] = None
+    total_steps: Optional[int] = 0
+    total_tokens: Optional[int] = None
+    created_at: Optional[int] = None  # unix timestamp seconds
+    finished_at: Optional[int] = None  # unix timestamp seconds
+    elapsed_time: Optional[float] = None  # seconds
+
+    @field_validator("inputs", "outputs", mode="before")
+    def transform_json_string(cls, value: Any) -> Any:
+        # some Dify versions return these objects as JSON strings
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                pass
+        return value
+
+
+class WorkflowsBatchResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int  # position of the request in the batch input
+    request: WorkflowsRunRequest
+    response: Optional[WorkflowsRunResponse] = None
+    error: Optional[Exception] = None  # set instead of `response` when the execution failed
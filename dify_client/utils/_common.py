@@ -1,7 +1,51 @@
+import email.utils
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+_ENUM_VALUE_INDEXES = {}
+
+
+def _enum_value_index(str_enum_class) -> dict:
+    # value -> member index, built once per enum class
+    index = _ENUM_VALUE_INDEXES.get(str_enum_class)
+    if index is None:
+        index = {member.value: member for member in str_enum_class.__members__.values()}
+        _ENUM_VALUE_INDEXES[str_enum_class] = index
+    return index
+
+
 def str_to_enum(str_enum_class, str_value: str, ignore_not_found: bool = False, enum_default=None):
-    for key, member in str_enum_class.__members__.items():
-        if str_value == member.value:
-            return member
+    member = _enum_value_index(str_enum_class).get(str_value)
+    if member is not None:
+        return member
     if ignore_not_found:
         return enum_default
     raise ValueError(f"Invalid enum value: {str_value}")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # `Retry-After` holds either a delay in seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.)
+    except (TypeError, ValueError):
+        return None
+
+
+_ZERO = Decimal(0)
+
+
+def parse_price(value: Optional[str]) -> Decimal:
+    # the API reports prices as decimal strings, unset or malformed prices count as zero
+    if not value:
+        return _ZERO
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return _ZERO
@@ -26,6 +26,12 @@ setup(
         "pydantic",
         "StrEnum",
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "orjson": ["orjson"],
+        "prometheus": ["prometheus_client"],
+        "opentelemetry": ["opentelemetry-api"],
+    },
     keywords='dify nlp ai language-processing',
     include_package_data=True,
 )
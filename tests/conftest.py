@@ -0,0 +1,39 @@
+import json
+from typing import Callable
+
+import httpx
+import pytest
+
+from dify_client import Client, AsyncClient
+
+API_BASE = "http://dify.test/v1"
+
+
+def sse_response(*events: dict, status_code: int = 200) -> httpx.Response:
+    content = "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode()
+    return httpx.Response(status_code, content=content, headers={"content-type": "text/event-stream"})
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(handler: Callable[[httpx.Request], httpx.Response], **options) -> Client:
+        client = Client(api_key="app-key", api_base=API_BASE, **options)
+        client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def make_async_client():
+    def make(handler: Callable[[httpx.Request], httpx.Response], **options) -> AsyncClient:
+        client = AsyncClient(api_key="app-key", api_base=API_BASE, **options)
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    return make
@@ -0,0 +1,64 @@
+import asyncio
+
+from dify_client import ChatStreamAggregator, models
+
+IDS = {"task_id": "task", "message_id": "msg", "conversation_id": "conv"}
+
+
+def _message(answer: str, event: str = "message") -> dict:
+    return {"event": event, **IDS, "answer": answer, "created_at": 1705395332}
+
+
+def _thought(position: int, thought: str, observation: str = "") -> dict:
+    return {"event": "agent_thought", **IDS, "id": f"thought-{position}", "position": position, "thought": thought,
+            "observation": observation}
+
+
+MESSAGE_END = {"event": "message_end", **IDS,
+               "metadata": {"usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13}}}
+
+
+def test_joins_the_deltas_and_carries_the_usage():
+    events = [models.build_chat_stream_response(data) for data in (
+        {"event": "ping"}, _message("Hel"), _message("lo"), _message(""), _message(" world"), MESSAGE_END)]
+    aggregator = ChatStreamAggregator()
+    assert list(aggregator.iter(events)) == ["Hel", "lo", " world"]
+    assert aggregator.finished
+    response = aggregator.response()
+    assert (response.message_id, response.conversation_id, response.answer, response.created_at) == \
+        ("msg", "conv", "Hello world", 1705395332)
+    assert response.metadata.usage.total_tokens == 13
+    assert aggregator.task_id == "task"
+
+
+def test_message_replace_resets_the_answer():
+    aggregator = ChatStreamAggregator()
+    for data in (_message("unsafe "), _message("answer"), {"event": "message_replace", **IDS, "answer": "Sorry."},
+                 _message(" More.")):
+        aggregator.feed(models.build_chat_stream_response(data))
+    assert aggregator.answer == "Sorry. More."
+
+
+def test_merges_agent_thoughts_by_position():
+    aggregator = ChatStreamAggregator()
+    for data in (_thought(1, "search"), _message("A", "agent_message"), _thought(2, "answer"),
+                 _thought(1, "search", observation="found"), _message("B", "agent_message")):
+        aggregator.feed(models.build_chat_stream_response(data))
+    assert [(thought.position, thought.observation) for thought in aggregator.agent_thoughts] == \
+        [(1, "found"), (2, "")]
+    assert aggregator.answer == "AB"
+
+
+def test_accepts_message_deltas_and_async_streams():
+    async def stream():
+        for data in (_message("Hel"), _message("lo", "agent_message"), MESSAGE_END):
+            yield models.build_chat_stream_delta(data)
+
+    async def main():
+        aggregator = ChatStreamAggregator()
+        return [delta async for delta in aggregator.aiter(stream())], aggregator
+
+    deltas, aggregator = asyncio.run(main())
+    assert deltas == ["Hel", "lo"]
+    assert aggregator.response().answer == "Hello" and aggregator.response().message_id == "msg"
+    assert aggregator.response().metadata.usage.prompt_tokens == 10
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+
+from dify_client import errors, models
+
+
+def _run_req(index: int, delay: float = 0., fail: bool = False,
+             response_mode=models.ResponseMode.BLOCKING) -> models.WorkflowsRunRequest:
+    return models.WorkflowsRunRequest(inputs={"index": index, "delay": delay, "fail": fail}, user="user",
+                                      response_mode=response_mode)
+
+
+def _run_response(inputs: dict) -> httpx.Response:
+    if inputs["fail"]:
+        return httpx.Response(400, json={"code": "invalid_param", "message": "bad input", "status": 400})
+    return httpx.Response(200, json={"task_id": f"task-{inputs['index']}", "workflow_run_id": f"run-{inputs['index']}",
+                                     "data": {"status": "succeeded", "outputs": {"index": inputs["index"]}}})
+
+
+class _Server:
+    # a stand-in for the workflow endpoint, recording the most runs in flight at once
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["inputs"]
+        self._enter()
+        try:
+            time.sleep(inputs["delay"])
+        finally:
+            self._exit()
+        return _run_response(inputs)
+
+    async def ahandler(self, request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["inputs"]
+        self._enter()
+        try:
+            await asyncio.sleep(inputs["delay"])
+        finally:
+            self._exit()
+        return _run_response(inputs)
+
+
+def _indexes(results) -> list:
+    return [result.index for result in results]
+
+
+def test_batch_yields_in_input_or_completion_order(make_client):
+    client = make_client(_Server().handler)
+    reqs = [_run_req(0, .3), _run_req(1, .15), _run_req(2)]
+    assert _indexes(client.run_workflows_batch(reqs, max_concurrency=3, ordered=True)) == [0, 1, 2]
+    assert _indexes(client.run_workflows_batch(reqs, max_concurrency=3)) == [2, 1, 0]
+
+
+def test_batch_bounds_runs_in_flight(make_client):
+    server = _Server()
+    client = make_client(server.handler)
+    results = list(client.run_workflows_batch((_run_req(i, .02) for i in range(12)), max_concurrency=3))
+    assert sorted(_indexes(results)) == list(range(12))
+    assert server.max_in_flight == 3
+
+
+def test_batch_captures_errors_per_item(make_client):
+    client = make_client(_Server().handler)
+    reqs = [_run_req(0), _run_req(1, fail=True), _run_req(2, response_mode=models.ResponseMode.STREAMING)]
+    results = list(client.run_workflows_batch(reqs, ordered=True))
+    assert results[0].error is None and results[0].response.data.outputs == {"index": 0}
+    assert isinstance(results[1].error, errors.DifyInvalidParam) and results[1].response is None
+    assert isinstance(results[2].error, ValueError)
+    assert [result.request for result in results] == reqs
+
+
+def test_batch_closed_early_does_not_wait_for_runs_in_flight(make_client):
+    client = make_client(_Server().handler)
+    batch = client.run_workflows_batch([_run_req(0), _run_req(1, 1.), _run_req(2, 1.)], max_concurrency=3)
+    started = time.monotonic()
+    assert next(batch).index == 0
+    batch.close()
+    assert time.monotonic() - started < .5
+
+
+def test_async_batch_orders_bounds_and_captures_errors(make_async_client):
+    server = _Server()
+
+    async def main():
+        async with make_async_client(server.ahandler) as client:
+            reqs = [_run_req(0, .3), _run_req(1, .15), _run_req(2)]
+            ordered = [result async for result in client.arun_workflows_batch(reqs, max_concurrency=3, ordered=True)]
+            completed = [result async for result in client.arun_workflows_batch(reqs, max_concurrency=3)]
+
+            async def more_reqs():
+                for i in range(12):
+                    yield _run_req(i, .02, fail=i == 5)
+
+            bounded = [result async for result in client.arun_workflows_batch(more_reqs(), max_concurrency=3)]
+            return ordered, completed, bounded
+
+    ordered, completed, bounded = asyncio.run(main())
+    assert _indexes(ordered) == [0, 1, 2]
+    assert _indexes(completed) == [2, 1, 0]
+    assert sorted(_indexes(bounded)) == list(range(12))
+    assert [result.index for result in bounded if result.error is not None] == [5]
+    assert server.max_in_flight == 3
+
+
+def test_async_batch_closed_early_cancels_runs_in_flight(make_async_client):
+    server = _Server()
+
+    async def main():
+        async with make_async_client(server.ahandler) as client:
+            batch = client.arun_workflows_batch([_run_req(0), _run_req(1, 10.), _run_req(2, 10.)], max_concurrency=3)
+            started = time.monotonic()
+            assert (await batch.__anext__()).index == 0
+            await batch.aclose()
+            return time.monotonic() - started
+
+    assert asyncio.run(main()) < .5
+    assert server.in_flight == 0
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from dify_client import MemoryCache, ResponseCache, SQLiteCache, models
+
+COMPLETION = {"message_id": "msg", "conversation_id": "", "mode": "completion", "answer": "hello", "metadata": {},
+              "created_at": 0}
+
+
+def _handler(requests: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=COMPLETION)
+
+    return handler
+
+
+def _req(**inputs) -> models.CompletionRequest:
+    return models.CompletionRequest(inputs=inputs, user="user", response_mode=models.ResponseMode.BLOCKING)
+
+
+def test_response_cache_is_abstract():
+    class Incomplete(ResponseCache):
+        def _get(self, key: str):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_memory_cache_evicts_and_expires(monkeypatch):
+    cache = MemoryCache(maxsize=2, ttl=10.)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None  # least recently used
+    now = 0.
+
+    monkeypatch.setattr("dify_client._cache.time.time", lambda: now)
+    cache.set("d", "4")
+    now = 11.
+    assert cache.get("d") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_sqlite_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = SQLiteCache(path)
+    cache.set("a", "1")
+    cache.close()
+    cache = SQLiteCache(path)
+    assert cache.get("a") == "1"
+    cache.clear()
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_completion_cache_skips_identical_requests(make_client):
+    requests = []
+    client = make_client(_handler(requests), completion_cache=MemoryCache())
+    assert client.completion_messages(_req(query="hi")).answer == "hello"
+    assert client.completion_messages(_req(query="hi")).answer == "hello"
+    client.completion_messages(_req(query="bye"))
+    assert len(requests) == 2
+    assert client.completion_cache.hits == 1
+
+
+def test_async_client_calls_sqlite_cache_off_the_event_loop(make_async_client, tmp_path):
+    threads = []
+
+    class RecordingCache(SQLiteCache):
+        def _get(self, key: str):
+            threads.append(threading.current_thread())
+            return super()._get(key)
+
+    requests = []
+    cache = RecordingCache(str(tmp_path / "responses.db"))
+
+    async def main():
+        async with make_async_client(_handler(requests), completion_cache=cache) as client:
+            await client.acompletion_messages(_req(query="hi"))
+            return await client.acompletion_messages(_req(query="hi"))
+
+    assert asyncio.run(main()).answer == "hello"
+    assert len(requests) == 1
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    cache.close()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+
+from dify_client import MemoryCache, models
+from tests.conftest import sse_response
+
+USAGE = {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3, "total_price": "0.003", "currency": "USD"}
+COMPLETION = {"message_id": "msg", "conversation_id": "", "mode": "completion", "answer": "hello",
+              "metadata": {"usage": USAGE}, "created_at": 0}
+
+
+def _completion_handler(requests: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if json.loads(request.content)["response_mode"] == "blocking":
+            return httpx.Response(200, json=COMPLETION)
+        return sse_response(
+            {"event": "message", "task_id": "task", "message_id": "msg", "answer": "hel", "created_at": 0},
+            {"event": "message", "task_id": "task", "message_id": "msg", "answer": "lo", "created_at": 0},
+            {"event": "message_end", "task_id": "task", "message_id": "msg", "metadata": {"usage": USAGE}},
+        )
+
+    return handler
+
+
+def _completion_req(response_mode: models.ResponseMode) -> models.CompletionRequest:
+    return models.CompletionRequest(inputs={"query": "hi"}, user="user", response_mode=response_mode)
+
+
+class _CountingCache(MemoryCache):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def _get(self, key: str):
+        self.reads += 1
+        return super()._get(key)
+
+
+def test_building_a_call_does_not_read_the_cache(make_client):
+    requests = []
+    cache = _CountingCache()
+    client = make_client(_completion_handler(requests), completion_cache=cache)
+    call = client._completion_call(_completion_req(models.ResponseMode.BLOCKING))
+    stream_call = client._completion_call(_completion_req(models.ResponseMode.STREAMING))
+    assert cache.reads == 0
+    assert client._execute(call).answer == "hello"
+    assert [event.event for event in client._execute(stream_call)] == ["message", "message_end"]
+    assert cache.reads == 2
+    assert len(requests) == 1
+
+
+def test_streamed_completion_is_cached_for_blocking_requests(make_client):
+    requests = []
+    client = make_client(_completion_handler(requests), completion_cache=MemoryCache())
+    events = list(client.completion_messages(_completion_req(models.ResponseMode.STREAMING)))
+    assert [event.event for event in events] == ["message", "message", "message_end"]
+    cached = client.completion_messages(_completion_req(models.ResponseMode.BLOCKING))
+    assert cached.answer == "hello"
+    assert cached.metadata.usage.total_tokens == 3
+    assert len(requests) == 1
+
+
+def test_sync_and_async_clients_build_the_same_responses(make_client, make_async_client):
+    requests = []
+    client = make_client(_completion_handler(requests))
+
+    async def main():
+        async with make_async_client(_completion_handler(requests)) as async_client:
+            blocking = await async_client.acompletion_messages(_completion_req(models.ResponseMode.BLOCKING))
+            stream = await async_client.acompletion_messages(_completion_req(models.ResponseMode.STREAMING))
+            return blocking, [event async for event in stream]
+
+    async_blocking, async_events = asyncio.run(main())
+    assert client.completion_messages(_completion_req(models.ResponseMode.BLOCKING)) == async_blocking
+    assert list(client.completion_messages(_completion_req(models.ResponseMode.STREAMING))) == async_events
+    assert [request.url.path for request in requests] == ["/v1/completion-messages"] * 4
@@ -0,0 +1,98 @@
+import httpx
+import pytest
+
+from dify_client import RateLimiter, errors, models
+from tests.conftest import sse_response
+
+CHAT_REQ = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.BLOCKING)
+
+
+def _raise(response: httpx.Response) -> errors.DifyAPIError:
+    response.request = httpx.Request("POST", "http://dify.test/v1/chat-messages")
+    with pytest.raises(errors.DifyAPIError) as exc_info:
+        errors.raise_for_response(response)
+    return exc_info.value
+
+
+def test_maps_dify_error_codes_with_headers():
+    error = _raise(httpx.Response(429, json={"code": "provider_quota_exceeded", "message": "quota", "status": 429},
+                                  headers={"x-request-id": "req-1", "retry-after": "3"}))
+    assert type(error) is errors.DifyProviderQuotaExceeded
+    assert (error.status, error.code, error.message) == (429, "provider_quota_exceeded", "quota")
+    assert error.request_id == "req-1" and error.retry_after == 3.
+
+
+def test_maps_statuses_before_codes():
+    assert type(_raise(httpx.Response(404, json={"code": "invalid_param", "message": "gone"}))) is \
+           errors.DifyResourceNotFound
+    assert type(_raise(httpx.Response(500, json={"code": "unknown", "message": "oops"}))) is \
+           errors.DifyInternalServerError
+
+
+@pytest.mark.parametrize("content", [b"<html><body>" + b"Bad Gateway " * 100 + b"</body></html>", b"{not json",
+                                     b'{"code": 1, "message": ["not", "a", "dify", "error"]}'])
+def test_raises_status_error_for_non_dify_bodies(content):
+    error = _raise(httpx.Response(502, content=content))
+    assert type(error) is errors.DifyAPIError
+    assert error.status == 502
+    assert error.message.startswith("Bad Gateway")
+    assert len(error.message) <= len("Bad Gateway: ") + errors.MAX_RAW_ERROR_MESSAGE_LENGTH + len("...")
+
+
+def test_raises_status_error_for_empty_bodies():
+    error = _raise(httpx.Response(503))
+    assert (error.status, error.message) == (503, "Service Unavailable")
+
+
+def test_client_raises_http_errors(make_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, json={"code": "invalid_param", "message": "query is required", "status": 400})
+
+    with pytest.raises(errors.DifyInvalidParam, match="query is required"):
+        make_client(handler).chat_messages(CHAT_REQ)
+
+
+def test_raises_status_error_for_json_bodies_without_code_or_message():
+    error = _raise(httpx.Response(504, content=b'{"detail": "upstream timed out"}'))
+    assert type(error) is errors.DifyAPIError
+    assert (error.status, error.code) == (504, "")
+    assert error.message == 'Gateway Timeout: {"detail": "upstream timed out"}'
+
+
+def _chat_stream_client(make_client, *events: dict, **options):
+    return make_client(lambda request: sse_response(*events), **options)
+
+
+MESSAGE_EVENT = {"event": "message", "task_id": "task", "message_id": "msg", "conversation_id": "conv",
+                 "answer": "hi", "created_at": 0}
+STREAM_REQ = CHAT_REQ.model_copy(update={"response_mode": models.ResponseMode.STREAMING})
+
+
+def test_client_raises_stream_error_events(make_client):
+    client = _chat_stream_client(make_client, MESSAGE_EVENT,
+                                 {"event": "error", "task_id": "task", "message_id": "msg", "status": 400,
+                                  "code": "completion_request_error", "message": "failed"})
+    stream = client.chat_messages(STREAM_REQ)
+    assert next(stream).answer == "hi"
+    with pytest.raises(errors.DifyCompletionRequestError, match="failed") as exc_info:
+        next(stream)
+    assert exc_info.value.headers is None
+
+
+def test_client_throttles_on_stream_quota_errors(make_client):
+    rate_limiter = RateLimiter(10)
+    client = _chat_stream_client(make_client, {"event": "error", "task_id": "task", "message_id": "msg",
+                                               "status": 400, "code": "provider_quota_exceeded", "message": "quota"},
+                                 rate_limiter=rate_limiter)
+    with pytest.raises(errors.DifyProviderQuotaExceeded):
+        list(client.chat_messages(STREAM_REQ))
+    assert rate_limiter.rate < 10
+
+
+def test_client_yields_events_with_error_values(make_client):
+    node_finished = {"event": "node_finished", "task_id": "task", "workflow_run_id": "run",
+                     "data": {"id": "exec", "node_id": "node", "node_type": "llm", "title": "LLM", "index": 1,
+                              "status": "error", "error": "node failed", "created_at": 0}}
+    client = _chat_stream_client(make_client, {**MESSAGE_EVENT, "answer": 'say "error"'}, node_finished)
+    events = list(client.chat_messages(STREAM_REQ))
+    assert [event.event for event in events] == [models.StreamEvent.MESSAGE, models.StreamEvent.NODE_FINISHED]
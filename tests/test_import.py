@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_package_is_lazy():
+    code = ("import sys, dify_client; "
+            "print(sorted(m for m in ('pydantic', 'httpx', 'dify_client.models', 'dify_client._clientx') "
+            "if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                            cwd=ROOT).stdout
+    assert output.strip() == "[]"
+
+
+def test_public_names_resolve_on_first_access():
+    import dify_client
+
+    assert dify_client.Client.__name__ == "Client"
+    assert dify_client.models.ChatRequest.__name__ == "ChatRequest"
+    assert set(dify_client.__all__) <= set(dir(dify_client))
@@ -0,0 +1,62 @@
+import json
+import sys
+
+import pytest
+
+from dify_client import JSONCodec, OrjsonCodec, models
+from dify_client._json import get_default_json_codec
+
+CHAT_RESPONSE = json.dumps({
+    "message_id": "msg", "conversation_id": "conv", "mode": "advanced-chat", "answer": "Bonjour, ça va ? 👋",
+    "created_at": 1705395332,
+    "metadata": {"usage": {"prompt_tokens": 120, "completion_tokens": 8, "total_tokens": 128, "total_price": "0.0002",
+                           "currency": "USD", "latency": 1.25},
+                 "retriever_resources": [{"position": 1, "dataset_id": "ds", "document_name": "faq.md",
+                                          "score": .87, "content": "..."}]},
+}, ensure_ascii=False).encode()
+WORKFLOWS_RUN_RESPONSE = json.dumps({
+    "task_id": "task", "workflow_run_id": "run",
+    "data": {"id": "run", "workflow_id": "wf", "status": "succeeded", "outputs": {"text": "done", "score": 3},
+             "elapsed_time": 2.5, "total_tokens": 128, "total_steps": 4, "created_at": 1705395332,
+             "finished_at": 1705395335},
+}).encode()
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+CODECS = [JSONCodec(), OrjsonCodec()] if orjson is not None else [JSONCodec()]
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=type)
+@pytest.mark.parametrize("model_cls, body", [(models.ChatResponse, CHAT_RESPONSE),
+                                             (models.WorkflowsRunResponse, WORKFLOWS_RUN_RESPONSE)])
+def test_load_model_matches_the_model_built_from_a_dict(codec, model_cls, body):
+    assert codec.load_model(model_cls, body) == model_cls(**json.loads(body))
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=type)
+def test_dump_model_leaves_out_unset_optional_fields(codec):
+    file = models.File(type=models.FileType.IMAGE, transfer_method=models.TransferMethod.REMOTE_URL,
+                       url="https://example.com/a.png")
+    req = models.ChatRequest(query="ça va ?", inputs={}, user="user", response_mode=models.ResponseMode.BLOCKING,
+                             files=[file])
+    # the top-level fields equal to their default are left out, the others are sent as `model_dump` serialized them
+    expected = req.model_dump(mode="json")
+    del expected["conversation_id"], expected["auto_generate_name"]
+    assert json.loads(codec.dump_model(req)) == expected
+    # the fields the API requires are sent even when empty
+    assert json.loads(codec.dump_model(models.ChatRequest())) == {"query": None, "inputs": {}, "response_mode": None,
+                                                                 "user": None}
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=type)
+def test_plain_values_round_trip(codec):
+    value = {"event": "message", "answer": "ça va ? 👋", "created_at": 1, "nested": [1.5, None, True]}
+    assert codec.dumps(value) == json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+    assert codec.loads(codec.dumps(value)) == codec.loads(codec.dumps(value).decode()) == value
+
+
+def test_default_codec_falls_back_without_orjson(monkeypatch):
+    assert type(get_default_json_codec()) is (OrjsonCodec if orjson is not None else JSONCodec)
+    monkeypatch.setitem(sys.modules, "orjson", None)  # makes `import orjson` raise ImportError
+    assert type(get_default_json_codec()) is JSONCodec
@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+import pytest
+
+from dify_client import MetricsSink, RetryPolicy, models
+from dify_client._metrics import _InstrumentsSink
+from tests.conftest import sse_response
+
+AUDIO = b"ID3" + bytes(4096)
+
+
+class _RecordingSink(MetricsSink):
+    def __init__(self):
+        self.requests = []
+        self.streams = []
+
+    def on_request(self, metrics):
+        self.requests.append(metrics)
+
+    def on_stream(self, metrics):
+        self.streams.append(metrics)
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/text-to-audio":
+        return httpx.Response(200, stream=httpx.ByteStream(AUDIO), headers={"content-type": "audio/mpeg"})
+    if request.url.path.endswith("/feedbacks"):
+        return httpx.Response(200, json={"result": "success"})
+    return sse_response(
+        {"event": "message", "task_id": "task", "message_id": "msg", "conversation_id": "conv", "answer": "hi",
+         "created_at": 0},
+        {"event": "message_end", "task_id": "task", "message_id": "msg", "conversation_id": "conv", "metadata": {}},
+    )
+
+
+def test_reports_requests_and_streams(make_client):
+    sink = _RecordingSink()
+    client = make_client(_handler, metrics_sink=sink)
+    client.feedback_messages("msg", models.FeedbackRequest(rating=models.Rating.LIKE, user="user"))
+    req = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+    list(client.chat_messages(req))
+    request, = sink.requests
+    assert (request.method, request.endpoint, request.status_code, request.attempts) == \
+           ("POST", "/v1/messages/msg/feedbacks", 200, 1)
+    stream, = sink.streams
+    assert stream.events == 2 and stream.error is None and stream.time_to_first_event is not None
+
+
+def test_reports_failed_request_with_its_attempts(make_client):
+    sink = _RecordingSink()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, json={"code": "unavailable", "message": "busy", "status": 503})
+
+    client = make_client(handler, metrics_sink=sink, retry_policy=RetryPolicy(backoff_base=.001, max_attempts=2))
+    with pytest.raises(Exception):
+        client.feedback_messages("msg", models.FeedbackRequest(rating=models.Rating.LIKE, user="user"))
+    request, = sink.requests
+    assert request.status_code == 503 and request.attempts == 2 and request.error is not None
+
+
+def test_reports_audio_byte_streams(make_client, make_async_client):
+    sink = _RecordingSink()
+    client = make_client(_handler, metrics_sink=sink)
+    assert b"".join(client.text_to_audio(models.TextToAudioRequest(text="hi", user="user"))) == AUDIO
+
+    async def main():
+        async with make_async_client(_handler, metrics_sink=sink) as async_client:
+            chunks = await async_client.atext_to_audio(models.TextToAudioRequest(text="hi", user="user"))
+            return b"".join([chunk async for chunk in chunks])
+
+    assert asyncio.run(main()) == AUDIO
+    assert [(metrics.endpoint, metrics.status_code, metrics.bytes_received) for metrics in sink.requests] == \
+           [("/v1/text-to-audio", 200, len(AUDIO))] * 2
+
+
+def test_instruments_sink_is_abstract():
+    class Incomplete(_InstrumentsSink):
+        def _observe(self, name, value, labels):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
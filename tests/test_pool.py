@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from dify_client import AsyncClientPool, ClientPool, errors, models
+from tests.conftest import sse_response
+
+
+def _backend(name: str, requests: list, fail: bool = False):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((name, request.url.path))
+        if fail:
+            return httpx.Response(502, json={"code": "bad_gateway", "message": "down", "status": 502})
+        body = json.loads(request.content) if request.content else {}
+        conversation_id = body.get("conversation_id") or f"conv-{name}"
+        if body.get("response_mode") == "streaming":
+            return sse_response({"event": "message", "task_id": f"task-{name}", "message_id": f"msg-{name}",
+                                 "conversation_id": conversation_id, "answer": name, "created_at": 0})
+        return httpx.Response(200, json={"message_id": f"msg-{name}", "conversation_id": conversation_id,
+                                         "mode": "advanced-chat", "answer": name, "metadata": {}, "created_at": 0,
+                                         "result": "success"})
+
+    return handler
+
+
+def _chat_req(conversation_id: str = "", response_mode=models.ResponseMode.BLOCKING) -> models.ChatRequest:
+    return models.ChatRequest(query="hi", inputs={}, user="user", conversation_id=conversation_id,
+                              response_mode=response_mode)
+
+
+def test_spreads_new_requests_and_pins_follow_ups(make_client):
+    requests = []
+    pool = ClientPool([make_client(_backend("a", requests)), make_client(_backend("b", requests))])
+    first, second = pool.chat_messages(_chat_req()), pool.chat_messages(_chat_req())
+    assert {first.answer, second.answer} == {"a", "b"}
+    for _ in range(3):
+        assert pool.chat_messages(_chat_req(second.conversation_id)).answer == second.answer
+    pool.feedback_messages(first.message_id, models.FeedbackRequest(rating=models.Rating.LIKE, user="user"))
+    assert requests[-1] == (first.answer, f"/v1/messages/{first.message_id}/feedbacks")
+
+
+def test_pins_the_task_of_a_stream(make_client):
+    requests = []
+    pool = ClientPool([make_client(_backend("a", requests)), make_client(_backend("b", requests))])
+    events = list(pool.chat_messages(_chat_req(response_mode=models.ResponseMode.STREAMING)))
+    name = events[0].answer
+    for _ in range(2):
+        pool.stop_chat_messages(events[0].task_id, models.StopRequest(user="user"))
+        assert requests[-1] == (name, f"/v1/chat-messages/task-{name}/stop")
+
+
+def test_ejects_failing_client(make_client):
+    requests = []
+    pool = ClientPool([make_client(_backend("a", requests, fail=True)), make_client(_backend("b", requests))],
+                      eject_after=2)
+    failures = 0
+    while failures < 2:
+        try:
+            pool.chat_messages(_chat_req())
+        except errors.DifyAPIError:
+            failures += 1
+    assert pool.backends[0].ejected_until > 0
+    calls = len(requests)
+    for _ in range(4):
+        assert pool.chat_messages(_chat_req()).answer == "b"
+    assert [name for name, _ in requests[calls:]] == ["b"] * 4
+
+
+def test_async_pool_pins_follow_ups(make_async_client):
+    requests = []
+
+    async def main():
+        async with AsyncClientPool([make_async_client(_backend("a", requests)),
+                                    make_async_client(_backend("b", requests))]) as pool:
+            first = await pool.achat_messages(_chat_req())
+            answers = [(await pool.achat_messages(_chat_req(first.conversation_id))).answer for _ in range(3)]
+            return first.answer, answers
+
+    name, answers = asyncio.run(main())
+    assert answers == [name] * 3
+
+
+def test_async_pool_releases_cancelled_call(make_async_client):
+    async def hanging(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(10)
+        return httpx.Response(200, json={"result": "success"})
+
+    async def main():
+        pool = AsyncClientPool([make_async_client(hanging), make_async_client(hanging)])
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.astop_workflows("task", models.StopRequest(user="user")), .05)
+            return [backend.outstanding for backend in pool.backends], [backend.failures for backend in pool.backends]
+        finally:
+            await pool.aclose()
+
+    assert asyncio.run(main()) == ([0, 0], [0, 0])
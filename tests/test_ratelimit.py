@@ -0,0 +1,97 @@
+import asyncio
+import types
+
+import pytest
+
+from dify_client import RateLimiter
+from dify_client import _ratelimit
+
+
+class FakeTime:
+    # the clock only moves on sleeps, so the delays of the limiter can be checked exactly
+    def __init__(self):
+        self.now = 1000.
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def fake_time(monkeypatch) -> FakeTime:
+    fake = FakeTime()
+    monkeypatch.setattr(_ratelimit, "time", fake)
+    return fake
+
+
+def test_paces_requests_after_the_burst(fake_time):
+    limiter = RateLimiter(10, burst=2)
+    for _ in range(5):
+        limiter.acquire()
+    assert fake_time.sleeps == pytest.approx([.1, .1, .1])
+
+
+def test_cuts_the_rate_once_per_window(fake_time):
+    limiter = RateLimiter(16, min_rate=3)
+    for _ in range(5):  # a burst of throttled requests in flight
+        limiter.on_throttle()
+    assert limiter.rate == 8
+    fake_time.now += 1 / 8
+    limiter.on_throttle()
+    assert limiter.rate == 4
+    fake_time.now += 1 / 4
+    limiter.on_throttle()
+    assert limiter.rate == 3
+
+
+def test_throttling_drains_the_bucket(fake_time):
+    limiter = RateLimiter(10, burst=5)
+    limiter.on_throttle()
+    limiter.acquire()
+    assert fake_time.sleeps == pytest.approx([1 / 5])
+
+
+def test_ramps_the_rate_up_to_max_rate(fake_time):
+    limiter = RateLimiter(4, max_rate=5, increase=2.)
+    limiter.on_success()
+    assert limiter.rate == 4.5
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == 5
+
+
+def test_pauses_for_retry_after(fake_time):
+    limiter = RateLimiter(100)
+    limiter.on_throttle(retry_after=3.)
+    limiter.acquire()
+    assert fake_time.sleeps == pytest.approx([3.])
+    limiter.on_throttle(retry_after=5.)
+    limiter.on_throttle(retry_after=1.)  # does not shorten the pause
+    limiter.acquire()
+    assert fake_time.sleeps[1] == pytest.approx(5.)
+
+
+def test_async_acquire_waits_the_same_delays(fake_time, monkeypatch):
+    async def sleep(delay: float):
+        fake_time.sleep(delay)
+
+    monkeypatch.setattr(_ratelimit, "asyncio", types.SimpleNamespace(sleep=sleep))
+    limiter = RateLimiter(10, burst=1)
+
+    async def main():
+        for _ in range(3):
+            await limiter.aacquire()
+
+    asyncio.run(main())
+    assert fake_time.sleeps == pytest.approx([.1, .1])
+
+
+def test_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+    with pytest.raises(ValueError):
+        RateLimiter(10, decrease=1.)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from dify_client import models
+
+RUN_REQ = models.WorkflowsRunRequest(inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+STARTED = {"event": "workflow_started", "task_id": "task", "workflow_run_id": "run",
+           "data": {"id": "run", "workflow_id": "wf", "created_at": 0}}
+
+
+class _DroppedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    # yields the events then fails as a dropped connection
+    def __init__(self, *events: dict):
+        self.chunks = [f"data: {json.dumps(event)}\n\n".encode() for event in events]
+
+    def __iter__(self):
+        yield from self.chunks
+        raise httpx.ReadError("connection dropped")
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        raise httpx.ReadError("connection dropped")
+
+
+def _handler(statuses: list):
+    polls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_DroppedStream(STARTED))
+        polls.append(request.url.path)
+        status = statuses[min(len(polls), len(statuses)) - 1]
+        return httpx.Response(200, json={"id": "run", "workflow_id": "wf", "status": status, "outputs": '{"a": 1}',
+                                         "total_steps": 2, "total_tokens": 10, "elapsed_time": 1.5})
+
+    return handler, polls
+
+
+def test_follows_dropped_run_until_finished(make_client):
+    handler, polls = _handler([None, "running", "succeeded"])
+    client = make_client(handler)
+    events = list(client.run_workflows_resumable(RUN_REQ, backoff_base=.001))
+    assert [event.event for event in events] == ["workflow_started", "workflow_finished"]
+    assert polls == ["/v1/workflows/run/run"] * 3
+    finished = events[-1]
+    assert finished.task_id == "task"
+    assert finished.data.status == models.WorkflowStatus.SUCCEEDED
+    assert finished.data.outputs == {"a": 1}
+
+
+def test_raises_when_dropped_before_run_id(make_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_DroppedStream())
+
+    client = make_client(handler)
+    with pytest.raises(httpx.ReadError):
+        list(client.run_workflows_resumable(RUN_REQ, backoff_base=.001))
+
+
+def test_async_follows_dropped_run_until_finished(make_async_client):
+    handler, polls = _handler([None, "failed"])
+
+    async def main():
+        async with make_async_client(handler) as client:
+            return [event async for event in client.arun_workflows_resumable(RUN_REQ, backoff_base=.001)]
+
+    events = asyncio.run(main())
+    assert events[-1].data.status == models.WorkflowStatus.FAILED
+    assert len(polls) == 2
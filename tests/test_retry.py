@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+import pytest
+
+from dify_client import RetryPolicy, errors, models
+
+FEEDBACK_REQ = models.FeedbackRequest(rating=models.Rating.LIKE, user="user")
+CHAT_REQ = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.BLOCKING)
+
+
+def _flaky(failures: list, success: Optional[dict] = None):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) <= len(failures):
+            failure = failures[len(calls) - 1]
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return httpx.Response(200, json=success or {"result": "success"})
+
+    return handler, calls
+
+
+def _policy(**options) -> RetryPolicy:
+    return RetryPolicy(backoff_base=.001, **options)
+
+
+def test_retries_idempotent_endpoint_on_retry_status(make_client):
+    handler, calls = _flaky([httpx.Response(503, json={"code": "unavailable", "message": "busy", "status": 503})])
+    client = make_client(handler, retry_policy=_policy())
+    assert client.feedback_messages("msg", FEEDBACK_REQ).result == "success"
+    assert len(calls) == 2
+
+
+def test_does_not_retry_non_idempotent_request_on_server_error(make_client):
+    handler, calls = _flaky([httpx.Response(503, json={"code": "unavailable", "message": "busy", "status": 503})])
+    client = make_client(handler, retry_policy=_policy())
+    with pytest.raises(errors.DifyAPIError):
+        client.chat_messages(CHAT_REQ)
+    assert len(calls) == 1
+
+
+def test_always_retries_connect_errors(make_client):
+    answer = {"message_id": "msg", "conversation_id": "conv", "mode": "advanced-chat", "answer": "hello",
+              "metadata": {}, "created_at": 0}
+    handler, calls = _flaky([httpx.ConnectError("refused")] * 2, success=answer)
+    client = make_client(handler, retry_policy=_policy())
+    assert client.chat_messages(CHAT_REQ).answer == "hello"
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_attempts(make_client):
+    handler, calls = _flaky([httpx.ReadTimeout("slow")] * 5)
+    client = make_client(handler, retry_policy=_policy(max_attempts=2))
+    with pytest.raises(httpx.ReadTimeout):
+        client.feedback_messages("msg", FEEDBACK_REQ)
+    assert len(calls) == 2
+
+
+def test_no_retry_without_policy(make_client):
+    handler, calls = _flaky([httpx.ConnectError("refused")])
+    client = make_client(handler)
+    with pytest.raises(httpx.ConnectError):
+        client.feedback_messages("msg", FEEDBACK_REQ)
+    assert len(calls) == 1
+
+
+def test_honours_retry_after():
+    error = errors.DifyAPIError(503, "unavailable", "busy", headers={"retry-after": "2"})
+    policy = RetryPolicy(backoff_base=.001, backoff_max=4.)
+    assert policy.get_delay(1, 0., "GET", "/parameters", error) == 2.
+    error = errors.DifyAPIError(503, "unavailable", "busy", headers={"retry-after": "30"})
+    assert policy.get_delay(1, 0., "GET", "/parameters", error) is None
+
+
+def test_stops_at_deadline():
+    policy = RetryPolicy(backoff_base=1., jitter=False, deadline=1.5)
+    assert policy.get_delay(1, 0., "GET", "/parameters", httpx.ConnectError("refused")) == 1.
+    assert policy.get_delay(2, 1., "GET", "/parameters", httpx.ConnectError("refused")) is None
+
+
+def test_async_retries_idempotent_endpoint(make_async_client):
+    handler, calls = _flaky([httpx.ConnectError("refused"),
+                             httpx.Response(502, json={"code": "bad_gateway", "message": "down", "status": 502})])
+
+    async def main():
+        async with make_async_client(handler, retry_policy=_policy()) as client:
+            return await client.afeedback_messages("msg", FEEDBACK_REQ)
+
+    assert asyncio.run(main()).result == "success"
+    assert len(calls) == 3
+
+
+def test_deadline_bounds_the_timeout_of_each_attempt(make_client):
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"])
+        if len(timeouts) == 1:
+            time.sleep(.3)
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json={"result": "success"})
+
+    client = make_client(handler, timeout=30., connect_timeout=.5, retry_policy=_policy(deadline=1.))
+    assert client.feedback_messages("msg", FEEDBACK_REQ).result == "success"
+    first, second = timeouts
+    assert first["connect"] == .5 and .9 < first["read"] <= 1.
+    assert second["connect"] == .5 and .6 < second["read"] <= .7
+
+
+def test_timeouts_are_left_alone_without_deadline(make_client):
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"])
+        return httpx.Response(200, json={"result": "success"})
+
+    make_client(handler, timeout=30., retry_policy=_policy()).feedback_messages("msg", FEEDBACK_REQ)
+    make_client(handler, timeout=30., retry_policy=_policy(deadline=60.)).feedback_messages("msg", FEEDBACK_REQ,
+                                                                                            timeout=2.)
+    assert timeouts[0]["read"] == 5.  # the httpx default of the client of the fixture, no timeout is passed
+    assert timeouts[1] == {"connect": 2., "read": 2., "write": 2., "pool": 2.}
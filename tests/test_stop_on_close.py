@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+
+from dify_client import models
+from dify_client._background import BackgroundRunner
+from tests.conftest import sse_response
+
+CHAT_REQ = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+
+
+def _handler(paths: list, stopped: threading.Event):
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path.endswith("/stop"):
+            stopped.set()
+            return httpx.Response(200, json={"result": "success"})
+        return sse_response(*(
+            {"event": "message", "task_id": "task", "message_id": "msg", "conversation_id": "conv", "answer": "hi",
+             "created_at": 0} for _ in range(3)))
+
+    return handler
+
+
+def test_stops_the_task_of_an_abandoned_stream(make_client):
+    paths, stopped = [], threading.Event()
+    client = make_client(_handler(paths, stopped))
+    stream = client.chat_messages(CHAT_REQ)
+    assert next(stream).task_id == "task"
+    stream.close()
+    assert stopped.wait(5)
+    assert paths == ["/v1/chat-messages", "/v1/chat-messages/task/stop"]
+
+
+def test_does_not_stop_when_disabled(make_client):
+    paths, stopped = [], threading.Event()
+    client = make_client(_handler(paths, stopped), stop_on_close=False)
+    stream = client.chat_messages(CHAT_REQ)
+    next(stream)
+    stream.close()
+    assert not stopped.wait(.2)
+
+
+def test_skips_stops_once_the_client_is_closed(make_client):
+    paths, stopped = [], threading.Event()
+    client = make_client(_handler(paths, stopped))
+    stream = client.chat_messages(CHAT_REQ)
+    next(stream)
+    client.close()
+    stream.close()
+    assert not stopped.wait(.2)
+    assert client._http_client is None
+
+
+def test_async_stops_the_task_of_a_cancelled_consumer(make_async_client):
+    paths, stopped = [], threading.Event()
+
+    async def main():
+        async with make_async_client(_handler(paths, stopped)) as client:
+            first_event = asyncio.Event()
+
+            async def consume():
+                async for _ in await client.achat_messages(CHAT_REQ):
+                    first_event.set()
+                    await asyncio.sleep(10)
+
+            task = asyncio.ensure_future(consume())
+            await first_event.wait()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.gather(*client._background_stops)
+
+    asyncio.run(main())
+    assert paths == ["/v1/chat-messages", "/v1/chat-messages/task/stop"]
+
+
+def _block(runner: BackgroundRunner) -> threading.Event:
+    # occupies a worker of the runner until the returned event is set
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    runner.submit(block)
+    assert started.wait(5)
+    return release
+
+
+def test_runner_drops_calls_beyond_max_pending():
+    runner = BackgroundRunner(max_workers=1, max_pending=2)
+    release = _block(runner)
+    assert [runner.submit(time.monotonic) for _ in range(3)] == [True, True, False]
+    release.set()
+
+
+def test_runner_shutdown_drops_pending_calls():
+    calls = []
+    runner = BackgroundRunner(max_workers=1)
+    release = _block(runner)
+    runner.submit(calls.append, "dropped")
+    runner.shutdown()
+    release.set()
+    done = threading.Event()
+    assert runner.submit(done.set)
+    assert done.wait(5)
+    assert calls == []
+
+
+def test_runner_logs_failed_calls(caplog):
+    def fail():
+        raise ValueError("boom")
+
+    done = threading.Event()
+    runner = BackgroundRunner(max_workers=1)
+    with caplog.at_level(logging.DEBUG, logger="dify_client._background"):
+        runner.submit(fail)
+        runner.submit(done.set)  # runs after the failed call is logged
+        assert done.wait(5)
+    assert any(record.exc_info and "boom" in str(record.exc_info[1]) for record in caplog.records)
+
+
+def test_runner_idle_workers_exit():
+    runner = BackgroundRunner(max_workers=2, idle_timeout=.05)
+    done = threading.Event()
+    assert runner.submit(done.set)
+    assert done.wait(5)
+    worker = runner._workers[0]
+    worker.join(5)
+    assert not worker.is_alive() and runner._workers == []
+    done.clear()
+    assert runner.submit(done.set)
+    assert done.wait(5)
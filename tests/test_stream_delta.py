@@ -0,0 +1,45 @@
+from dify_client import models
+from tests.conftest import sse_response
+
+MESSAGE = {"event": "message", "task_id": "task", "message_id": "msg", "conversation_id": "conv", "answer": "Hel",
+           "created_at": 1}
+AGENT_MESSAGE = {**MESSAGE, "event": "agent_message", "answer": "lo"}
+MESSAGE_END = {"event": "message_end", "task_id": "task", "message_id": "msg", "conversation_id": "conv",
+               "metadata": {"usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}}}
+WORKFLOW_FINISHED = {"event": "workflow_finished", "task_id": "task", "workflow_run_id": "run",
+                     "data": {"id": "run", "workflow_id": "wf", "status": "succeeded", "outputs": {"answer": "Hello"}}}
+
+
+def test_chat_deltas_read_the_payload_and_convert_to_models():
+    for data in (MESSAGE, AGENT_MESSAGE):
+        delta = models.build_chat_stream_delta(data)
+        assert isinstance(delta, models.MessageDelta)
+        assert (delta.event, delta.task_id, delta.message_id, delta.conversation_id, delta.answer, delta.created_at) \
+            == (data["event"], "task", "msg", "conv", data["answer"], 1)
+        model = delta.to_model()
+        assert model == models.build_chat_stream_response(data)
+    assert type(models.build_chat_stream_delta(MESSAGE).to_model()) is models.MessageStreamResponse
+    assert type(models.build_chat_stream_delta(AGENT_MESSAGE).to_model()) is models.AgentMessageStreamResponse
+
+
+def test_other_events_keep_full_models():
+    end = models.build_chat_stream_delta(MESSAGE_END)
+    assert isinstance(end, models.MessageEndStreamResponse) and end.metadata.usage.total_tokens == 5
+    finished = models.build_chat_stream_delta(WORKFLOW_FINISHED)
+    assert isinstance(finished, models.WorkflowsStreamResponse) and finished.data.outputs == {"answer": "Hello"}
+    # completion streams have no agent messages, only their message events are deltas
+    assert isinstance(models.build_completion_stream_delta(MESSAGE), models.MessageDelta)
+    assert isinstance(models.build_completion_stream_delta(MESSAGE_END), models.MessageEndStreamResponse)
+
+
+def test_client_yields_deltas_when_enabled(make_client):
+    req = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+
+    def handler(request):
+        return sse_response(MESSAGE, AGENT_MESSAGE, MESSAGE_END)
+
+    fast = list(make_client(handler, fast_stream_deltas=True).chat_messages(req))
+    slow = list(make_client(handler).chat_messages(req))
+    assert [type(event) for event in fast] == [models.MessageDelta, models.MessageDelta,
+                                               models.MessageEndStreamResponse]
+    assert [event.to_model() for event in fast[:2]] + fast[2:] == slow
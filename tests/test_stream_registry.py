@@ -0,0 +1,53 @@
+from typing import Optional
+
+import pytest
+
+from dify_client import models
+
+AGENT_LOG = {"event": "agent_log", "task_id": "task", "data": {"label": "search", "status": "success"}}
+MESSAGE = {"event": "message", "task_id": "task", "message_id": "msg", "answer": "hi"}
+
+
+class AgentLogStreamResponse(models.StreamResponse):
+    data: Optional[dict] = None
+
+
+class TracedMessageStreamResponse(models.MessageStreamResponse):
+    pass
+
+
+def test_unknown_events_pass_through_with_their_payload():
+    for build in (models.build_completion_stream_response, models.build_chat_stream_response,
+                  models.build_workflows_stream_response):
+        event = build(AGENT_LOG)
+        assert type(event) is models.UnknownStreamResponse
+        assert (event.event, event.task_id, event.raw) == ("agent_log", "task", AGENT_LOG)
+
+
+def test_registers_unknown_events_per_stream_type():
+    models.register_stream_response("agent_log", AgentLogStreamResponse, [models.StreamType.CHAT])
+    try:
+        event = models.build_chat_stream_response(AGENT_LOG)
+        assert type(event) is AgentLogStreamResponse and event.data == AGENT_LOG["data"]
+        assert type(models.build_workflows_stream_response(AGENT_LOG)) is models.UnknownStreamResponse
+    finally:
+        models.unregister_stream_response("agent_log")
+    assert type(models.build_chat_stream_response(AGENT_LOG)) is models.UnknownStreamResponse
+
+
+def test_unregister_restores_the_default_models():
+    models.register_stream_response(models.StreamEvent.MESSAGE, TracedMessageStreamResponse)
+    try:
+        assert type(models.build_chat_stream_response(MESSAGE)) is TracedMessageStreamResponse
+        assert type(models.build_completion_stream_response(MESSAGE)) is TracedMessageStreamResponse
+    finally:
+        models.unregister_stream_response(models.StreamEvent.MESSAGE)
+    assert type(models.build_chat_stream_response(MESSAGE)) is models.MessageStreamResponse
+    assert type(models.build_completion_stream_response(MESSAGE)) is models.MessageStreamResponse
+    # workflow streams had no model for message events, and still have none
+    assert type(models.build_workflows_stream_response(MESSAGE)) is models.StreamResponse
+
+
+def test_rejects_models_which_are_not_stream_responses():
+    with pytest.raises(TypeError):
+        models.register_stream_response("agent_log", dict)
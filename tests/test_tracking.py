@@ -0,0 +1,51 @@
+from dify_client import WorkflowRunTracker, models
+
+
+def _event(event: str, run_id: str = "run", **data) -> models.WorkflowsRunStreamResponse:
+    return models.build_workflows_stream_response(
+        {"event": event, "task_id": "task", "workflow_run_id": run_id, "data": {"id": run_id, **data}})
+
+
+def _node(node_id: str, predecessor_node_id, elapsed_time: float, tokens: int = 0):
+    return _event("node_finished", node_id=node_id, node_type="llm", title=node_id, index=1, status="succeeded",
+                  predecessor_node_id=predecessor_node_id, elapsed_time=elapsed_time,
+                  execution_metadata={"total_tokens": tokens, "total_price": "0.001", "currency": "USD"})
+
+
+def _run(run_id: str = "run"):
+    yield _event("workflow_started", run_id, workflow_id="wf")
+    yield _node("start", None, .1)
+    yield _node("fast", "start", .2)
+    yield _node("slow", "start", 1., tokens=100)
+    yield _node("end", "slow", .1)
+    yield _event("workflow_finished", run_id, workflow_id="wf", status="succeeded", elapsed_time=1.3)
+
+
+def test_builds_critical_path_and_node_stats():
+    tracker = WorkflowRunTracker(keep_runs=1)
+    events = list(tracker.track(_run()))
+    assert len(events) == 6
+    timeline = tracker.finished_runs[-1]
+    assert [node.node_id for node in timeline.critical_path()] == ["start", "slow", "end"]
+    stats = tracker.node_stats("wf")
+    assert stats[0].node_id == "slow" and stats[0].total_tokens == 100 and stats[0].critical_runs == 1
+    assert tracker.get_run("run") is None
+
+
+def test_discards_runs_of_abandoned_streams():
+    tracker = WorkflowRunTracker()
+    stream = tracker.track(_run())
+    next(stream)
+    next(stream)
+    assert tracker.get_run("run") is not None
+    stream.close()
+    assert tracker.get_run("run") is None
+    assert tracker.node_stats() == []
+
+
+def test_bounds_runs_in_progress():
+    tracker = WorkflowRunTracker(max_runs=2)
+    for run_id in ("a", "b", "c"):
+        tracker.feed(_event("workflow_started", run_id, workflow_id="wf"))
+    assert tracker.get_run("a") is None
+    assert tracker.get_run("b") is not None and tracker.get_run("c") is not None
@@ -0,0 +1,118 @@
+import asyncio
+import email.parser
+import email.policy
+import io
+import math
+import threading
+
+import httpx
+
+from dify_client import RetryPolicy, models
+
+UPLOAD_REQ = models.UploadFileRequest(user="user")
+UPLOADED = {"id": "file", "name": "report.pdf", "size": 3, "extension": "pdf", "mime_type": "application/pdf"}
+
+
+def _parse_multipart(request: httpx.Request, body: bytes) -> dict:
+    head = f"Content-Type: {request.headers['content-type']}\r\n\r\n".encode()
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(head + body)
+    return {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+
+
+def _handler(received: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append((request, request.read()))
+        return httpx.Response(200, json=UPLOADED)
+
+    return handler
+
+
+def test_streams_file_path_with_content_length(make_client, tmp_path):
+    path = tmp_path / "report.pdf"
+    content = b"%PDF" + bytes(range(256)) * 1024
+    path.write_bytes(content)
+    received, progress = [], []
+    client = make_client(_handler(received))
+    uploaded = client.upload_files_stream(str(path), UPLOAD_REQ, chunk_size=4096,
+                                          progress=lambda sent, total: progress.append((sent, total)))
+    assert uploaded.id == "file"
+    request, body = received[0]
+    assert int(request.headers["content-length"]) == len(body)
+    parts = _parse_multipart(request, body)
+    assert parts["user"].get_content() == "user"
+    assert parts["file"].get_filename() == "report.pdf"
+    assert parts["file"].get_content_type() == "application/pdf"
+    assert parts["file"].get_payload(decode=True) == content
+    assert len(progress) == math.ceil(len(content) / 4096)
+    assert progress[-1] == (len(content), len(content))
+
+
+def test_streams_iterator_with_chunked_encoding(make_client):
+    received = []
+    client = make_client(_handler(received))
+    client.upload_files_stream(iter([b"abc", b"def"]), UPLOAD_REQ, filename="notes.txt")
+    request, body = received[0]
+    assert "content-length" not in request.headers
+    assert request.headers["transfer-encoding"] == "chunked"
+    assert _parse_multipart(request, body)["file"].get_payload(decode=True) == b"abcdef"
+
+
+def test_async_streams_async_iterator(make_async_client):
+    received = []
+
+    async def chunks():
+        yield b"abc"
+        yield b"def"
+
+    async def main():
+        async with make_async_client(_handler(received)) as client:
+            return await client.aupload_files_stream(chunks(), UPLOAD_REQ, filename="notes.txt")
+
+    assert asyncio.run(main()).id == "file"
+    request, body = received[0]
+    part = _parse_multipart(request, body)["file"]
+    assert part.get_content_type() == "text/plain"
+    assert part.get_payload(decode=True) == b"abcdef"
+
+
+class _ThreadRecordingFile(io.BytesIO):
+    def __init__(self, content: bytes):
+        super().__init__(content)
+        self.read_threads = set()
+
+    def read(self, size: int = -1) -> bytes:
+        self.read_threads.add(threading.current_thread())
+        return super().read(size)
+
+
+def test_async_reads_files_off_the_event_loop(make_async_client):
+    received, progress = [], []
+    f = _ThreadRecordingFile(b"x" * 10_000)
+    f.name = "data.bin"
+
+    async def main():
+        async with make_async_client(_handler(received)) as client:
+            await client.aupload_files_stream(f, UPLOAD_REQ, chunk_size=4096,
+                                              progress=lambda sent, total: progress.append((sent, total)))
+            return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert f.read_threads and loop_thread not in f.read_threads
+    assert _parse_multipart(*received[0])["file"].get_payload(decode=True) == b"x" * 10_000
+    assert progress == [(4096, 10_000), (8192, 10_000), (10_000, 10_000)]
+
+
+def test_body_is_replayable_for_retries(make_client):
+    received = []
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.read())
+        if len(attempts) == 1:
+            return httpx.Response(503, json={"code": "unavailable", "message": "busy", "status": 503})
+        return _handler(received)(request)
+
+    client = make_client(handler, retry_policy=RetryPolicy(backoff_base=.001, retry_non_idempotent=True))
+    client.upload_files_stream(b"payload", UPLOAD_REQ, filename="payload.bin")
+    assert attempts[0] == attempts[1]
+    assert _parse_multipart(*received[0])["file"].get_payload(decode=True) == b"payload"
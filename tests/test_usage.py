@@ -0,0 +1,68 @@
+import asyncio
+from decimal import Decimal
+
+import httpx
+
+from dify_client import UsageAggregator, models
+from tests.conftest import sse_response
+
+USAGE = {"prompt_tokens": 60, "completion_tokens": 40, "total_tokens": 100, "total_price": "0.01", "currency": "USD"}
+NODE_FINISHED = {"event": "node_finished", "task_id": "task", "workflow_run_id": "run",
+                 "data": {"id": "node-run", "node_id": "llm", "node_type": "llm", "status": "succeeded",
+                          "process_data": {"model_name": "gpt-4o"},
+                          "execution_metadata": {"total_tokens": 100, "total_price": "0.01", "currency": "USD"}}}
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/workflows/run":
+        return sse_response(NODE_FINISHED, NODE_FINISHED)
+    return sse_response(
+        NODE_FINISHED,
+        {"event": "message", "task_id": "task", "message_id": "msg", "conversation_id": "conv", "answer": "hi",
+         "created_at": 0},
+        {"event": "message_end", "task_id": "task", "message_id": "msg", "conversation_id": "conv",
+         "metadata": {"usage": USAGE}},
+    )
+
+
+def test_chatflow_stream_usage_is_counted_once(make_client):
+    aggregator = UsageAggregator()
+    client = make_client(_handler, usage_aggregator=aggregator, app_name="app")
+    req = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+    assert len(list(client.chat_messages(req))) == 3
+    total = aggregator.total(app="app", user="user")
+    assert (total.requests, total.prompt_tokens, total.total_tokens, total.total_price) == \
+           (1, 60, 100, Decimal("0.01"))
+
+
+def test_workflow_stream_usage_is_counted_per_node(make_client):
+    aggregator = UsageAggregator()
+    client = make_client(_handler, usage_aggregator=aggregator)
+    req = models.WorkflowsRunRequest(inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+    list(client.run_workflows(req))
+    total = aggregator.total(user="user", model="gpt-4o")
+    assert (total.requests, total.total_tokens, total.total_price) == (2, 200, Decimal("0.02"))
+
+
+def test_async_chatflow_stream_usage_is_counted_once(make_async_client):
+    aggregator = UsageAggregator()
+    req = models.ChatRequest(query="hi", inputs={}, user="user", response_mode=models.ResponseMode.STREAMING)
+
+    async def main():
+        async with make_async_client(_handler, usage_aggregator=aggregator) as client:
+            return [event async for event in await client.achat_messages(req)]
+
+    asyncio.run(main())
+    assert aggregator.total().total_tokens == 100
+
+
+def test_rolling_window_drops_old_buckets(monkeypatch):
+    now = 1000.
+    monkeypatch.setattr("dify_client._usage.time.time", lambda: now)
+    aggregator = UsageAggregator(window=20., bucket_duration=10.)
+    aggregator.record_event(models.ChatResponse(message_id="msg", conversation_id="conv", mode="advanced-chat",
+                                                answer="hi", metadata={"usage": USAGE}, created_at=0), user="user")
+    assert aggregator.total(window=True).total_tokens == 100
+    now = 1030.
+    assert aggregator.total(window=True).total_tokens == 0
+    assert aggregator.total().total_tokens == 100
@@ -0,0 +1,27 @@
+import pytest
+
+from dify_client import models, utils
+from dify_client.utils import _common
+
+
+def test_str_to_enum_looks_members_up_by_value():
+    assert utils.str_to_enum(models.StreamEvent, "message_end") is models.StreamEvent.MESSAGE_END
+    assert utils.str_to_enum(models.ResponseMode, "streaming") is models.ResponseMode.STREAMING
+    # one value index per enum class, built on first use
+    assert _common._ENUM_VALUE_INDEXES[models.StreamEvent]["tts_message"] is models.StreamEvent.TTS_MESSAGE
+    assert len(_common._ENUM_VALUE_INDEXES[models.StreamEvent]) == len(models.StreamEvent)
+
+
+def test_str_to_enum_unknown_values():
+    assert utils.str_to_enum(models.StreamEvent, "agent_log", ignore_not_found=True) is None
+    assert utils.str_to_enum(models.StreamEvent, "agent_log", ignore_not_found=True, enum_default="x") == "x"
+    with pytest.raises(ValueError, match="agent_log"):
+        utils.str_to_enum(models.StreamEvent, "agent_log")
+    with pytest.raises(ValueError):
+        models.StreamEvent.new("agent_log")
+
+
+def test_stream_responses_keep_unknown_event_names():
+    assert models.StreamResponse(event="message").event is models.StreamEvent.MESSAGE
+    event = models.StreamResponse(event="agent_log", task_id="task")
+    assert event.event == "agent_log" and not isinstance(event.event, models.StreamEvent)